@@ -1,57 +1,34 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-import plotly.express as px
-
-# تحميل البيانات
-print("Loading merged dataset...")
-df = pd.read_csv("E:/DS First Project/Dashboard/data/real_estate_tourism_merged.csv")
-
-# تنظيف أولي
-df_clean = df.dropna(subset=['tourism_activity', 'avg_meter_price',
-                             'property_type_en', 'area_name_en'])
-print(f"Records used for analysis: {len(df_clean)}")
-
-# 1 العلاقة العامة بين السياحة والسعر
-correlation = df_clean['tourism_activity'].corr(df_clean['avg_meter_price'])
-p_value = stats.pearsonr(df_clean['tourism_activity'],
-                          df_clean['avg_meter_price'])[1]
-
-print(f"Overall correlation: {correlation:.4f}")
-print(f"P-value: {p_value:.6f}")
-
-# 2 العلاقة حسب نوع العقار
-property_results = []
-for prop in df_clean['property_type_en'].unique():
-    subset = df_clean[df_clean['property_type_en'] == prop]
-    if len(subset) > 50:
-        property_results.append({
-            'Property Type': prop,
-            'Correlation': subset['tourism_activity'].corr(subset['avg_meter_price']),
-            'Transactions': len(subset),
-            'Avg Tourism': subset['tourism_activity'].mean(),
-            'Avg Price': subset['avg_meter_price'].mean()
-        })
-
-property_df = pd.DataFrame(property_results)
-if not property_df.empty:
-    property_df = property_df.sort_values('Correlation', ascending=False)
-    print("Property-type analysis completed")
-
-# 3 تحليل المناطق
-area_results = []
-for area in df_clean['area_name_en'].unique():
-    area_data = df_clean[df_clean['area_name_en'] == area]
-    if len(area_data) > 30:
-        area_results.append({
-            'Area': area,
-            'Correlation': area_data['tourism_activity'].corr(area_data['avg_meter_price']),
-            'Observations': len(area_data),
-            'Avg Tourism': area_data['tourism_activity'].mean(),
-            'Avg Price': area_data['avg_meter_price'].mean()
-        })
-
-area_df = pd.DataFrame(area_results)
+import bootstrap
+from chart_output import render_charts, scatter
+from compact import load_model, view
+from group_stats import group_stats, pearson_p_value, stats_table
+
+# الأعمدة المستخدمة في هذا التحليل
+COLUMNS = ['area_name_en', 'property_type_en', 'tourism_activity', 'avg_meter_price']
+CLEAN_SUBSET = ['tourism_activity', 'avg_meter_price',
+                'property_type_en', 'area_name_en']
+
+# أقل عدد صفوف لحساب ارتباط نوع العقار أو المنطقة
+MIN_PROPERTY_ROWS = 50
+MIN_AREA_ROWS = 30
+
+# طريقة فترات الثقة للمناطق (bootstrap.METHODS)
+INTERVAL_METHOD = 'bootstrap'
+
+# مستوى الدلالة: المنطقة التي لا يتجاوز ارتباطها هذا المستوى تُصنف "No Clear Impact"
+ALPHA = 1 - bootstrap.CONFIDENCE
+
+PARAMS = {
+    'min_property_rows': MIN_PROPERTY_ROWS,
+    'min_area_rows': MIN_AREA_ROWS,
+    'resamples': bootstrap.RESAMPLES,
+    'confidence': bootstrap.CONFIDENCE,
+    'seed': bootstrap.SEED,
+    'interval_method': INTERVAL_METHOD
+}
+
 
 def classify(c):
     if c > 0.5:
@@ -65,24 +42,132 @@ def classify(c):
     else:
         return "Negative"
 
-if not area_df.empty:
-    area_df['Impact Class'] = area_df['Correlation'].apply(classify)
-    top_10 = area_df.sort_values('Correlation', ascending=False).head(10)
-    print("Top impacted areas identified")
+
+# جدول العلاقة حسب نوع العقار من إحصاءات المجموعات
+def property_table(property_stats):
+    property_stats = property_stats[property_stats['count'] > MIN_PROPERTY_ROWS]
+
+    return stats_table(property_stats, 'Property Type', {
+        'Correlation': 'corr_tourism_activity_avg_meter_price',
+        'Transactions': 'count',
+        'Avg Tourism': 'tourism_activity_mean',
+        'Avg Price': 'avg_meter_price_mean'
+    })
+
+
+# ارتباط دال: فترة الثقة لا تشمل الصفر والقيمة الاحتمالية أقل من alpha
+def significant(low, high, p_value, alpha=ALPHA):
+    return ((low > 0) | (high < 0)) & (p_value < alpha)
+
+
+# جدول المناطق مع تصنيف التأثير
+# مع فترات الثقة (intervals) يبقى التصنيف حسب الارتباط، ويصبح "No Clear Impact" إذا لم يكن الارتباط دالاً
+def area_table(area_stats, intervals=None):
+    area_stats = area_stats[area_stats['count'] > MIN_AREA_ROWS]
+
+    area_df = stats_table(area_stats, 'Area', {
+        'Correlation': 'corr_tourism_activity_avg_meter_price',
+        'Observations': 'count',
+        'Avg Tourism': 'tourism_activity_mean',
+        'Avg Price': 'avg_meter_price_mean'
+    })
+    if area_df.empty:
+        return area_df
+
+    if intervals is None:
+        area_df['Impact Class'] = area_df['Correlation'].apply(classify)
+        return area_df
+
+    intervals = intervals.reindex(area_stats.index)
+    area_df['CI Low'] = intervals['ci_low'].to_numpy()
+    area_df['CI High'] = intervals['ci_high'].to_numpy()
+    area_df['P-Value'] = intervals['p_value'].to_numpy()
+    classes = area_df['Correlation'].apply(classify)
+    # الارتباط الفارغ يبقى بتصنيفه كما هو
+    weak = ~significant(area_df['CI Low'].to_numpy(), area_df['CI High'].to_numpy(),
+                        area_df['P-Value'].to_numpy()) & area_df['Correlation'].notna().to_numpy()
+    classes[weak] = "No Clear Impact"
+    area_df['Impact Class'] = classes
+    return area_df
+
+
+# workers: عدد العمليات لإعادة المعاينة (bootstrap) في فترات ثقة المناطق
+# intervals=False يتخطى فترات الثقة ويصنف كل منطقة بارتباطها فقط (للإجابات السريعة)
+def analyze(df_clean, workers=1, intervals=True, verbose=True, interval_method=INTERVAL_METHOD):
+    if verbose:
+        print(f"Records used for analysis: {len(df_clean)}")
+
+    # 1 العلاقة العامة بين السياحة والسعر
+    correlation = df_clean['tourism_activity'].corr(df_clean['avg_meter_price'])
+    p_value = pearson_p_value(correlation, len(df_clean))
+
+    if verbose:
+        print(f"Overall correlation: {correlation:.4f}")
+        print(f"P-value: {p_value:.6f}")
+
+    # 2 العلاقة حسب نوع العقار
+    property_stats = group_stats(df_clean, 'property_type_en',
+                                 ['tourism_activity', 'avg_meter_price'],
+                                 pairs=[('tourism_activity', 'avg_meter_price')])
+    property_df = property_table(property_stats)
+    if not property_df.empty:
+        property_df = property_df.sort_values('Correlation', ascending=False)
+        if verbose:
+            print("Property-type analysis completed")
+
+    # 3 تحليل المناطق
+    area_stats = group_stats(df_clean, 'area_name_en',
+                             ['tourism_activity', 'avg_meter_price'],
+                             pairs=[('tourism_activity', 'avg_meter_price')])
+    # فترات الثقة فقط للمناطق التي تدخل الجدول
+    eligible = area_stats.index[area_stats['count'] > MIN_AREA_ROWS]
+    if not intervals:
+        area_intervals = None
+    elif len(eligible) == 0:
+        area_intervals = pd.DataFrame(columns=['correlation', 'ci_low', 'ci_high', 'p_value', 'method'])
+    else:
+        area_intervals = bootstrap.correlation_intervals(df_clean, 'area_name_en',
+                                                         'tourism_activity', 'avg_meter_price',
+                                                         mask=df_clean['area_name_en'].isin(eligible).to_numpy(),
+                                                         workers=workers, method=interval_method)
+        if verbose:
+            print(f"Area confidence intervals computed ({area_intervals['method'].iloc[0]})")
+    area_df = area_table(area_stats, area_intervals)
+
+    top_10 = None
+    if not area_df.empty:
+        top_10 = area_df.sort_values('Correlation', ascending=False).head(10)
+        if verbose:
+            print("Top impacted areas identified")
+
+    return {
+        'correlation': correlation,
+        'p_value': p_value,
+        'property_df': property_df,
+        'area_df': area_df,
+        'top_10': top_10
+    }
+
 
 #Drawing the charts
 #Chart 1
+def overall_chart(data):
+    chart1 = scatter(data['df_clean'], x = "tourism_activity", y = "avg_meter_price", opacity = 0.3, title = f"Overall Relationship (corr={data['correlation']:.3f})")
 
-chart1 = px.scatter(df_clean, x = "tourism_activity", y = "avg_meter_price", opacity = 0.3, title = f"Overall Relationship (corr={correlation:.3f})")
+    chart1.update_traces(marker_size = 6, selector = dict(mode = "markers"))
 
-chart1.update_traces(marker_size = 6)
+    chart1.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Tourism Activity", yaxis_title = "Average Meter Price")
 
-chart1.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Tourism Activity", yaxis_title = "Average Meter Price")
+    return chart1
 
-chart1.write_html("charts/chart-1.1.html", include_plotlyjs = "cdn")
 
 #Chart 2
-if not property_df.empty:
+def property_chart(data):
+    import plotly.express as px
+
+    property_df = data['property_df']
+    if property_df.empty:
+        return None
 
     chart2 = px.bar(property_df, x = "Property Type", y = "Correlation", title = "Correlation by Property Type")
 
@@ -90,26 +175,64 @@ if not property_df.empty:
 
     chart2.update_layout(title_x = 0.5, plot_bgcolor = "white")
 
-    chart2.write_html("charts/chart-1.2.html", include_plotlyjs = "cdn")
+    return chart2
+
 
 #Chart 3
-if not area_df.empty:
+def top_areas_chart(data):
+    import plotly.express as px
 
-    chart3 = px.bar(top_10, x = "Correlation", y = "Area", orientation = "h", title = "Top 10 Areas by Tourism Impact")
+    top_10 = data['top_10']
+    if data['area_df'].empty:
+        return None
+
+    # فترة الثقة لكل منطقة كخط خطأ حول الارتباط
+    error = {}
+    if 'CI Low' in top_10:
+        top_10 = top_10.assign(ci_plus = top_10['CI High'] - top_10['Correlation'], ci_minus = top_10['Correlation'] - top_10['CI Low'])
+        error = dict(error_x = "ci_plus", error_x_minus = "ci_minus")
+
+    chart3 = px.bar(top_10, x = "Correlation", y = "Area", orientation = "h", title = "Top 10 Areas by Tourism Impact", **error)
 
     chart3.add_vline(x = 0, line_dash = "dash")
 
     chart3.update_layout(title_x = 0.5, yaxis_autorange = "reversed", plot_bgcolor = "white")
 
-    chart3.write_html("charts/chart-1.3.html", include_plotlyjs = "cdn")
+    return chart3
+
 
 #Chart 4
-impact_counts = area_df['Impact Class'].value_counts().reset_index()
-impact_counts.columns = ["Impact Class", "Count"]
+def impact_chart(data):
+    import plotly.express as px
+
+    impact_counts = data['area_df']['Impact Class'].value_counts().reset_index()
+    impact_counts.columns = ["Impact Class", "Count"]
+
+    chart4 = px.pie(impact_counts, names = "Impact Class", values = "Count", title = "Impact Distribution")
+
+    chart4.update_layout(title_x = 0.5)
+    chart4.update_traces(textinfo = "percent+label")
+
+    return chart4
+
+
+# كل رسم: دالة بنائه والجداول التي يُبنى منها
+CHARTS = {
+    'chart-1.1': (overall_chart, ['df_clean', 'correlation']),
+    'chart-1.2': (property_chart, ['property_df']),
+    'chart-1.3': (top_areas_chart, ['area_df', 'top_10']),
+    'chart-1.4': (impact_chart, ['area_df'])
+}
+
+
+def draw_charts(results, df_clean, workers=None, force=False, verbose=True):
+    return render_charts(CHARTS, {**results, 'df_clean': df_clean}, workers, force, verbose=verbose)
 
-chart4 = px.pie(impact_counts, names = "Impact Class", values = "Count", title = "Impact Distribution")
 
-chart4.update_layout(title_x = 0.5)
-chart4.update_traces(textinfo = "percent+label")
+if __name__ == "__main__":
+    # تحميل البيانات
+    print("Loading merged dataset...")
+    model = load_model()
 
-chart4.write_html("charts/chart-1.4.html", include_plotlyjs = "cdn")
\ No newline at end of file
+    df_clean = view(model, COLUMNS, CLEAN_SUBSET)
+    draw_charts(analyze(df_clean), df_clean)
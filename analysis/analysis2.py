@@ -1,158 +1,330 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
-# تحميل البيانات
-print("Loading merged dataset...")
-df = pd.read_csv("E:/DS First Project/Dashboard/data/real_estate_tourism_merged.csv")
-
-# تنظيف وتجهيز البيانات
-df_clean = df.dropna(subset=[
+from chart_output import render_charts, scatter
+from compact import load_model, view
+from group_stats import group_codes, group_stats
+import parallel
+import sketches
+
+# الأعمدة المستخدمة في هذا التحليل
+COLUMNS = ['area_name_en', 'avg_meter_price', 'tourism_activity',
+           'transactions_count', 'year_month']
+CLEAN_SUBSET = [
     'area_name_en',
     'avg_meter_price',
     'tourism_activity',
     'transactions_count'
-])
-
-df_clean['year_month'] = pd.to_datetime(df_clean['year_month'])
-df_clean['year'] = df_clean['year_month'].dt.year
-df_clean['month'] = df_clean['year_month'].dt.month
-
-print(f"Records: {len(df_clean)} | Areas: {df_clean['area_name_en'].nunique()}")
-
-# حساب مؤشر الاستثمار المركب
-investment_scores = []
-
-for area in df_clean['area_name_en'].unique():
-    area_data = df_clean[df_clean['area_name_en'] == area]
-
-    if len(area_data) < 12:
-        continue
-
-    # نمو السياحة
-    tourism_growth = 0
-    if len(area_data) >= 24:
-        recent = area_data[area_data['year'] >= 2022]['tourism_activity'].mean()
-        old = area_data[area_data['year'] < 2022]['tourism_activity'].mean()
-        if old > 0:
-            tourism_growth = ((recent - old) / old) * 100
-
-    # استقرار الأسعار
-    price_stability = 0
-    price_std = area_data['avg_meter_price'].std()
-    price_mean = area_data['avg_meter_price'].mean()
-    if price_mean > 0:
-        price_stability = 100 * (1 - price_std / price_mean)
-
-    # السيولة
-    liquidity = area_data['transactions_count'].sum() / len(area_data)
-
-    # مستوى السياحة الحالي
-    current_tourism = area_data['tourism_activity'].mean()
-    tourism_percentile = (
-        (current_tourism - df_clean['tourism_activity'].min()) /
-        (df_clean['tourism_activity'].max() - df_clean['tourism_activity'].min())
-    ) * 100
-
-    # جاذبية السعر
-    price_attractiveness = 0
-    overall_mean_price = df_clean['avg_meter_price'].mean()
-    area_mean_price = area_data['avg_meter_price'].mean()
-    if overall_mean_price > 0:
-        price_attractiveness = max(0, 100 * (1 - area_mean_price / overall_mean_price))
-
-    # المؤشر المركب
-    composite_score = (
-        min(max(tourism_growth, -50), 100) * 0.30 +
-        max(price_stability, 0) * 0.25 +
-        min(liquidity * 10, 100) * 0.20 +
-        tourism_percentile * 0.15 +
-        price_attractiveness * 0.10
-    )
-
-    investment_scores.append({
-        'Area': area,
-        'Investment Score': round(composite_score, 2),
-        'Tourism Growth %': round(tourism_growth, 2),
-        'Price Stability %': round(price_stability, 2),
-        'Monthly Liquidity': round(liquidity, 2),
-        'Tourism Level': round(current_tourism, 2),
-        'Avg Meter Price': round(area_mean_price, 2),
-        'Months': len(area_data),
-        'Transactions': int(area_data['transactions_count'].sum())
-    })
-
-scores_df = pd.DataFrame(investment_scores)
+]
 
-if scores_df.empty:
-    print("No valid areas for scoring")
-    exit()
+# شروط المؤشر المركب
+MIN_MONTHS = 12
+GROWTH_MIN_MONTHS = 24
+GROWTH_SPLIT_YEAR = 2022
+
+# أوزان مكونات المؤشر المركب
+SCORE_WEIGHTS = {
+    'tourism_growth': 0.30,
+    'price_stability': 0.25,
+    'liquidity': 0.20,
+    'tourism_level': 0.15,
+    'price_attractiveness': 0.10
+}
+
+# حدود المكونات قبل الأوزان: نمو السياحة بين حدين، حد أدنى للاستقرار، والسيولة مضروبة ثم محدودة
+GROWTH_BOUNDS = (-50, 100)
+STABILITY_MIN = 0
+LIQUIDITY_SCALE = 10
+LIQUIDITY_MAX = 100
+
+# أقل نقاط لكل تصنيف من الأعلى إلى الأدنى، وما دونها "Weak"
+RATING_CUTOFFS = {
+    'Excellent': 70,
+    'Very Good': 60,
+    'Good': 50,
+    'Average': 40
+}
+
+# فئات السعر
+PRICE_BINS = [0, 5000, 10000, 20000, 50000, float('inf')]
+PRICE_LABELS = ['Low', 'Medium', 'High', 'Very High', 'Luxury']
+# فئة السعر حسب متوسط سعر المتر في المنطقة ('mean') أو وسيطه ('median')
+SEGMENT_PRICE = 'mean'
+
+# مستوى السياحة يُطبّع بين مئينين لقيم السياحة (0 و100 هما أقل وأعلى قيمة)
+TOURISM_LEVEL_PERCENTILES = (0, 100)
+
+PARAMS = {
+    'min_months': MIN_MONTHS,
+    'growth_min_months': GROWTH_MIN_MONTHS,
+    'growth_split_year': GROWTH_SPLIT_YEAR,
+    'score_weights': SCORE_WEIGHTS,
+    'growth_bounds': GROWTH_BOUNDS,
+    'stability_min': STABILITY_MIN,
+    'liquidity_scale': LIQUIDITY_SCALE,
+    'liquidity_max': LIQUIDITY_MAX,
+    'rating_cutoffs': RATING_CUTOFFS,
+    'price_bins': PRICE_BINS,
+    'segment_price': SEGMENT_PRICE,
+    'tourism_level_percentiles': TOURISM_LEVEL_PERCENTILES
+}
 
-scores_df = scores_df.sort_values('Investment Score', ascending=False)
-print("Investment scoring completed")
 
 # تصنيف الاستثمار
 def classify(score):
-    if score >= 70:
-        return "Excellent"
-    elif score >= 60:
-        return "Very Good"
-    elif score >= 50:
-        return "Good"
-    elif score >= 40:
-        return "Average"
+    for rating, cutoff in RATING_CUTOFFS.items():
+        if score >= cutoff:
+            return rating
+    return "Weak"
+
+
+# إحصاءات كل منطقة ومتوسط السياحة قبل سنة المقارنة وبعدها
+def area_statistics(df_clean):
+    area_stats = group_stats(df_clean, 'area_name_en',
+                             ['tourism_activity', 'avg_meter_price', 'transactions_count'])
+
+    period_tourism = group_stats(df_clean.assign(recent=df_clean['year'] >= GROWTH_SPLIT_YEAR),
+                                 ['area_name_en', 'recent'],
+                                 ['tourism_activity'])['tourism_activity_mean'].unstack()
+    period_tourism = period_tourism.reindex(index=area_stats.index, columns=[False, True])
+    return area_stats, period_tourism
+
+
+# حدود تطبيع مستوى السياحة: أقل وأعلى قيمة بالضبط، أو مئينات (من المخطط إذا حُدد sketch_error)
+def tourism_range(tourism, sketch_error=None):
+    if tuple(TOURISM_LEVEL_PERCENTILES) == (0, 100):
+        return tourism.min(), tourism.max()
+    low, high = sketches.quantiles(tourism.to_numpy(), np.divide(TOURISM_LEVEL_PERCENTILES, 100), sketch_error)
+    return low, high
+
+
+# وسيط سعر المتر لكل منطقة بترتيب index
+def area_median_price(df_clean, index, sketch_error=None):
+    codes, areas = group_codes(df_clean, 'area_name_en')
+    median = sketches.group_quantiles(df_clean['avg_meter_price'].to_numpy(), [0.5],
+                                      codes, len(areas), sketch_error)[:, 0]
+    return pd.Series(median, index=areas).reindex(index).to_numpy()
+
+
+# sketch_error: الخطأ النسبي المسموح للمئينات (None يعني الحساب بالضبط)
+def analyze(df_clean, workers=1, sketch_error=None, verbose=True):
+    df_clean['year'] = df_clean['year_month'].dt.year
+    df_clean['month'] = df_clean['year_month'].dt.month
+
+    if verbose:
+        print(f"Records: {len(df_clean)} | Areas: {df_clean['area_name_en'].nunique()}")
+
+    # حساب مؤشر الاستثمار المركب (المناطق مستقلة فيمكن توزيعها على عدة عمليات)
+    if parallel.use_processes(len(df_clean), workers):
+        parts, _, areas = parallel.map_areas(
+            df_clean, ['tourism_activity', 'avg_meter_price', 'transactions_count', 'year'],
+            area_statistics, workers)
+        area_stats = parallel.combine([part[0] for part in parts], areas)
+        period_tourism = parallel.combine([part[1] for part in parts], areas)
+    else:
+        area_stats, period_tourism = area_statistics(df_clean)
+
+    if SEGMENT_PRICE == 'median':
+        area_stats['avg_meter_price_median'] = area_median_price(df_clean, area_stats.index, sketch_error)
+
+    tourism_min, tourism_max = tourism_range(df_clean['tourism_activity'], sketch_error)
+    return score_areas(area_stats, period_tourism, tourism_min, tourism_max,
+                       df_clean['avg_meter_price'].mean(), verbose)
+
+
+# مكونات المؤشر لكل منطقة من إحصاءاتها والقيم العامة للسوق (عمود لكل مكون)
+def score_components(area_stats, period_tourism, tourism_min, tourism_max, overall_mean_price,
+                     min_months=MIN_MONTHS, growth_min_months=GROWTH_MIN_MONTHS):
+    stats = area_stats[area_stats['count'] >= min_months]
+    months = stats['count'].to_numpy()
+    price_mean = stats['avg_meter_price_mean'].to_numpy()
+    price_std = stats['avg_meter_price_std'].to_numpy()
+    recent = period_tourism[True].reindex(stats.index).to_numpy()
+    old = period_tourism[False].reindex(stats.index).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # نمو السياحة
+        tourism_growth = np.where((months >= growth_min_months) & (old > 0),
+                                  ((recent - old) / old) * 100, 0.0)
+
+        # استقرار الأسعار
+        price_stability = np.where(price_mean > 0, 100 * (1 - price_std / price_mean), 0.0)
+
+        # جاذبية السعر
+        if overall_mean_price > 0:
+            price_attractiveness = np.maximum(0, 100 * (1 - price_mean / overall_mean_price))
+        else:
+            price_attractiveness = np.zeros(len(stats))
+
+    # مستوى السياحة الحالي (المناطق خارج حدود المئينات تأخذ 0 أو 100)
+    current_tourism = stats['tourism_activity_mean'].to_numpy()
+    tourism_percentile = np.clip((
+        (current_tourism - tourism_min) /
+        (tourism_max - tourism_min)
+    ) * 100, 0, 100)
+
+    components = pd.DataFrame({
+        'tourism_growth': tourism_growth,
+        'price_stability': price_stability,
+        # السيولة
+        'liquidity': stats['transactions_count_sum'].to_numpy() / months,
+        'tourism_level': tourism_percentile,
+        'price_attractiveness': price_attractiveness,
+        'current_tourism': current_tourism,
+        'avg_meter_price': price_mean,
+        'months': months,
+        'transactions': stats['transactions_count_sum'].to_numpy().astype(np.int64)
+    }, index=stats.index)
+    if 'avg_meter_price_median' in stats:
+        components['median_meter_price'] = stats['avg_meter_price_median'].to_numpy()
+    return components
+
+
+# المكونات بعد تطبيق الحدود، بنفس ترتيب SCORE_WEIGHTS
+def component_matrix(components):
+    return np.column_stack([
+        np.minimum(np.maximum(components['tourism_growth'].to_numpy(), GROWTH_BOUNDS[0]), GROWTH_BOUNDS[1]),
+        np.maximum(components['price_stability'].to_numpy(), STABILITY_MIN),
+        np.minimum(components['liquidity'].to_numpy() * LIQUIDITY_SCALE, LIQUIDITY_MAX),
+        components['tourism_level'].to_numpy(),
+        components['price_attractiveness'].to_numpy()
+    ])
+
+
+# المؤشر المركب: weights قاموس أوزان أو مصفوفة (سيناريو × مكون) لحساب عدة سيناريوهات دفعة واحدة
+def composite_score(components, weights=None):
+    if weights is None:
+        weights = SCORE_WEIGHTS
+    if isinstance(weights, dict):
+        weights = [[weights[name] for name in SCORE_WEIGHTS]]
+        single = True
     else:
-        return "Weak"
+        single = np.ndim(weights) == 1
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+
+    values = component_matrix(components)
+    score = values[:, 0] * weights[:, [0]]
+    for k in range(1, values.shape[1]):
+        score = score + values[:, k] * weights[:, [k]]
+
+    return score[0] if single else score
+
+
+def score_areas(area_stats, period_tourism, tourism_min, tourism_max, overall_mean_price, verbose=True):
+    components = score_components(area_stats, period_tourism, tourism_min,
+                                  tourism_max, overall_mean_price)
+
+    scores_df = pd.DataFrame({
+        'Area': components.index,
+        'Investment Score': np.round(composite_score(components), 2),
+        'Tourism Growth %': components['tourism_growth'].round(2).to_numpy(),
+        'Price Stability %': components['price_stability'].round(2).to_numpy(),
+        'Monthly Liquidity': components['liquidity'].round(2).to_numpy(),
+        'Tourism Level': components['current_tourism'].round(2).to_numpy(),
+        'Avg Meter Price': components['avg_meter_price'].round(2).to_numpy(),
+        'Months': components['months'].to_numpy(),
+        'Transactions': components['transactions'].to_numpy()
+    })
+    if 'median_meter_price' in components:
+        scores_df['Median Meter Price'] = components['median_meter_price'].round(2).to_numpy()
 
-scores_df['Rating'] = scores_df['Investment Score'].apply(classify)
+    if scores_df.empty:
+        if verbose:
+            print("No valid areas for scoring")
+        return None
 
-# تحليل فئات السعر
-price_bins = [0, 5000, 10000, 20000, 50000, float('inf')]
-price_labels = ['Low', 'Medium', 'High', 'Very High', 'Luxury']
-scores_df['Price Segment'] = pd.cut(scores_df['Avg Meter Price'],
-                                    bins=price_bins,
-                                    labels=price_labels)
+    scores_df = scores_df.sort_values('Investment Score', ascending=False)
+    if verbose:
+        print("Investment scoring completed")
 
-print("Price segmentation completed")
+    scores_df['Rating'] = scores_df['Investment Score'].apply(classify)
 
-# تحديد الفرص الخاصة
-emerging_areas = scores_df[
-    (scores_df['Tourism Growth %'] > 20) &
-    (scores_df['Avg Meter Price'] < df_clean['avg_meter_price'].mean())
-]
+    # تحليل فئات السعر (الوسيط فقط إذا حُسب، فالمجاميع المحفوظة في incremental لا تعطي وسيطاً)
+    segment_by = 'Median Meter Price' if SEGMENT_PRICE == 'median' and 'Median Meter Price' in scores_df else 'Avg Meter Price'
+    scores_df['Price Segment'] = pd.cut(scores_df[segment_by],
+                                        bins=PRICE_BINS,
+                                        labels=PRICE_LABELS)
 
-stable_areas = scores_df[
-    (scores_df['Price Stability %'] > 80) &
-    (scores_df['Monthly Liquidity'] > 3)
-]
+    if verbose:
+        print("Price segmentation completed")
+
+    # تحديد الفرص الخاصة
+    emerging_areas = scores_df[
+        (scores_df['Tourism Growth %'] > 20) &
+        (scores_df['Avg Meter Price'] < overall_mean_price)
+    ]
 
-print(f"Emerging areas: {len(emerging_areas)} | Stable areas: {len(stable_areas)}")
+    stable_areas = scores_df[
+        (scores_df['Price Stability %'] > 80) &
+        (scores_df['Monthly Liquidity'] > 3)
+    ]
+
+    if verbose:
+        print(f"Emerging areas: {len(emerging_areas)} | Stable areas: {len(stable_areas)}")
+
+    return {
+        'scores_df': scores_df,
+        'emerging_areas': emerging_areas,
+        'stable_areas': stable_areas
+    }
 
 
 #Drawing the charts
 #Chart 1
-top_10 = scores_df.head(10)
+def top_areas_chart(data):
+    import plotly.express as px
+
+    top_10 = data['scores_df'].head(10)
 
-chart1 = px.bar(top_10, x = "Investment Score", y = "Area", orientation="h", title = "Top 10 Investment Areas")
+    chart1 = px.bar(top_10, x = "Investment Score", y = "Area", orientation="h", title = "Top 10 Investment Areas")
 
-chart1.update_layout(title_x = 0.5, yaxis = dict(autorange = "reversed"), plot_bgcolor = "white")
+    chart1.update_layout(title_x = 0.5, yaxis = dict(autorange = "reversed"), plot_bgcolor = "white")
+
+    return chart1
 
-#Converting the chart to an html file (interactive)
-chart1.write_html("charts/chart-2.1.html", include_plotlyjs = "cdn")
 
 #Chart2
-rating_counts = scores_df['Rating'].value_counts().reset_index()
-rating_counts.columns = ["Rating", "Count"]
+def rating_chart(data):
+    import plotly.express as px
+
+    rating_counts = data['scores_df']['Rating'].value_counts().reset_index()
+    rating_counts.columns = ["Rating", "Count"]
+
+    chart2 = px.pie(rating_counts, names = "Rating", values = "Count", title = "Investment Rating Distribution")
 
-chart2 = px.pie(rating_counts, names = "Rating", values = "Count", title = "Investment Rating Distribution")
+    chart2.update_layout(title_x = 0.5)
+    chart2.update_traces(textinfo = "percent+label")
 
-chart2.update_layout(title_x = 0.5)
-chart2.update_traces(textinfo = "percent+label")
+    return chart2
 
-chart2.write_html("charts/chart-2.2.html", include_plotlyjs = "cdn")
 
 #Chart3
-chart3 = px.scatter(scores_df, x = "Avg Meter Price", y = "Investment Score", color = "Tourism Growth %", color_continuous_scale = "RdYlGn", title = "Price vs Investment Score (Tourism Growth Colored)", opacity = 0.7)
+def price_score_chart(data):
+    chart3 = scatter(data['scores_df'], x = "Avg Meter Price", y = "Investment Score", color = "Tourism Growth %", color_continuous_scale = "RdYlGn", title = "Price vs Investment Score (Tourism Growth Colored)", opacity = 0.7)
+
+    chart3.update_layout(title_x = 0.5, plot_bgcolor = "white")
+
+    return chart3
+
+
+# كل رسم: دالة بنائه والجداول التي يُبنى منها (تُكتب كملفات html تفاعلية)
+CHARTS = {
+    'chart-2.1': (top_areas_chart, ['scores_df']),
+    'chart-2.2': (rating_chart, ['scores_df']),
+    'chart-2.3': (price_score_chart, ['scores_df'])
+}
+
+
+def draw_charts(results, workers=None, force=False, verbose=True):
+    return render_charts(CHARTS, results, workers, force, verbose=verbose)
+
+
+if __name__ == "__main__":
+    # تحميل البيانات
+    print("Loading merged dataset...")
+    model = load_model()
 
-chart3.update_layout(title_x = 0.5, plot_bgcolor = "white")
+    results = analyze(view(model, COLUMNS, CLEAN_SUBSET))
+    if results is None:
+        exit()
 
-chart3.write_html("charts/chart-2.3.html", include_plotlyjs = "cdn")
\ No newline at end of file
+    draw_charts(results)
@@ -1,35 +1,65 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
+from chart_output import render_charts, scatter
+from compact import load_model, view
+from group_stats import group_codes, group_stats
+from rolling import group_positions, rolling_mean, shift
+import parallel
+import sketches
 import warnings
+from functools import partial
 warnings.filterwarnings("ignore")
 
-# تحميل البيانات
-print("Loading data...")
-df = pd.read_csv("E:/DS First Project/Dashboard/data/real_estate_tourism_merged.csv")
-
-# تنظيف وتجهيز البيانات الزمنية
-df_clean = df.dropna(subset=[
+# الأعمدة المستخدمة في تحليل المواسم وتحليل المخاطر
+SEASON_COLUMNS = ['year_month', 'area_name_en', 'property_type_en',
+                  'avg_meter_price', 'tourism_activity', 'transactions_count']
+SEASON_SUBSET = [
     'year_month',
     'avg_meter_price',
     'tourism_activity',
     'transactions_count'
-])
+]
 
-df_clean['year_month'] = pd.to_datetime(df_clean['year_month'])
-df_clean['year'] = df_clean['year_month'].dt.year
-df_clean['month'] = df_clean['year_month'].dt.month
-df_clean['quarter'] = df_clean['year_month'].dt.quarter
+RISK_COLUMNS = ['area_name_en', 'year_month', 'avg_meter_price',
+                'tourism_activity', 'transactions_count']
+RISK_SUBSET = [
+    'area_name_en',
+    'avg_meter_price',
+    'tourism_activity',
+    'transactions_count',
+    'year_month'
+]
+
+# نافذة تنعيم الأسعار والسياحة وإزاحة السياحة بالأشهر
+SMOOTH_WINDOW = 6
+SMOOTH_MIN_PERIODS = 3
+TOURISM_LAG = 3
+
+# أقل عدد صفوف لكل نوع عقار أو منطقة
+MIN_TIMING_ROWS = 100
+MIN_RISK_MONTHS = 18
+MIN_STABILITY_MONTHS = 24
+
+# أوزان نقاط الشراء
+BUY_SCORE_WEIGHTS = {
+    'price': 40,
+    'volatility': 30,
+    'transactions': 20,
+    'tourism': 10
+}
 
-print(f"Records: {len(df_clean)} | Years: {df_clean['year'].min()}–{df_clean['year'].max()}")
+SEASON_PARAMS = {
+    'min_timing_rows': MIN_TIMING_ROWS,
+    'buy_score_weights': BUY_SCORE_WEIGHTS
+}
 
-# التحليل الشهري المجمع
-monthly_stats = df_clean.groupby(['year', 'month']).agg({
-    'avg_meter_price': 'mean',
-    'tourism_activity': 'mean',
-    'transactions_count': 'sum',
-    'area_name_en': 'nunique'
-}).reset_index()
+RISK_PARAMS = {
+    'smooth_window': SMOOTH_WINDOW,
+    'smooth_min_periods': SMOOTH_MIN_PERIODS,
+    'tourism_lag': TOURISM_LAG,
+    'min_risk_months': MIN_RISK_MONTHS,
+    'min_stability_months': MIN_STABILITY_MONTHS
+}
 
 # أسماء الشهور
 month_names = {
@@ -38,92 +68,78 @@ month_names = {
     9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
 }
 
-monthly_stats['month_name'] = monthly_stats['month'].map(month_names)
-
-# حساب الأنماط الشهرية عبر السنوات
-monthly_patterns = monthly_stats.groupby('month').agg({
-    'avg_meter_price': ['mean', 'std', 'min', 'max'],
-    'tourism_activity': 'mean',
-    'transactions_count': 'mean',
-    'area_name_en': 'mean'
-}).round(2)
-
-monthly_patterns.columns = ['_'.join(c) for c in monthly_patterns.columns]
-monthly_patterns = monthly_patterns.reset_index()
-monthly_patterns['month_name'] = monthly_patterns['month'].map(month_names)
-
-print("Monthly patterns ready")
-
-# حساب نقاط الشراء
-def calculate_month_score(row):
-    score = 0
-
-    price_percentile = (
-        row['avg_meter_price_mean'] - monthly_patterns['avg_meter_price_mean'].min()
-    ) / (
-        monthly_patterns['avg_meter_price_mean'].max() -
-        monthly_patterns['avg_meter_price_mean'].min()
-    )
-    score += price_percentile * 40
-
-    volatility = (
-        row['avg_meter_price_std'] / row['avg_meter_price_mean']
-        if row['avg_meter_price_mean'] > 0 else 1
-    )
-    score += min(volatility * 100, 30)
-
-    transactions_percentile = (
-        row['transactions_count_mean'] - monthly_patterns['transactions_count_mean'].min()
-    ) / (
-        monthly_patterns['transactions_count_mean'].max() -
-        monthly_patterns['transactions_count_mean'].min()
-    )
-    score += transactions_percentile * 20
 
-    tourism_percentile = (
-        row['tourism_activity_mean'] - monthly_patterns['tourism_activity_mean'].min()
-    ) / (
-        monthly_patterns['tourism_activity_mean'].max() -
-        monthly_patterns['tourism_activity_mean'].min()
-    )
-    score += tourism_percentile * 10
-
-    return round(score, 2)
+# مكونات نقاط الشراء لكل شهر: ترتيب السعر، التذبذب (بالنسبة المئوية)، ترتيب الصفقات والسياحة
+def month_score_components(monthly_patterns):
+    def percentile(col):
+        values = monthly_patterns[col].to_numpy()
+        return (values - values.min()) / (values.max() - values.min())
+
+    price_mean = monthly_patterns['avg_meter_price_mean'].to_numpy()
+    price_std = monthly_patterns['avg_meter_price_std'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = np.where(price_mean > 0, price_std / price_mean, 1)
+
+    return np.column_stack([
+        percentile('avg_meter_price_mean'),
+        volatility * 100,
+        percentile('transactions_count_mean'),
+        percentile('tourism_activity_mean')
+    ])
+
+
+# حساب نقاط الشراء: وزن التذبذب هو أقصى عدد نقاط يضيفه
+# weights قاموس أو مصفوفة (سيناريو × مكون) لحساب عدة سيناريوهات دفعة واحدة
+def month_scores(monthly_patterns, weights=None):
+    if weights is None:
+        weights = BUY_SCORE_WEIGHTS
+    if isinstance(weights, dict):
+        weights = [[weights[name] for name in BUY_SCORE_WEIGHTS]]
+        single = True
+    else:
+        single = np.ndim(weights) == 1
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
 
-monthly_patterns['buy_score'] = monthly_patterns.apply(calculate_month_score, axis=1)
-monthly_patterns = monthly_patterns.sort_values('buy_score')
+    values = month_score_components(monthly_patterns)
+    score = values[:, 0] * weights[:, [0]]
+    score = score + np.minimum(values[:, 1], weights[:, [1]])
+    score = score + values[:, 2] * weights[:, [2]]
+    score = score + values[:, 3] * weights[:, [3]]
 
-print("Month ranking calculated")
+    score = np.round(score, 2)
+    return score[0] if single else score
 
-# مقارنة الشتاء والصيف
-winter = df_clean[df_clean['month'].isin([12, 1, 2])]
-summer = df_clean[df_clean['month'].isin([6, 7, 8])]
 
-if not winter.empty and not summer.empty:
-    winter_price = winter['avg_meter_price'].mean()
-    summer_price = summer['avg_meter_price'].mean()
+# حساب الأنماط الشهرية عبر السنوات وترتيب الأشهر حسب نقاط الشراء
+def patterns_table(monthly_stats, verbose=True):
+    monthly_patterns = monthly_stats.groupby('month').agg({
+        'avg_meter_price': ['mean', 'std', 'min', 'max'],
+        'tourism_activity': 'mean',
+        'transactions_count': 'mean',
+        'area_name_en': 'mean'
+    }).round(2)
 
-    better_season = "Summer" if summer_price < winter_price else "Winter"
-    print(f"Seasonal comparison done | Better buying season: {better_season}")
+    monthly_patterns.columns = ['_'.join(c) for c in monthly_patterns.columns]
+    monthly_patterns = monthly_patterns.reset_index()
+    monthly_patterns['month_name'] = monthly_patterns['month'].map(month_names)
 
-# تحديد التوقيت حسب نوع العقار
-property_timing = {}
+    if verbose:
+        print("Monthly patterns ready")
 
-for prop in df_clean['property_type_en'].dropna().unique():
-    prop_data = df_clean[df_clean['property_type_en'] == prop]
+    monthly_patterns['buy_score'] = month_scores(monthly_patterns)
+    monthly_patterns = monthly_patterns.sort_values('buy_score')
 
-    if len(prop_data) < 100:
-        continue
+    if verbose:
+        print("Month ranking calculated")
+    return monthly_patterns
 
-    prop_monthly = prop_data.groupby('month').agg({
-        'avg_meter_price': 'mean',
-        'transactions_count': 'sum'
-    }).reset_index()
 
+# أرخص شهر وأنشط شهر لنوع عقار من متوسط سعره ومجموع صفقاته في كل شهر
+def timing(prop_monthly):
     cheapest = prop_monthly.loc[prop_monthly['avg_meter_price'].idxmin()]
     busiest = prop_monthly.loc[prop_monthly['transactions_count'].idxmax()]
 
-    property_timing[prop] = {
+    return {
         'best_price_month': month_names[cheapest['month']],
         'best_price': cheapest['avg_meter_price'],
         'highest_activity_month': month_names[busiest['month']],
@@ -134,202 +150,330 @@ for prop in df_clean['property_type_en'].dropna().unique():
         ) * 100
     }
 
-print(f"Property timing calculated for {len(property_timing)} types")
 
-# تحميل البيانات
-print("Loading data...")
-df = pd.read_csv(
-    "E:/DS First Project/Dashboard/data/real_estate_tourism_merged.csv"
-)
+# sketch_error: الخطأ المعياري النسبي لعدد المناطق في كل شهر (None يعني العدّ بالضبط)
+def analyze_seasons(df_clean, sketch_error=None, verbose=True):
+    df_clean['year'] = df_clean['year_month'].dt.year
+    df_clean['month'] = df_clean['year_month'].dt.month
+    df_clean['quarter'] = df_clean['year_month'].dt.quarter
 
-# تنظيف القيم الأساسية
-df = df.dropna(subset=[
-    'area_name_en',
-    'avg_meter_price',
-    'tourism_activity',
-    'transactions_count',
-    'year_month'
-])
+    if verbose:
+        print(f"Records: {len(df_clean)} | Years: {df_clean['year'].min()}–{df_clean['year'].max()}")
 
-df['year_month'] = pd.to_datetime(df['year_month'])
-df = df.sort_values(['area_name_en', 'year_month'])
+    # التحليل الشهري المجمع
+    monthly_stats = df_clean.groupby(['year', 'month']).agg({
+        'avg_meter_price': 'mean',
+        'tourism_activity': 'mean',
+        'transactions_count': 'sum'
+    }).reset_index()
 
-print(f"Records loaded: {len(df)}")
-print(f"Areas detected: {df['area_name_en'].nunique()}")
+    # عدد المناطق المختلفة في كل شهر (بنفس ترتيب الأشهر في الجدول)
+    codes, months = group_codes(df_clean, ['year', 'month'], sort=True)
+    monthly_stats['area_name_en'] = sketches.group_nunique(df_clean['area_name_en'], codes,
+                                                           len(months), sketch_error)
 
-# تنعيم الأسعار والنشاط السياحي
-df['price_smooth'] = (
-    df.groupby('area_name_en')['avg_meter_price']
-    .transform(lambda x: x.rolling(6, min_periods=3).mean())
-)
+    monthly_stats['month_name'] = monthly_stats['month'].map(month_names)
 
-df['tourism_smooth'] = (
-    df.groupby('area_name_en')['tourism_activity']
-    .transform(lambda x: x.rolling(6, min_periods=3).mean())
-)
+    monthly_patterns = patterns_table(monthly_stats, verbose)
 
-# إزاحة السياحة زمنياً (تأثير متأخر)
-df['tourism_lag_3'] = (
-    df.groupby('area_name_en')['tourism_smooth']
-    .shift(3)
-)
+    # مقارنة الشتاء والصيف
+    winter = df_clean[df_clean['month'].isin([12, 1, 2])]
+    summer = df_clean[df_clean['month'].isin([6, 7, 8])]
 
-# تحليل المخاطر المركبة
-risk_rows = []
+    winter_price = summer_price = None
+    if not winter.empty and not summer.empty:
+        winter_price = winter['avg_meter_price'].mean()
+        summer_price = summer['avg_meter_price'].mean()
 
-for area in df['area_name_en'].unique():
-    area_df = df[df['area_name_en'] == area].dropna()
+        better_season = "Summer" if summer_price < winter_price else "Winter"
+        if verbose:
+            print(f"Seasonal comparison done | Better buying season: {better_season}")
 
-    if len(area_df) < 18:
-        continue
+    # تحديد التوقيت حسب نوع العقار
+    property_timing = {}
 
-    risk_score = 0
-    notes = []
+    for prop in df_clean['property_type_en'].dropna().unique():
+        prop_data = df_clean[df_clean['property_type_en'] == prop]
 
-    price_mean = area_df['price_smooth'].mean()
-    price_vol = area_df['price_smooth'].std() / price_mean
+        if len(prop_data) < MIN_TIMING_ROWS:
+            continue
 
-    if price_vol > 0.4:
-        risk_score += 25
-        notes.append("High price volatility")
+        prop_monthly = prop_data.groupby('month').agg({
+            'avg_meter_price': 'mean',
+            'transactions_count': 'sum'
+        }).reset_index()
 
-    corr_lag = area_df['price_smooth'].corr(area_df['tourism_lag_3'])
-    if abs(corr_lag) > 0.6:
-        risk_score += 25
-        notes.append("Lagged tourism sensitivity")
+        property_timing[prop] = timing(prop_monthly)
 
-    avg_tx = area_df['transactions_count'].mean()
-    if avg_tx < 2:
-        risk_score += 20
-        notes.append("Low liquidity")
+    if verbose:
+        print(f"Property timing calculated for {len(property_timing)} types")
 
-    market_price = df['price_smooth'].mean()
-    if price_mean > market_price * 1.4:
-        risk_score += 15
-        notes.append("Above market pricing")
+    return {
+        'monthly_stats': monthly_stats,
+        'monthly_patterns': monthly_patterns,
+        'winter_price': winter_price,
+        'summer_price': summer_price,
+        'property_timing': property_timing
+    }
 
-    risk_rows.append({
-        'area': area,
-        'risk_score': risk_score,
-        'price_volatility': round(price_vol, 3),
-        'tourism_corr_lagged': round(corr_lag, 3),
-        'avg_price': round(price_mean, 2),
-        'avg_transactions': round(avg_tx, 2),
-        'notes': " | ".join(notes)
-    })
 
-risk_df = pd.DataFrame(risk_rows).sort_values('risk_score', ascending=False)
-print(f"High risk areas detected: {len(risk_df[risk_df['risk_score'] >= 50])}")
+# تصنيف استقرار الأسعار لكل منطقة من إحصاءات السعر المنعّم
+def stability_table(area_stats):
+    stability_rows = []
+
+    for area, row in area_stats.iterrows():
+        if row['count'] < MIN_STABILITY_MONTHS:
+            continue
+
+        price_mean = row['price_smooth_mean']
+        price_std = row['price_smooth_std']
+        price_cv = (price_std / price_mean) * 100 if price_mean > 0 else 0
+
+        if price_cv < 15:
+            stability = "Very Stable"
+        elif price_cv < 25:
+            stability = "Stable"
+        elif price_cv < 40:
+            stability = "Moderate"
+        else:
+            stability = "Volatile"
+
+        stability_rows.append({
+            'area': area,
+            'price_volatility_%': round(price_cv, 2),
+            'stability_class': stability,
+            'avg_price': round(price_mean, 2),
+            'transactions': int(row['transactions_count_sum'])
+        })
+
+    return pd.DataFrame(stability_rows).sort_values('price_volatility_%')
+
+
+# تنعيم الأسعار والنشاط السياحي وإزاحة السياحة زمنياً (تأثير متأخر)
+# البيانات مرتبة حسب المنطقة ثم الشهر، والنتيجة إحصاءات كل منطقة على الصفوف المكتملة فقط
+def smooth_area_stats(df, window=SMOOTH_WINDOW, min_periods=SMOOTH_MIN_PERIODS, lag=TOURISM_LAG):
+    positions = group_positions(df['area_name_en'])
+    lag_column = f"tourism_lag_{lag}"
+
+    df['price_smooth'] = rolling_mean(df['avg_meter_price'], positions, window, min_periods)
+    df['tourism_smooth'] = rolling_mean(df['tourism_activity'], positions, window, min_periods)
+    df[lag_column] = shift(df['tourism_smooth'], positions, lag)
+
+    return group_stats(df, 'area_name_en',
+                       ['price_smooth', 'transactions_count'],
+                       pairs=[('price_smooth', lag_column)],
+                       mask=df.notna().all(axis=1))
+
+
+def analyze_risk(df, window=SMOOTH_WINDOW, min_periods=SMOOTH_MIN_PERIODS, lag=TOURISM_LAG, workers=1, verbose=True):
+    df = df.sort_values(['area_name_en', 'year_month'])
+
+    if verbose:
+        print(f"Records loaded: {len(df)}")
+        print(f"Areas detected: {df['area_name_en'].nunique()}")
+
+    # كل منطقة مستقلة: يمكن توزيع المناطق على عدة عمليات
+    if parallel.use_processes(len(df), workers):
+        parts, smoothed, areas = parallel.map_areas(
+            df, ['avg_meter_price', 'tourism_activity', 'transactions_count'],
+            partial(smooth_area_stats, window=window, min_periods=min_periods, lag=lag),
+            workers, outputs=['price_smooth'])
+        area_stats = parallel.combine(parts, areas)
+        market_price = pd.Series(smoothed['price_smooth']).mean()
+    else:
+        area_stats = smooth_area_stats(df, window, min_periods, lag)
+        market_price = df['price_smooth'].mean()
 
-# تحليل الاعتماد على السياحة المتأخرة
-dependency_rows = []
+    return risk_tables(area_stats, market_price, lag, verbose)
 
-for area in df['area_name_en'].unique():
-    area_df = df[df['area_name_en'] == area].dropna()
 
-    if len(area_df) < 18:
-        continue
+# جداول المخاطر والاعتماد على السياحة والاستقرار من إحصاءات المناطق
+def risk_tables(area_stats, market_price, lag=TOURISM_LAG, verbose=True):
+    lag_column = f"tourism_lag_{lag}"
 
-    corr = area_df['price_smooth'].corr(area_df['tourism_lag_3'])
+    # تحليل المخاطر المركبة
+    risk_rows = []
 
-    dependency_rows.append({
-        'area': area,
-        'tourism_dependency_lagged': round(corr, 3),
-        'avg_price': round(area_df['price_smooth'].mean(), 2)
-    })
+    for area, row in area_stats.iterrows():
+        if row['count'] < MIN_RISK_MONTHS:
+            continue
 
-dependency_df = pd.DataFrame(dependency_rows)
-print("Dependency analysis completed")
+        risk_score = 0
+        notes = []
 
-# تحليل استقرار الأسعار
-stability_rows = []
+        price_mean = row['price_smooth_mean']
+        price_vol = row['price_smooth_std'] / price_mean
 
-for area in df['area_name_en'].unique():
-    area_df = df[df['area_name_en'] == area].dropna()
+        if price_vol > 0.4:
+            risk_score += 25
+            notes.append("High price volatility")
 
-    if len(area_df) < 24:
-        continue
+        corr_lag = row[f'corr_price_smooth_{lag_column}']
+        if abs(corr_lag) > 0.6:
+            risk_score += 25
+            notes.append("Lagged tourism sensitivity")
 
-    price_mean = area_df['price_smooth'].mean()
-    price_std = area_df['price_smooth'].std()
-    price_cv = (price_std / price_mean) * 100 if price_mean > 0 else 0
+        avg_tx = row['transactions_count_mean']
+        if avg_tx < 2:
+            risk_score += 20
+            notes.append("Low liquidity")
 
-    if price_cv < 15:
-        stability = "Very Stable"
-    elif price_cv < 25:
-        stability = "Stable"
-    elif price_cv < 40:
-        stability = "Moderate"
-    else:
-        stability = "Volatile"
+        if price_mean > market_price * 1.4:
+            risk_score += 15
+            notes.append("Above market pricing")
+
+        risk_rows.append({
+            'area': area,
+            'risk_score': risk_score,
+            'price_volatility': round(price_vol, 3),
+            'tourism_corr_lagged': round(corr_lag, 3),
+            'avg_price': round(price_mean, 2),
+            'avg_transactions': round(avg_tx, 2),
+            'notes': " | ".join(notes)
+        })
+
+    risk_df = pd.DataFrame(risk_rows).sort_values('risk_score', ascending=False)
+    if verbose:
+        print(f"High risk areas detected: {len(risk_df[risk_df['risk_score'] >= 50])}")
+
+    # تحليل الاعتماد على السياحة المتأخرة
+    dependency_rows = []
 
-    stability_rows.append({
-        'area': area,
-        'price_volatility_%': round(price_cv, 2),
-        'stability_class': stability,
-        'avg_price': round(price_mean, 2),
-        'transactions': int(area_df['transactions_count'].sum())
-    })
+    for area, row in area_stats.iterrows():
+        if row['count'] < MIN_RISK_MONTHS:
+            continue
+
+        corr = row[f'corr_price_smooth_{lag_column}']
+
+        dependency_rows.append({
+            'area': area,
+            'tourism_dependency_lagged': round(corr, 3),
+            'avg_price': round(row['price_smooth_mean'], 2)
+        })
+
+    dependency_df = pd.DataFrame(dependency_rows)
+    if verbose:
+        print("Dependency analysis completed")
+
+    # تحليل استقرار الأسعار
+    stability_df = stability_table(area_stats)
+    if verbose:
+        print(f"Stability analysis completed: {len(stability_df)} areas")
+
+    return {
+        'risk_df': risk_df,
+        'dependency_df': dependency_df,
+        'stability_df': stability_df
+    }
 
-stability_df = pd.DataFrame(stability_rows).sort_values('price_volatility_%')
-print(f"Stability analysis completed: {len(stability_df)} areas")
 
 #Drawing the charts
 #Chart 1
-monthly_pivot = monthly_stats.pivot(index = 'month', columns = 'year', values = 'avg_meter_price')
+def monthly_trends_chart(data):
+    import plotly.express as px
+
+    monthly_pivot = data['monthly_stats'].pivot(index = 'month', columns = 'year', values = 'avg_meter_price')
+
+    monthly_pivot.index = monthly_pivot.index.map(month_names)
+    monthly_pivot = monthly_pivot.reset_index()
 
-monthly_pivot.index = monthly_pivot.index.map(month_names)
-monthly_pivot = monthly_pivot.reset_index()
+    chart1 = px.line(monthly_pivot, x = 'month', y = monthly_pivot.columns[1:], title = "Monthly Price Trends")
 
-chart1 = px.line(monthly_pivot, x = 'month', y = monthly_pivot.columns[1:], title = "Monthly Price Trends")
+    chart1.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Month", yaxis_title = "Average Meter Price")
 
-chart1.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Month", yaxis_title = "Average Meter Price")
+    return chart1
 
-chart1.write_html("charts/chart-3.1.html", include_plotlyjs = "cdn")
 
 #Chart 2
-sorted_months = monthly_patterns.sort_values('buy_score')
+def buy_months_chart(data):
+    import plotly.express as px
 
-chart2 = px.bar(sorted_months, x = "buy_score", y = "month_name", orientation = "h", title = "Best Months to Buy")
+    sorted_months = data['monthly_patterns'].sort_values('buy_score')
 
-chart2.update_layout(title_x = 0.5, yaxis_autorange = "reversed", plot_bgcolor = "white", xaxis_title = "Buy Score", yaxis_title = "Month Name")
+    chart2 = px.bar(sorted_months, x = "buy_score", y = "month_name", orientation = "h", title = "Best Months to Buy")
+
+    chart2.update_layout(title_x = 0.5, yaxis_autorange = "reversed", plot_bgcolor = "white", xaxis_title = "Buy Score", yaxis_title = "Month Name")
+
+    return chart2
 
-chart2.write_html("charts/chart-3.2.html", include_plotlyjs = "cdn")
 
 #Chart 3
-season_df = pd.DataFrame({"Season": ["Winter", "Summer"],"Average Price": [winter_price, summer_price]})
+def season_chart(data):
+    import plotly.express as px
+
+    if data['winter_price'] is None:
+        return None
 
-chart3 = px.bar(season_df, x = "Season", y = "Average Price", title = "Seasonal Price Comparison")
+    season_df = pd.DataFrame({"Season": ["Winter", "Summer"],"Average Price": [data['winter_price'], data['summer_price']]})
 
-chart3.update_layout(title_x = 0.5, plot_bgcolor="white")
+    chart3 = px.bar(season_df, x = "Season", y = "Average Price", title = "Seasonal Price Comparison")
+
+    chart3.update_layout(title_x = 0.5, plot_bgcolor="white")
+
+    return chart3
 
-chart3.write_html("charts/chart-3.3.html", include_plotlyjs = "cdn")
 
 #Chart 4
-top_risk = risk_df.head(15)
+def risk_chart(data):
+    import plotly.express as px
+
+    top_risk = data['risk_df'].head(15)
+
+    chart4 = px.bar(top_risk, x = "risk_score", y = "area", orientation = "h", title = "Top High Risk Areas", color_discrete_sequence = ["#e74c3c"])
 
-chart4 = px.bar(top_risk, x = "risk_score", y = "area", orientation = "h", title = "Top High Risk Areas", color_discrete_sequence = ["#e74c3c"])
+    chart4.update_layout(title_x = 0.5, yaxis_autorange = "reversed", plot_bgcolor = "white", xaxis_title = "Risk Score", yaxis_title = "Area")
 
-chart4.update_layout(title_x = 0.5, yaxis_autorange = "reversed", plot_bgcolor = "white", xaxis_title = "Risk Score", yaxis_title = "Area")
+    return chart4
 
-chart4.write_html("charts/chart-3.4.html", include_plotlyjs = "cdn")
 
 #Chart 5
-chart5 = px.scatter(dependency_df, x = "tourism_dependency_lagged", y = "avg_price", title = "Lagged Tourism Sensitivity vs Avg Price", opacity = 0.7, color_discrete_sequence = ["#3498db"])
+def dependency_chart(data):
+    chart5 = scatter(data['dependency_df'], x = "tourism_dependency_lagged", y = "avg_price", title = "Lagged Tourism Sensitivity vs Avg Price", opacity = 0.7, color_discrete_sequence = ["#3498db"])
 
-chart5.add_vline(x = 0, line_dash = "dash", line_color = "red", opacity = 0.6)
+    chart5.add_vline(x = 0, line_dash = "dash", line_color = "red", opacity = 0.6)
 
-chart5.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Lagged Tourism Dependency", yaxis_title = "Average Price")
+    chart5.update_layout(title_x = 0.5, plot_bgcolor = "white", xaxis_title = "Lagged Tourism Dependency", yaxis_title = "Average Price")
+
+    return chart5
 
-chart5.write_html("charts/chart-3.5.html", include_plotlyjs = "cdn")
 
 #Chart 6
-stability_counts = stability_df['stability_class'].value_counts().reset_index()
-stability_counts.columns = ["Stability Class", "Count"]
+def stability_chart(data):
+    import plotly.express as px
+
+    stability_counts = data['stability_df']['stability_class'].value_counts().reset_index()
+    stability_counts.columns = ["Stability Class", "Count"]
+
+    chart6 = px.pie(stability_counts, names = "Stability Class", values = "Count", title = "Price Stability Distribution", color_discrete_sequence = ["#27ae60", "#3498db", "#f39c12", "#e74c3c"])
+
+    chart6.update_layout(title_x = 0.5)
+    chart6.update_traces(textinfo = "percent+label")
+
+    return chart6
+
+
+# كل رسم: دالة بنائه والجداول والقيم التي يُبنى منها
+CHARTS = {
+    'chart-3.1': (monthly_trends_chart, ['monthly_stats']),
+    'chart-3.2': (buy_months_chart, ['monthly_patterns']),
+    'chart-3.3': (season_chart, ['winter_price', 'summer_price']),
+    'chart-3.4': (risk_chart, ['risk_df']),
+    'chart-3.5': (dependency_chart, ['dependency_df']),
+    'chart-3.6': (stability_chart, ['stability_df'])
+}
+
+
+def draw_charts(results, workers=None, force=False, verbose=True):
+    return render_charts(CHARTS, results, workers, force, verbose=verbose)
+
 
-chart6 = px.pie(stability_counts, names = "Stability Class", values = "Count", title = "Price Stability Distribution", color_discrete_sequence = ["#27ae60", "#3498db", "#f39c12", "#e74c3c"])
+if __name__ == "__main__":
+    # تحميل البيانات
+    print("Loading data...")
+    model = load_model()
 
-chart6.update_layout(title_x = 0.5)
-chart6.update_traces(textinfo = "percent+label")
+    # كل تحليل يأخذ أعمدته فقط من النموذج المضغوط بدل نسختين كاملتين من الجدول
+    results = analyze_seasons(view(model, SEASON_COLUMNS, SEASON_SUBSET))
+    results.update(analyze_risk(view(model, RISK_COLUMNS, RISK_SUBSET)))
 
-chart6.write_html("charts/chart-3.6.html", include_plotlyjs="cdn")
\ No newline at end of file
+    draw_charts(results)
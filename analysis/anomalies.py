@@ -0,0 +1,155 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from compact import load_model, valid, view
+
+# الأعمدة المستخدمة في الكشف
+COLUMNS = ['area_name_en', 'property_type_en', 'year_month', 'avg_meter_price', 'transactions_count']
+SUBSET = ['area_name_en', 'property_type_en', 'year_month', 'avg_meter_price']
+
+# عدد الأشهر المرصودة قبل كل شهر وبعده في نافذة السلسلة (المنطقة، نوع العقار)، والشهر نفسه خارجها
+HALF_WINDOW = 6
+# أقل عدد جيران في النافذة للحكم على الشهر
+MIN_NEIGHBORS = 6
+# حد الانحراف المعياري القوي (MAD × 1.4826) على لوغاريتم السعر، وأقل مقياس حتى لا تُعلَّم تغيرات صغيرة في سلسلة ثابتة
+# الحد 8 مع أقل مقياس 0.1 يعني سعراً أكبر من 2.2 ضعف وسيط جيرانه على الأقل أو أقل من 0.45 منه
+THRESHOLD = 8
+MAD_SCALE = 1.4826
+MIN_SCALE = 0.1
+# عدد الصفوف في كل دفعة (مصفوفة النوافذ صفوف × (2 × HALF_WINDOW + 1))
+BATCH_ROWS = 250_000
+
+# ما يحدث للقيم الشاذة قبل التحليلات: "off" تقرير فقط، "flag" استبعاد صفوفها،
+# "winsorize" قص سعرها إلى حد النافذة
+# الافتراضي القص: يبقي عدد الصفقات والأشهر كما هو فيغيّر نتائج أقل من الاستبعاد
+# السكربتات المستقلة وincremental وstreaming تقرأ الأسعار الأصلية (الفرق في README)
+MODES = ['off', 'flag', 'winsorize']
+MODE = 'winsorize'
+
+PARAMS = {
+    'half_window': HALF_WINDOW,
+    'min_neighbors': MIN_NEIGHBORS,
+    'threshold': THRESHOLD,
+    'mad_scale': MAD_SCALE,
+    'min_scale': MIN_SCALE
+}
+
+
+# وسيط كل صف في مصفوفة مرتبة (القيم الفارغة في آخر الصف)، وcount عدد القيم غير الفارغة
+def sorted_median(ordered, count):
+    rows = np.arange(len(ordered))
+    low = ordered[rows, np.maximum(count - 1, 0) // 2]
+    high = ordered[rows, count // 2 - (count == 0)]
+    return np.where(count > 0, (low + high) / 2, np.nan)
+
+
+# الوسيط والانحراف المطلق الوسيط لجيران كل صف داخل سلسلته (بدون الصف نفسه)
+# القيم مرتبة حسب السلسلة ثم الشهر وseries رقم سلسلة كل صف؛ بين السلاسل half_window قيمة فارغة
+# فتكون نافذة كل صف شريحة من المصفوفة الممدودة لا تتجاوز سلسلته
+def rolling_median_mad(values, series, half_window=HALF_WINDOW, batch_rows=BATCH_ROWS):
+    n = len(values)
+    position = np.arange(n) + half_window * (series + 1)
+    n_series = int(series[-1]) + 1 if n else 0
+    padded = np.full(max(n + half_window * (n_series + 1), 2 * half_window + 1), np.nan)
+    padded[position] = values
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half_window + 1)
+
+    median = np.empty(n)
+    mad = np.empty(n)
+    count = np.empty(n, dtype=np.int64)
+    for start in range(0, n, batch_rows):
+        rows = slice(start, min(start + batch_rows, n))
+        window = windows[position[rows] - half_window]
+        window[:, half_window] = np.nan
+
+        count[rows] = (~np.isnan(window)).sum(axis=1)
+        window.sort(axis=1)
+        median[rows] = sorted_median(window, count[rows])
+        deviation = np.abs(window - median[rows, None])
+        deviation.sort(axis=1)
+        mad[rows] = sorted_median(deviation, count[rows])
+    return median, mad, count
+
+
+# z قوي لكل صف على لوغاريتم السعر مقارنة بجيرانه في نفس السلسلة، والصفوف الشاذة وسعرها بعد القص
+def detect(df, rows=None, half_window=HALF_WINDOW, min_neighbors=MIN_NEIGHBORS, threshold=THRESHOLD, verbose=True):
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+    area = pd.Categorical(df['area_name_en']).codes
+    kind = pd.Categorical(df['property_type_en']).codes
+    month = df['year_month'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    order = np.lexsort((month, kind, area))
+
+    area, kind = area[order], kind[order]
+    series = np.cumsum(np.r_[False, (area[1:] != area[:-1]) | (kind[1:] != kind[:-1])])[:len(order)]
+
+    price = df['avg_meter_price'].to_numpy(dtype=np.float64)[order]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_price = np.where(price > 0, np.log(price), np.nan)
+    median, mad, count = rolling_median_mad(log_price, series, half_window)
+
+    scale = np.maximum(MAD_SCALE * mad, MIN_SCALE)
+    with np.errstate(invalid='ignore'):
+        z = (log_price - median) / scale
+        flagged = (count >= min_neighbors) & (np.abs(z) > threshold)
+    hit = order[flagged]
+    found = df.iloc[hit]
+
+    report = pd.DataFrame({
+        'row': rows[hit],
+        'area': found['area_name_en'].astype(str).to_numpy(),
+        'property_type': found['property_type_en'].astype(str).to_numpy(),
+        'month': np.datetime_as_string(month[hit].astype('datetime64[M]')),
+        'transactions': found['transactions_count'].to_numpy(),
+        'avg_meter_price': np.round(price[flagged], 2),
+        'expected_price': np.round(np.exp(median[flagged]), 2),
+        'z_score': np.round(z[flagged], 2),
+        'winsorized_price': np.round(np.exp(median[flagged] + np.sign(z[flagged]) * threshold * scale[flagged]), 2)
+    })
+    report = report.iloc[np.argsort(-np.abs(report['z_score'].to_numpy()), kind='stable')].reset_index(drop=True)
+
+    if verbose:
+        single = int((report['transactions'] == 1).sum())
+        print(f"Anomalies: {len(report)} of {len(df)} rows ({single} with a single transaction)")
+    return {'report_df': report}
+
+
+# الكشف على كل صفوف جدول الحقائق المكتملة في SUBSET
+def detect_model(model, verbose=True):
+    mask = valid(model, SUBSET)
+    return detect(view(model, COLUMNS, mask=mask), rows=np.flatnonzero(mask), verbose=verbose)
+
+
+# تطبيق التقرير على صفوف جدول الحقائق قبل التحليلات: قناع الصفوف المستبعدة أو عمود السعر بعد القص
+def apply(facts, mask, report, mode=MODE):
+    if mode == 'off' or report.empty:
+        return facts, mask
+    rows = report['row'].to_numpy()
+    if mode == 'flag':
+        mask = mask.copy()
+        mask[rows] = False
+        return facts, mask
+    if mode == 'winsorize':
+        price = facts['avg_meter_price'].to_numpy().copy()
+        price[rows] = report['winsorized_price'].to_numpy()
+        return facts.assign(avg_meter_price=price), mask
+    raise ValueError(f"unknown anomaly mode: {mode} (expected one of {', '.join(MODES)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report price anomalies per (area, property type) series")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--out", help="CSV file for the anomaly report")
+    args = parser.parse_args()
+
+    report = detect_model(load_model(args.data))['report_df']
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"Report written to {args.out}")
+    else:
+        print(report.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import pandas as pd
+
+import bootstrap
+import synthetic
+from data_loader import CACHE_DIR, fresh_snapshot
+from profiling import number
+
+# أحجام القياس الافتراضية
+SIZES = ['10k', '1m', '10m']
+STAGES = ['correlation', 'investment', 'seasonality', 'risk', 'lags']
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(CACHE_DIR, "bench")
+# الأزمنة تعتمد على الجهاز، فالملف خارج git وأول تشغيل على كل جهاز ينشئه بـ --save-baseline
+BASELINE_PATH = os.path.join(ANALYSIS_DIR, "benchmark_baseline.json")
+
+# يعتبر تراجعاً إذا زاد الوقت أو الذاكرة بأكثر من النسبة، وزاد الوقت بأكثر من MIN_SECONDS
+TOLERANCE = 0.25
+MIN_SECONDS = 0.05
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1])
+    return int(float(text[:-1]) * scale) if scale else int(text)
+
+
+# البيانات المولدة تُحفظ وتُعاد لنفس الإعدادات، مع نسختها العمودية جاهزة
+def dataset(rows, areas=None, n_types=4, months=synthetic.MONTHS, seed=0):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    name = f"synthetic_{rows}_{areas or 'auto'}_{n_types}_{months}_{seed}.csv"
+    path = os.path.join(BENCH_DIR, name)
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows...")
+        synthetic.generate(path, rows, areas, n_types, months, seed=seed)
+        fresh_snapshot(path)
+    return path
+
+
+# كل حجم يُقاس في عملية مستقلة حتى لا تختلط ذاكرة الأحجام
+def run_size(path, stages, processes=1, interval_method='bootstrap'):
+    report = path + ".report.json"
+    command = [sys.executable, os.path.join(ANALYSIS_DIR, "run_all.py"),
+               "--data", path, "--no-cache", "--only", ",".join(stages), "--report", report,
+               "--processes", str(processes), "--interval-method", interval_method]
+    subprocess.run(command, cwd=BENCH_DIR, check=True, stdout=subprocess.DEVNULL)
+    with open(report) as f:
+        return json.load(f)
+
+
+def summarize(report):
+    stages = {
+        name: {key: record[key] for key in ('wall_s', 'cpu_s', 'peak_rss_mb', 'rows_in', 'rows_out')}
+        for name, record in report['stages'].items()
+    }
+    peaks = [record['peak_rss_mb'] for record in stages.values() if record['peak_rss_mb'] is not None]
+    return {
+        'rows': stages['load']['rows_out'],
+        'total_s': report['total_s'],
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'stages': stages
+    }
+
+
+# مقارنة كل مرحلة بنفس الحجم في الأساس المحفوظ
+# مرحلة الارتباط تُقارن فقط إذا حُسبت فتراتها بنفس الطريقة
+def compare(results, baseline, tolerance=TOLERANCE, min_seconds=MIN_SECONDS):
+    regressions = []
+    same_method = baseline.get('interval_method', 'bootstrap') == results.get('interval_method', 'bootstrap')
+    for size, result in results['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if base is None:
+            continue
+        for name, record in result['stages'].items():
+            old = base['stages'].get(name)
+            if old is None or (name == 'correlation' and not same_method):
+                continue
+            wall, old_wall = record['wall_s'], old['wall_s']
+            if wall > old_wall * (1 + tolerance) and wall - old_wall > min_seconds:
+                regressions.append(f"{size} {name}: {old_wall:.3f}s -> {wall:.3f}s")
+            memory, old_memory = record['peak_rss_mb'], old['peak_rss_mb']
+            if memory is not None and old_memory is not None and memory > old_memory * (1 + tolerance):
+                regressions.append(f"{size} {name}: peak {old_memory:.0f} MB -> {memory:.0f} MB")
+    return regressions
+
+
+def print_results(results):
+    for size, result in results['sizes'].items():
+        print()
+        print(f"{size}: {result['rows']} rows, {result['total_s']:.3f}s, "
+              f"peak {number(result['peak_rss_mb'], '.0f')} MB")
+        print(f"{'Stage':<14}{'Wall (s)':>10}{'CPU (s)':>10}{'Peak MB':>10}")
+        for name, record in result['stages'].items():
+            print(f"{name:<14}{record['wall_s']:>10.3f}{number(record.get('cpu_s'), '.3f'):>10}"
+                  f"{number(record.get('peak_rss_mb'), '.0f'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the analysis stages on synthetic data of growing size")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="comma separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument("--areas", type=int, help="number of areas (default: scales with the rows)")
+    parser.add_argument("--property-types", type=int, default=4)
+    parser.add_argument("--months", type=int, default=synthetic.MONTHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for the per-area analytics")
+    parser.add_argument("--interval-method", choices=bootstrap.METHODS, default='bootstrap',
+                        help="area correlation intervals (fisher skips the resampling)")
+    parser.add_argument("--charts", action="store_true", help="also time the chart stages")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before flagging, e.g. 0.25")
+    parser.add_argument("--out", help="JSON file for the results")
+    args = parser.parse_args()
+
+    stages = STAGES + (['charts1', 'charts2', 'charts3'] if args.charts else [])
+    results = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'interval_method': args.interval_method,
+        'sizes': {}
+    }
+    for size in args.sizes.split(','):
+        path = dataset(parse_size(size), args.areas, args.property_types, args.months, args.seed)
+        print(f"Running {size}...")
+        results['sizes'][size.strip()] = summarize(run_size(path, stages, args.processes, args.interval_method))
+
+    print_results(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}: the first run on a machine must create it with --save-baseline")
+        return
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import parallel
+from group_stats import sort_groups
+
+# عدد عينات إعادة المعاينة (bootstrap) وعدد التبديلات لكل مجموعة
+RESAMPLES = 1000
+CONFIDENCE = 0.95
+SEED = 0
+
+# عدد الخلايا (عينات × صفوف) في كل دفعة، ويحدد الذاكرة المستخدمة في الدفعة
+BATCH_CELLS = 4_000_000
+# عدد الخلايا (صفوف × عينات) لكل عملية الذي تتجاوزه إعادة المعاينة بضع ثوانٍ (حوالي 20 ns للخلية)،
+# وما فوقه يُنبه إلى طول التشغيل واقتراح method='fisher'
+MAX_CELLS = 200_000_000
+SECONDS_PER_CELL = 20e-9
+# "bootstrap": فترة بالمئينات وقيمة p من التبديل، "fisher": فترة Fisher z تقريبية بدون إعادة معاينة
+METHODS = ['bootstrap', 'fisher']
+
+
+# القيم بعد طرح متوسط كل مجموعة: الارتباط لا يتغير، والمجاميع تبقى دقيقة
+def centered(values, starts, sizes):
+    mean = np.add.reduceat(values, starts) / sizes
+    return values - np.repeat(mean, sizes)
+
+
+# ارتباط كل (عينة، مجموعة) من صفوف مسحوبة، والمجموعات كتل متصلة تبدأ عند starts
+def batch_correlations(x, y, starts):
+    sx = np.add.reduceat(x, starts, axis=1)
+    sy = np.add.reduceat(y, starts, axis=1)
+    sxx = np.add.reduceat(x * x, starts, axis=1)
+    syy = np.add.reduceat(y * y, starts, axis=1)
+    sxy = np.add.reduceat(x * y, starts, axis=1)
+    n = np.diff(np.r_[starts, x.shape[1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    return np.clip(corr, -1, 1)
+
+
+# دفعة من count عينة: "bootstrap" سحب مع الإرجاع داخل كل مجموعة، "permutation" خلط y داخل كل مجموعة
+# كل دفعة لها مولد عشوائي من (seed، النوع، رقم الدفعة)، فالنتيجة لا تتغير بعدد العمليات
+def run_batch(arrays, kind, seed, batch, count):
+    x, y, starts, sizes = arrays['x'], arrays['y'], arrays['starts'], arrays['sizes']
+    rng = np.random.default_rng([seed, kind == 'permutation', batch])
+    first = np.repeat(starts, sizes)
+
+    if kind == 'bootstrap':
+        rows = first + (rng.random((count, len(x))) * np.repeat(sizes, sizes)).astype(np.int64)
+        return batch_correlations(x[rows], y[rows], starts)
+
+    group = np.repeat(np.arange(len(starts), dtype=np.float64), sizes)
+    rows = np.argsort(group + rng.random((count, len(x))), axis=1)
+    xy = np.add.reduceat(x * y[rows], starts, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.clip(xy / np.sqrt(arrays['sxx'] * arrays['syy']), -1, 1)
+
+
+def run_shared(specs, kind, seed, batch, count):
+    blocks, arrays = parallel.attach(specs)
+    try:
+        return run_batch(arrays, kind, seed, batch, count)
+    finally:
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+# كل العينات على دفعات، في هذه العملية أو موزعة على workers عملية (الذاكرة المشتركة لنفس الأعمدة)
+def resample(arrays, kind, resamples, seed, workers=1):
+    per_batch = max(1, BATCH_CELLS // max(len(arrays['x']), 1))
+    counts = [min(per_batch, resamples - start) for start in range(0, resamples, per_batch)]
+
+    if not (workers and workers > 1 and len(counts) > 1):
+        return np.concatenate([run_batch(arrays, kind, seed, batch, count)
+                               for batch, count in enumerate(counts)])
+
+    blocks, specs = parallel.share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_shared, specs, kind, seed, batch, count)
+                       for batch, count in enumerate(counts)]
+            return np.concatenate([future.result() for future in futures])
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+# فترة Fisher z وقيمة p منها (للبيانات الأكبر من أن يُعاد سحبها)
+def fisher_interval(r, n, confidence=CONFIDENCE):
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = np.arctanh(np.clip(r, -1, 1))
+        scale = np.sqrt(n - 3)
+        p_value = np.vectorize(math.erfc)(np.abs(center) * scale / math.sqrt(2))
+        low, high = np.tanh(center - z / scale), np.tanh(center + z / scale)
+    return low, high, p_value
+
+
+# فترة الثقة للارتباط بين x وy في كل مجموعة (bootstrap بالمئينات) وقيمة p من اختبار التبديل
+# كل العينات لكل المجموعات تُسحب دفعة واحدة كمصفوفة (عينة × صف) بدل حلقة على المجموعات
+# method يحدد طريقة الفترة صراحة، ولا تتغير الطريقة حسب حجم البيانات
+def correlation_intervals(df, by, x, y, mask=None, resamples=RESAMPLES, confidence=CONFIDENCE,
+                          seed=SEED, workers=1, method='bootstrap'):
+    if method not in METHODS:
+        raise ValueError(f"unknown interval method: {method} (expected one of {', '.join(METHODS)})")
+    order, starts, index = sort_groups(df, by, mask=mask)
+    columns = ['correlation', 'ci_low', 'ci_high', 'p_value', 'method']
+    if len(order) == 0:
+        return pd.DataFrame({name: [] for name in columns}, index=index)
+
+    sizes = np.diff(np.r_[starts, len(order)])
+    arrays = {
+        'x': centered(df[x].to_numpy(dtype=np.float64)[order], starts, sizes),
+        'y': centered(df[y].to_numpy(dtype=np.float64)[order], starts, sizes),
+        'starts': starts,
+        'sizes': sizes
+    }
+    arrays['sxx'] = np.add.reduceat(arrays['x'] * arrays['x'], starts)
+    arrays['syy'] = np.add.reduceat(arrays['y'] * arrays['y'], starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed = np.add.reduceat(arrays['x'] * arrays['y'], starts) / np.sqrt(arrays['sxx'] * arrays['syy'])
+    observed = np.where(sizes > 1, np.clip(observed, -1, 1), np.nan)
+
+    if method == 'fisher':
+        low, high, p_value = fisher_interval(observed, sizes, confidence)
+    else:
+        # الدفعات تبقي الذاكرة تحت BATCH_CELLS مهما كبرت البيانات، لكن الوقت يكبر مع الخلايا
+        cells = 2 * len(order) * resamples
+        if cells > MAX_CELLS * max(workers or 1, 1):
+            print(f"Bootstrap and permutation over {cells:,} cells, about "
+                  f"{cells * SECONDS_PER_CELL / max(workers or 1, 1):.0f} s; "
+                  f"--interval-method fisher gives an approximate interval without resampling", file=sys.stderr)
+        boot = resample(arrays, 'bootstrap', resamples, seed, workers)
+        tail = (1 - confidence) / 2
+        with np.errstate(invalid='ignore'):
+            low, high = np.nanquantile(boot, [tail, 1 - tail], axis=0)
+        del boot
+        permuted = resample(arrays, 'permutation', resamples, seed, workers)
+        # نفس الارتباط قد يختلف في آخر البتات بين الحسابين
+        extreme = np.abs(permuted) >= np.abs(observed) - 1e-12
+        p_value = (1 + extreme.sum(axis=0)) / (resamples + 1)
+        p_value = np.where(np.isnan(observed), np.nan, p_value)
+
+    return pd.DataFrame({
+        'correlation': observed,
+        'ci_low': low,
+        'ci_high': high,
+        'p_value': p_value,
+        'method': method
+    }, index=index)
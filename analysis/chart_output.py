@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR
+from results_cache import code_hash
+
+# مجلد الرسوم وطريقة تحميل plotly.js:
+# "directory" ملف plotly.min.js واحد مشترك بجانب الرسوم (يعمل بدون إنترنت)، "cdn" تحميله من الإنترنت في كل رسم
+CHART_DIR = "charts"
+PLOTLYJS = os.environ.get("DASHBOARD_PLOTLYJS", "directory")
+PLOTLYJS_FILE = "plotly.min.js"
+
+# أكبر عدد نقاط في رسم الانتشار، وما يزيد عنه يُقلل:
+# "sample" عينة طبقية على شبكة (تبقى النقاط المتطرفة)، "density" خريطة كثافة ثنائية
+MAX_POINTS = int(os.environ.get("DASHBOARD_MAX_POINTS", "5000"))
+SCATTER_MODE = os.environ.get("DASHBOARD_SCATTER", "sample")
+GRID_BINS = 40
+SEED = 0
+
+# بصمة آخر نسخة مكتوبة من كل رسم
+HASH_DIR = os.path.join(CACHE_DIR, "charts")
+
+# plotly.express يقرأ القالب الافتراضي المشترك أثناء بناء الرسم، فالبناء في خيط واحد في كل مرة
+# والكتابة إلى HTML (الجزء الأبطأ) تبقى متوازية
+BUILD_LOCK = threading.Lock()
+
+
+# رقم خلية الشبكة لكل نقطة
+def grid_cells(x, y, bins=GRID_BINS):
+    cells = np.zeros(len(x), dtype=np.int64)
+    for values in (x, y):
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        low, high = values.min(), values.max()
+        scaled = (values - low) / (high - low) if high > low else np.zeros_like(values)
+        cells = cells * bins + np.minimum((scaled * bins).astype(np.int64), bins - 1)
+    return cells
+
+
+# عينة طبقية: كل خلية تأخذ نصيباً بنسبة عدد نقاطها ونقطة واحدة على الأقل
+def downsample(df, x, y, max_points=MAX_POINTS, bins=GRID_BINS, seed=SEED):
+    n = len(df)
+    if n <= max_points:
+        return df
+
+    cells = grid_cells(df[x].to_numpy(), df[y].to_numpy(), bins)
+    order = np.random.default_rng(seed).permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, lengths)
+    quota = np.maximum(1, np.floor(lengths * max_points / n)).astype(np.int64)
+
+    keep = order[rank < np.repeat(quota, lengths)]
+    return df.iloc[np.sort(keep)]
+
+
+# خريطة كثافة محسوبة مسبقاً: الملف يحمل عدد النقاط في كل خلية فقط
+def density(df, x, y, bins=GRID_BINS * 2, title=None):
+    import plotly.express as px
+
+    counts, x_edges, y_edges = np.histogram2d(df[x].to_numpy(dtype=np.float64),
+                                              df[y].to_numpy(dtype=np.float64), bins=bins)
+    counts[counts == 0] = np.nan
+    return px.imshow(counts.T, x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                     origin="lower", aspect="auto", labels={'x': x, 'y': y, 'color': "count"},
+                     title=title)
+
+
+# رسم انتشار يبقى خفيفاً مهما كان عدد النقاط
+def scatter(df, x, y, max_points=MAX_POINTS, mode=SCATTER_MODE, **kwargs):
+    import plotly.express as px
+
+    if len(df) > max_points and mode == "density" and 'color' not in kwargs:
+        return density(df, x, y, title=kwargs.get('title'))
+
+    return px.scatter(downsample(df, x, y, max_points), x=x, y=y, **kwargs)
+
+
+def chart_path(name):
+    return os.path.join(CHART_DIR, name + ".html")
+
+
+# الكتابة في ملف مؤقت ثم استبداله، فالمتصفح لا يرى ملفاً نصف مكتوب
+def write_atomic(path, write):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_text(path, text):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+    write_atomic(path, write)
+
+
+# plotly.min.js المشترك يُكتب مرة واحدة قبل الرسوم (ويُستبدل إذا تغيرت نسخة plotly)
+def write_plotlyjs():
+    from plotly.offline import get_plotlyjs
+
+    path = os.path.join(CHART_DIR, PLOTLYJS_FILE)
+    bundle = get_plotlyjs()
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == bundle:
+                return
+    except OSError:
+        pass
+    os.makedirs(CHART_DIR, exist_ok=True)
+    write_text(path, bundle)
+
+
+# في وضع "directory" يشير الرسم إلى الملف المشترك فقط، فالرسوم المتوازية لا تكتب plotly.min.js
+def write_chart(fig, name, plotlyjs=PLOTLYJS):
+    os.makedirs(CHART_DIR, exist_ok=True)
+    include = PLOTLYJS_FILE if plotlyjs == "directory" else plotlyjs
+    write_atomic(chart_path(name), lambda tmp: fig.write_html(tmp, include_plotlyjs=include, full_html=True))
+
+
+# ---------- سجل الرسوم: كل رسم يُعاد فقط إذا تغيرت بياناته أو مواصفته ----------
+# كل ملف تحليل يعرّف CHARTS: اسم الرسم -> (دالة البناء، أسماء الجداول والقيم التي يُبنى منها)
+# دالة البناء تأخذ قاموس مصادرها فقط وتعيد الرسم، أو None إذا لم تكن له بيانات
+
+def update_hash(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr([(str(c), str(t)) for c, t in value.dtypes.items()]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        digest.update(repr(value).encode("utf-8"))
+
+
+# بصمة الرسم: مصادره، وكود دالة البناء وهذا الملف، وإعدادات الكتابة ونسخة plotly
+def chart_hash(name, build, data, plotlyjs=PLOTLYJS):
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'path': os.path.abspath(chart_path(name)),
+        'plotlyjs': plotlyjs,
+        'max_points': MAX_POINTS,
+        'scatter_mode': SCATTER_MODE,
+        'plotly': version("plotly"),
+        'code': code_hash(build, sys.modules[__name__])
+    }, sort_keys=True).encode("utf-8"))
+    for key in sorted(data):
+        digest.update(key.encode("utf-8"))
+        update_hash(digest, data[key])
+    return digest.hexdigest()
+
+
+def hash_path(name):
+    return os.path.join(HASH_DIR, name + ".sha256")
+
+
+def stored_hash(name):
+    try:
+        with open(hash_path(name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def render_chart(name, build, data, digest, plotlyjs=PLOTLYJS):
+    with BUILD_LOCK:
+        fig = build(data)
+    if fig is not None:
+        write_chart(fig, name, plotlyjs)
+    # البصمة تُكتب بعد الرسم، فإذا توقف التشغيل بينهما يُعاد الرسم في المرة القادمة
+    os.makedirs(HASH_DIR, exist_ok=True)
+    write_text(hash_path(name), digest)
+
+
+# رسم ما تغير فقط من charts، والرسوم المتغيرة تُبنى وتُكتب معاً في workers خيط
+# sources قاموس الجداول والقيم، ويعيد أسماء الرسوم التي أُعيدت
+def render_charts(charts, sources, workers=None, force=False, plotlyjs=PLOTLYJS, verbose=True):
+    stale = {}
+    for name, (build, keys) in charts.items():
+        data = {key: sources[key] for key in keys}
+        digest = chart_hash(name, build, data, plotlyjs)
+        if force or stored_hash(name) != digest or not os.path.exists(chart_path(name)):
+            stale[name] = (build, data, digest)
+
+    if stale:
+        if plotlyjs == "directory":
+            write_plotlyjs()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_chart, name, build, data, digest, plotlyjs)
+                       for name, (build, data, digest) in stale.items()]
+            for future in futures:
+                future.result()
+
+    if verbose:
+        print(f"Charts rendered: {', '.join(stale) or 'none'} ({len(charts) - len(stale)} unchanged)")
+    return list(stale)
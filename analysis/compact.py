@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+# أعمدة الصفقات في جدول الحقائق وأنواعها المضغوطة (float32 فقط إذا لم تتغير أي قيمة، مثل data_loader)
+MEASURES = {
+    'avg_meter_price': np.float32,
+    'avg_actual_worth': np.float32,
+    'avg_area': np.float32,
+    'transactions_count': np.int32
+}
+
+# أعمدة السياحة ثابتة لكل (منطقة، شهر)، فتُحفظ مرة واحدة في جدول بُعد بدل تكرارها في كل صف
+TOURISM_COLUMNS = ['hotels', 'rooms', 'POIs', 'occupancy_rate', 'tourism_intensity',
+                   'occupancy_rate_adjusted', 'tourism_activity']
+
+# أعمدة الملف المدمج التي تُبنى من أرقام المنطقة ونوع العقار والشهر
+KEYS = {'area_name_en': ('area_id', 'areas'),
+        'property_type_en': ('property_id', 'properties'),
+        'year_month': ('month_id', 'months')}
+
+
+# أرقام الفئات في كل دفعة تُوحد على قائمة قيم واحدة مرتبة (-1 للقيم الفارغة)
+def category_codes(chunks):
+    parts = []
+    labels = pd.Index([])
+    for values in chunks:
+        values = pd.Categorical(values)
+        parts.append((values.codes, values.categories))
+        if len(parts) == 1:
+            labels = values.categories
+        elif not values.categories.equals(labels):
+            labels = labels.union(values.categories)
+
+    codes = [np.zeros(0, dtype=np.int32)]
+    previous = lookup = None
+    for local, categories in parts:
+        if previous is None or not categories.equals(previous):
+            previous = categories
+            lookup = np.append(labels.get_indexer(categories), -1).astype(np.int32)
+        codes.append(lookup[local])
+    return np.concatenate(codes), labels
+
+
+# رقم الشهر من أول شهر في البيانات، والأشهر متصلة حتى آخر شهر
+def month_codes(chunks):
+    parts = [np.zeros(0, dtype=np.int32)]
+    unit = np.dtype('datetime64[ns]')
+    missing = np.iinfo(np.int32).min
+    for values in chunks:
+        if not pd.api.types.is_datetime64_dtype(values):
+            values = pd.to_datetime(values)
+        dates = np.asarray(values)
+        unit = dates.dtype
+        present = ~np.isnat(dates)
+        months = dates.astype('datetime64[M]')
+        if not (present <= (months.astype(unit) == dates)).all():
+            raise ValueError("year_month must hold whole months")
+        number = months.view(np.int64).astype(np.int32)
+        number[~present] = missing
+        parts.append(number)
+
+    codes = np.concatenate(parts)
+    del parts
+    absent = codes == missing
+    known = codes[~absent]
+    first = int(known.min()) if len(known) else 0
+    last = int(known.max()) if len(known) else -1
+    codes -= first
+    codes[absent] = -1
+    calendar = np.arange(first, last + 1).astype('datetime64[M]').astype(unit)
+    return codes, pd.DatetimeIndex(calendar)
+
+
+# الأعداد الصحيحة تبقى int32 إذا لم تكن فيها قيم فارغة، وإلا يُحفظ العمود float32
+# والعمود float32 يصبح float64 إذا فقدت أي قيمة دقتها بالتحويل
+def measure(chunks, dtype):
+    parts = [np.zeros(0, dtype=dtype)]
+    for values in chunks:
+        values = np.asarray(values)
+        if np.issubdtype(dtype, np.integer) and values.dtype.kind == 'f':
+            if np.isnan(values).any() or not np.array_equal(np.trunc(values), values):
+                dtype = np.float32
+        if dtype == np.float32:
+            small = values.astype(np.float32)
+            if not np.array_equal(small.astype(np.float64), values.astype(np.float64, copy=False), equal_nan=True):
+                dtype = np.float64
+        parts.append(values.astype(dtype))
+    return np.concatenate([part.astype(dtype, copy=False) for part in parts])
+
+
+def same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+# جدول (منطقة × شهر) لعمود سياحة، ثم قراءة العمود مرة ثانية للتأكد أن قيمته واحدة لكل صفوف الخلية
+# صفوف بدون منطقة أو شهر لا يمكن ربطها بالجدول، فتُعتبر سياحتها فارغة
+def tourism_table(read, name, area, month, shape):
+    table = np.full(shape, np.nan)
+    for check in (False, True):
+        start = 0
+        for values in read(name):
+            stop = start + len(values)
+            joined = (area[start:stop] >= 0) & (month[start:stop] >= 0)
+            cells = area[start:stop][joined].astype(np.int64) * shape[1] + month[start:stop][joined]
+            values = np.asarray(values, dtype=np.float64)[joined]
+            if not check:
+                table.flat[cells] = values
+            elif not same(table.flat[cells], values).all():
+                raise ValueError(f"{name} differs between rows of the same area and month")
+            start = stop
+    return table
+
+
+# بناء النموذج من دالة تقرأ عموداً واحداً بالاسم على دفعات (عمود تلو الآخر حتى لا يُحمّل الملف كاملاً)
+def build(read):
+    facts = {}
+    model = {}
+    for name, (code, labels) in KEYS.items():
+        if name == 'year_month':
+            facts[code], model[labels] = month_codes(read(name))
+        else:
+            facts[code], model[labels] = category_codes(read(name))
+    for name, dtype in MEASURES.items():
+        facts[name] = measure(read(name), dtype)
+    model['facts'] = pd.DataFrame(facts, copy=False)
+
+    shape = (len(model['areas']), len(model['months']))
+    model['tourism'] = {
+        name: tourism_table(read, name, facts['area_id'], facts['month_id'], shape)
+        for name in TOURISM_COLUMNS
+    }
+    return model
+
+
+def from_frame(df):
+    return build(lambda name: [df[name]])
+
+
+# تحميل النموذج من النسخة العمودية (أو من الجدول الكامل بدون pyarrow)
+def load_model(path=None, refresh=False):
+    if data_loader.pa is None:
+        return from_frame(data_loader.load_data(path, refresh))
+    snapshot = data_loader.fresh_snapshot(path, refresh)
+    return build(lambda name: data_loader.read_column(snapshot, name))
+
+
+def rows_of(values, rows):
+    return values if rows is None else values[rows]
+
+
+# عمود بصيغة الملف المدمج لصفوف rows (كل الصفوف إذا كانت None)، والسياحة تُربط عند الطلب
+def column(model, name, rows=None):
+    facts = model['facts']
+    if name in KEYS:
+        code, labels = KEYS[name]
+        codes = rows_of(facts[code].to_numpy(), rows)
+        if name == 'year_month':
+            return model['months'].take(codes, allow_fill=True, fill_value=pd.NaT)
+        return pd.Categorical.from_codes(codes, categories=model[labels])
+
+    if name in model['tourism']:
+        area = rows_of(facts['area_id'].to_numpy(), rows)
+        month = rows_of(facts['month_id'].to_numpy(), rows)
+        values = model['tourism'][name][area, month]
+        values[(area < 0) | (month < 0)] = np.nan
+        return values
+
+    values = rows_of(facts[name].to_numpy(), rows)
+    # الحسابات تتم بدقة float64 مثل الجدول الأصلي
+    return values.astype(np.float64) if values.dtype == np.float32 else values
+
+
+# الصفوف المكتملة في أعمدة subset
+def valid(model, subset):
+    facts = model['facts']
+    mask = np.ones(len(facts), dtype=bool)
+    for name in subset:
+        if name in KEYS:
+            mask &= facts[KEYS[name][0]].to_numpy() >= 0
+        elif name in model['tourism']:
+            present = ~np.isnan(model['tourism'][name])
+            area = facts['area_id'].to_numpy()
+            month = facts['month_id'].to_numpy()
+            mask &= (area >= 0) & (month >= 0) & present[area, month]
+        elif facts[name].dtype.kind == 'f':
+            mask &= ~np.isnan(facts[name].to_numpy())
+    return mask
+
+
+# جدول بالأعمدة المطلوبة فقط للصفوف المكتملة: القناع يحدد الصفوف مباشرة بدل نسخ الجدول عبر dropna
+def view(model, columns, subset=(), mask=None):
+    if mask is None:
+        mask = valid(model, subset)
+    rows = None if mask.all() else np.flatnonzero(mask)
+    return pd.DataFrame({name: column(model, name, rows) for name in columns})
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# مسار البيانات (يمكن تغييره عبر متغير البيئة DASHBOARD_DATA)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.environ.get(
+    "DASHBOARD_DATA",
+    os.path.join(BASE_DIR, "data", "real_estate_tourism_merged.csv")
+)
+CACHE_DIR = os.environ.get(
+    "DASHBOARD_CACHE",
+    os.path.join(BASE_DIR, "data", ".cache")
+)
+
+# يتغير عند تعديل طريقة بناء النسخة العمودية
+SNAPSHOT_VERSION = 1
+
+CATEGORY_COLUMNS = ['area_name_en', 'property_type_en']
+
+# ملف عمودي جاهز (ناتج ingest.py) يُقرأ مباشرة بدل بناء نسخة من CSV
+COLUMNAR_SUFFIX = ".arrow"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_paths(csv_path):
+    if csv_path.endswith(COLUMNAR_SUFFIX):
+        return csv_path, csv_path + ".meta.json"
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    snapshot = os.path.join(CACHE_DIR, name + ".arrow")
+    return snapshot, snapshot + ".meta.json"
+
+
+# تحويل الأنواع: فئات للنصوص، تاريخ جاهز للشهر، وأنواع أصغر عندما لا تفقد دقة
+def optimize_types(df):
+    df = df.copy()
+
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+
+    if 'year_month' in df:
+        df['year_month'] = pd.to_datetime(df['year_month'])
+
+    for col in df.select_dtypes(include='integer').columns:
+        values = df[col]
+        if values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+            df[col] = values.astype(np.int32)
+
+    for col in df.select_dtypes(include='float64').columns:
+        values = df[col].to_numpy()
+        small = values.astype(np.float32)
+        if np.array_equal(small.astype(np.float64), values, equal_nan=True):
+            df[col] = small
+
+    return df
+
+
+def read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_meta(meta_path, meta):
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, meta_path)
+
+
+# كتابة الجدول بالصيغة العمودية التي تقرأها التحليلات
+def write_columnar(df, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # بدون ضغط حتى يمكن قراءة الملف عبر memory-map مباشرة
+    feather.write_feather(df, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+
+def build_snapshot(csv_path, snapshot_path, meta_path, digest=None):
+    df = optimize_types(pd.read_csv(csv_path))
+    write_columnar(df, snapshot_path)
+
+    stat = os.stat(csv_path)
+    write_meta(meta_path, {
+        'version': SNAPSHOT_VERSION,
+        'source': os.path.abspath(csv_path),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha256': digest or file_hash(csv_path)
+    })
+    return df
+
+
+# هل النسخة المحفوظة ما زالت مطابقة للملف الأصلي؟
+def snapshot_is_fresh(csv_path, snapshot_path, meta_path):
+    meta = read_meta(meta_path)
+    if meta is None or meta.get('version') != SNAPSHOT_VERSION:
+        return False, None
+    if not os.path.exists(snapshot_path):
+        return False, None
+
+    stat = os.stat(csv_path)
+    if meta['mtime'] == stat.st_mtime and meta['size'] == stat.st_size:
+        return True, None
+
+    # تغير وقت التعديل فقط: نتحقق من المحتوى قبل إعادة البناء
+    digest = file_hash(csv_path)
+    if digest == meta['sha256']:
+        meta['mtime'] = stat.st_mtime
+        meta['size'] = stat.st_size
+        write_meta(meta_path, meta)
+        return True, digest
+    return False, digest
+
+
+# مسار النسخة العمودية بعد إعادة بنائها إذا تغير الملف الأصلي (None بدون pyarrow)
+def fresh_snapshot(path=None, refresh=False):
+    if pa is None:
+        return None
+    csv_path = path or DATA_PATH
+    if csv_path.endswith(COLUMNAR_SUFFIX):
+        return csv_path
+    snapshot_path, meta_path = snapshot_paths(csv_path)
+    fresh, digest = snapshot_is_fresh(csv_path, snapshot_path, meta_path)
+    if refresh or not fresh:
+        build_snapshot(csv_path, snapshot_path, meta_path, digest)
+    return snapshot_path
+
+
+# قراءة عمود واحد من النسخة العمودية دفعة تلو الأخرى (بدون نسخ)، فلا تبقى في الذاكرة إلا الدفعة الحالية
+def read_column(snapshot_path, name):
+    with pa.memory_map(snapshot_path) as source:
+        reader = pa.ipc.open_file(source)
+        index = reader.schema.get_field_index(name)
+        dictionary = dtype = None
+        for i in range(reader.num_record_batches):
+            values = reader.get_batch(i).column(index)
+            if not pa.types.is_dictionary(values.type):
+                yield values.to_pandas()
+                continue
+
+            # قائمة الفئات مشتركة بين الدفعات عادة، فتُحوّل مرة واحدة فقط
+            if dictionary is None or not values.dictionary.equals(dictionary):
+                dictionary = values.dictionary
+                dtype = pd.CategoricalDtype(dictionary.to_pandas(), ordered=values.type.ordered)
+            yield pd.Categorical.from_codes(values.indices.fill_null(-1).to_numpy(), dtype=dtype)
+
+    # إرجاع ذاكرة الدفعات لنظام التشغيل بدل احتفاظ pyarrow بها
+    pa.default_memory_pool().release_unused()
+
+
+def load_data(path=None, refresh=False):
+    csv_path = path or DATA_PATH
+
+    if csv_path.endswith(COLUMNAR_SUFFIX):
+        if pa is None:
+            raise ImportError(f"reading {csv_path} needs pyarrow")
+        return feather.read_table(csv_path, memory_map=True).to_pandas(split_blocks=True)
+
+    if pa is None:
+        return optimize_types(pd.read_csv(csv_path))
+
+    snapshot_path, meta_path = snapshot_paths(csv_path)
+    fresh, digest = snapshot_is_fresh(csv_path, snapshot_path, meta_path)
+
+    if refresh or not fresh:
+        return build_snapshot(csv_path, snapshot_path, meta_path, digest)
+
+    table = feather.read_table(snapshot_path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+# بصمة محتوى الملف: تؤخذ من بيانات النسخة المحفوظة إذا لم يتغير الملف
+def data_fingerprint(path=None):
+    csv_path = path or DATA_PATH
+    _, meta_path = snapshot_paths(csv_path)
+    meta = read_meta(meta_path)
+    stat = os.stat(csv_path)
+    if meta and meta['mtime'] == stat.st_mtime and meta['size'] == stat.st_size:
+        return meta['sha256']
+    return file_hash(csv_path)
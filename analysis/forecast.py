@@ -0,0 +1,199 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis3 import RISK_COLUMNS, RISK_SUBSET, TOURISM_LAG
+from compact import load_model, view
+from lag_sweep import area_month_matrix
+
+# عدد أشهر التوقع، والنموذج يستخدم قيمة نفس الشهر قبل سنة فلا يتجاوز 12 شهراً
+FORECAST_HORIZON = 12
+SEASON = 12
+# أقل عدد أشهر مكتملة لتقدير النموذج، وأقل منها يُستخدم التوقع الموسمي البسيط
+MIN_FIT_MONTHS = 24
+
+PARAMS = {
+    'horizon': FORECAST_HORIZON,
+    'season': SEASON,
+    'tourism_lag': TOURISM_LAG,
+    'min_fit_months': MIN_FIT_MONTHS
+}
+
+
+# آخر قيمة معروفة حتى كل شهر (الأشهر الأولى قبل أي قيمة تبقى NaN)
+def forward_fill(matrix):
+    n_areas, n_months = matrix.shape
+    last = np.where(~np.isnan(matrix), np.arange(n_months), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return matrix[np.arange(n_areas)[:, None], last]
+
+
+# انحدار خطي لكل منطقة دفعة واحدة: y = a + b1 x1 + ... على الأشهر المكتملة فقط
+# المعاملات تُحسب من مصفوفات (منطقة × متغير × متغير) بعد طرح المتوسطات، والمنطقة التي
+# لا تكفي أشهرها أو مصفوفتها شبه منفردة تأخذ fallback (التوقع الموسمي البسيط)
+def fit_batch(y, features, fallback, min_months=MIN_FIT_MONTHS):
+    valid = ~np.isnan(y)
+    for x in features:
+        valid &= ~np.isnan(x)
+    n = valid.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_y = np.where(valid, y, 0).sum(axis=1) / n
+        dy = np.where(valid, y - mean_y[:, None], 0)
+        means = [np.where(valid, x, 0).sum(axis=1) / n for x in features]
+        dx = np.stack([np.where(valid, x - m[:, None], 0) for x, m in zip(features, means)], axis=1)
+
+        xtx = np.einsum('akm,alm->akl', dx, dx)
+        xty = np.einsum('akm,am->ak', dx, dy)
+        scale = np.trace(xtx, axis1=1, axis2=2)
+        usable = (n >= min_months) & (scale > 0)
+        usable &= np.abs(np.linalg.det(xtx)) > 1e-12 * scale ** len(features)
+
+    slopes = np.tile(np.asarray(fallback[1:], dtype=np.float64), (len(y), 1))
+    intercept = np.full(len(y), float(fallback[0]))
+    if usable.any():
+        slopes[usable] = np.linalg.solve(xtx[usable], xty[usable][:, :, None])[:, :, 0]
+        intercept[usable] = mean_y[usable] - sum(slopes[usable, k] * means[k][usable]
+                                                 for k in range(len(features)))
+    return {'intercept': intercept, 'slopes': slopes, 'fitted': usable, 'months': n}
+
+
+def shifted(matrix, lag):
+    out = np.full(matrix.shape, np.nan)
+    out[:, lag:] = matrix[:, :matrix.shape[1] - lag]
+    return out
+
+
+# نموذجان لكل منطقة: السياحة من قيمتها قبل سنة، والسعر من سعره قبل سنة والسياحة قبل lag شهر
+def fit_models(price, tourism, lag=TOURISM_LAG, min_months=MIN_FIT_MONTHS):
+    return {
+        'tourism': fit_batch(tourism, [shifted(tourism, SEASON)], [0, 1], min_months),
+        'price': fit_batch(price, [shifted(price, SEASON), shifted(tourism, lag)], [0, 1, 0], min_months)
+    }
+
+
+# توقع horizon شهراً بعد آخر عمود في التاريخ، والقيم الناقصة في المدخلات تأخذ آخر قيمة معروفة
+# يعيد توقع النموذج والتوقع الموسمي البسيط (نفس الشهر قبل سنة)
+def predict(models, price, tourism, horizon, lag=TOURISM_LAG):
+    n_months = price.shape[1]
+    price = forward_fill(price)
+    tourism = forward_fill(tourism)
+    season = np.arange(n_months - SEASON, n_months - SEASON + horizon)
+
+    model = models['tourism']
+    tourism_forecast = model['intercept'][:, None] + model['slopes'][:, [0]] * tourism[:, season]
+
+    # السياحة قبل lag شهر: من التاريخ إن وُجدت، وإلا من توقع السياحة
+    steps = np.arange(horizon) - lag
+    tourism_input = np.where(steps < 0, tourism[:, n_months + np.minimum(steps, -1)],
+                             tourism_forecast[:, np.maximum(steps, 0)])
+
+    model = models['price']
+    price_forecast = (model['intercept'][:, None] + model['slopes'][:, [0]] * price[:, season]
+                      + model['slopes'][:, [1]] * tourism_input)
+    return {
+        'price': price_forecast,
+        'tourism': tourism_forecast,
+        'naive_price': price[:, season],
+        'naive_tourism': tourism[:, season]
+    }
+
+
+# متوسط الخطأ المطلق والنسبي لكل منطقة على الأشهر المعروفة
+def errors(actual, forecast):
+    valid = ~np.isnan(actual) & ~np.isnan(forecast)
+    n = valid.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        absolute = np.where(valid, np.abs(actual - forecast), 0)
+        percent = np.where(valid & (actual != 0), absolute / np.abs(actual), 0)
+        mae = absolute.sum(axis=1) / n
+        mape = percent.sum(axis=1) / (valid & (actual != 0)).sum(axis=1) * 100
+    return mae, mape
+
+
+# اختبار رجعي: النموذج يُقدر بدون آخر horizon شهراً ثم يُقارن توقعه بها
+def backtest(price, tourism, horizon, lag=TOURISM_LAG, min_months=MIN_FIT_MONTHS):
+    cut = price.shape[1] - horizon
+    models = fit_models(price[:, :cut], tourism[:, :cut], lag, min_months)
+    forecast = predict(models, price[:, :cut], tourism[:, :cut], horizon, lag)
+
+    out = {'fit_months': models['price']['months']}
+    for name, actual in (('price', price[:, cut:]), ('tourism', tourism[:, cut:])):
+        out[f"{name}_mae"], out[f"{name}_mape"] = errors(actual, forecast[name])
+        out[f"naive_{name}_mae"], out[f"naive_{name}_mape"] = errors(actual, forecast[f"naive_{name}"])
+    return out
+
+
+def analyze_forecast(df, horizon=FORECAST_HORIZON, lag=TOURISM_LAG, min_months=MIN_FIT_MONTHS, verbose=True):
+    if not 1 <= horizon <= SEASON:
+        raise ValueError(f"horizon must be between 1 and {SEASON} months")
+
+    areas, months, matrices = area_month_matrix(df, ['avg_meter_price', 'tourism_activity'])
+    price = matrices['avg_meter_price']
+    tourism = matrices['tourism_activity']
+    if len(months) < SEASON + horizon:
+        raise ValueError(f"forecasting needs at least {SEASON + horizon} months of history")
+
+    # 1 الاختبار الرجعي على آخر horizon شهراً
+    scores = backtest(price, tourism, horizon, lag, min_months)
+    backtest_df = pd.DataFrame({'area': areas, **scores})
+    backtest_df = backtest_df[~np.isnan(backtest_df['price_mape'])].round(3)
+
+    # 2 النموذج على كل التاريخ والتوقع بعد آخر شهر
+    models = fit_models(price, tourism, lag, min_months)
+    forecast = predict(models, price, tourism, horizon, lag)
+    future = pd.period_range(months[-1] + 1, periods=horizon, freq='M')
+    forecast_df = pd.DataFrame({
+        'area': np.repeat(np.asarray(areas), horizon),
+        'month': np.tile(future.astype(str), len(areas)),
+        'horizon': np.tile(np.arange(1, horizon + 1), len(areas)),
+        'avg_meter_price': forecast['price'].ravel().round(2),
+        'tourism_activity': forecast['tourism'].ravel().round(4),
+        'fitted': np.repeat(models['price']['fitted'], horizon)
+    })
+    forecast_df = forecast_df[forecast_df['avg_meter_price'].notna()]
+
+    def median(col):
+        return float(backtest_df[col].median()) if len(backtest_df) else float('nan')
+
+    if verbose:
+        print(f"Forecast {horizon} months for {forecast_df['area'].nunique()} areas "
+              f"({int(models['price']['fitted'].sum())} fitted, the rest seasonal naive)")
+        print(f"Backtest price MAPE {median('price_mape'):.2f}% "
+              f"(seasonal naive {median('naive_price_mape'):.2f}%)")
+
+    return {
+        'forecast_df': forecast_df,
+        'backtest_df': backtest_df,
+        'price_mape': median('price_mape'),
+        'naive_price_mape': median('naive_price_mape'),
+        'tourism_mape': median('tourism_mape'),
+        'naive_tourism_mape': median('naive_tourism_mape'),
+        'beats_naive_pct': float((backtest_df['price_mae'] < backtest_df['naive_price_mae']).mean() * 100)
+        if len(backtest_df) else float('nan')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-area price and tourism forecasts with a backtest")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON, help=f"months ahead (1-{SEASON})")
+    parser.add_argument("--out", help="directory for forecast.csv and backtest.csv")
+    args = parser.parse_args()
+
+    df = view(load_model(args.data), RISK_COLUMNS, RISK_SUBSET)
+    results = analyze_forecast(df, args.horizon)
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        results['forecast_df'].to_csv(os.path.join(args.out, "forecast.csv"), index=False)
+        results['backtest_df'].to_csv(os.path.join(args.out, "backtest.csv"), index=False)
+        print(f"Tables written to {args.out}")
+    else:
+        print(results['backtest_df'].head(15).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
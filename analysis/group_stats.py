@@ -0,0 +1,239 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# ترقيم أرقام محصورة في [0, size) بترتيب ظهورها (أو مرتبة) عبر جدول بحجم size بدل جدول تجزئة بحجم البيانات
+def dense_codes(values, size, sort=False):
+    used = pd.unique(values)
+    used = used[used >= 0]
+    if sort:
+        used = np.sort(used)
+    rank = np.full(size + 1, -1, dtype=np.int64)
+    rank[used] = np.arange(len(used))
+    return rank[values], used
+
+
+# أرقام مفتاح واحد وقيمه: الفئات والقيم المنطقية تُستخدم أرقامها مباشرة
+def key_codes(values, sort=False):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        codes, used = dense_codes(values.cat.codes.to_numpy(), len(categories), sort)
+        return codes, np.asarray(categories.take(used))
+    if values.dtype == bool:
+        codes, used = dense_codes(values.to_numpy().view(np.uint8), 2, sort)
+        return codes, used.astype(bool)
+    codes, uniques = pd.factorize(values, sort=sort)
+    return codes, np.asarray(uniques)
+
+
+# رقم المجموعة لكل صف: عدة مفاتيح تُجمع أرقامها في رقم واحد بدل بناء مجموعات من القيم
+# الصفوف التي فيها مفتاح فارغ لا تنتمي لأي مجموعة (-1)
+def group_codes(df, by, sort=False):
+    if not isinstance(by, (list, tuple)):
+        codes, uniques = key_codes(df[by], sort)
+        return codes, pd.Index(uniques, name=by)
+
+    levels = []
+    codes = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    for key in by:
+        values = df[key]
+        # مثل ترتيب MultiIndex: الفئات غير المرتبة تُرتب بقيمها لا بترتيب فئاتها
+        if sort and isinstance(values.dtype, pd.CategoricalDtype) and not values.cat.categories.is_monotonic_increasing:
+            values = values.astype(values.cat.categories.dtype)
+        level_codes, uniques = key_codes(values, sort)
+        levels.append(pd.Index(uniques, name=key))
+        missing |= level_codes < 0
+        codes *= len(uniques)
+        codes += level_codes
+    codes[missing] = -1
+    del missing
+
+    size = math.prod(len(level) for level in levels)
+    if size <= max(len(df), 1 << 20):
+        combined, used = dense_codes(codes, size, sort)
+    else:
+        present = codes >= 0
+        combined = np.full(len(df), -1, dtype=np.int64)
+        combined[present], used = pd.factorize(codes[present], sort=sort)
+    del codes
+
+    keys = []
+    for level in reversed(levels):
+        keys.insert(0, level.take(used % len(level)))
+        used = used // len(level)
+    return combined, pd.MultiIndex.from_arrays(keys, names=list(by))
+
+
+# ترقيم المجموعات وترتيب الصفوف مرة واحدة بحيث تكون كل مجموعة كتلة متصلة
+def sort_groups(df, by, mask=None, sort=False):
+    codes, index = group_codes(df, by, sort=sort)
+    keep = codes >= 0
+    if mask is not None:
+        keep &= np.asarray(mask, dtype=bool)
+
+    if keep.all():
+        order = np.argsort(codes, kind='stable')
+    else:
+        rows = np.flatnonzero(keep)
+        order = rows[np.argsort(codes[rows], kind='stable')]
+    sorted_codes = codes[order]
+    del codes
+    if len(order) == 0:
+        return order, np.zeros(0, dtype=np.int64), index[:0]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+    return order, starts, index.take(sorted_codes[starts])
+
+
+# إحصاءات كل المجموعات دفعة واحدة: العدد، المجموع، المتوسط، الانحراف المعياري والارتباط
+# الأعمدة يجب أن تكون خالية من القيم الفارغة (استخدم mask لاستبعاد الصفوف)
+def group_stats(df, by, columns, pairs=(), mask=None, sort=False, ddof=1):
+    order, starts, index = sort_groups(df, by, mask=mask, sort=sort)
+
+    columns = list(dict.fromkeys(list(columns) + [c for pair in pairs for c in pair]))
+    out = {}
+
+    if len(order) == 0:
+        out['count'] = np.array([], dtype=np.int64)
+        for col in columns:
+            for stat in ('sum', 'mean', 'std'):
+                out[f"{col}_{stat}"] = np.array([], dtype=np.float64)
+        for x, y in pairs:
+            out[f"corr_{x}_{y}"] = np.array([], dtype=np.float64)
+        return pd.DataFrame(out, index=index)
+
+    n = np.diff(np.r_[starts, len(order)])
+    out['count'] = n
+
+    # القيم المركزية تُحفظ فقط للأعمدة الداخلة في الارتباط، وباقي الحسابات في نفس المصفوفة
+    paired = {c for pair in pairs for c in pair}
+    centered = {}
+    squares = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col in columns:
+            d = df[col].to_numpy()[order].astype(np.float64, copy=False)
+            total = np.add.reduceat(d, starts)
+            mean = total / n
+            d -= np.repeat(mean, n)
+            if col in paired:
+                centered[col] = d
+                ss = np.add.reduceat(d * d, starts)
+            else:
+                ss = np.add.reduceat(np.square(d, out=d), starts)
+            del d
+
+            squares[col] = ss
+            out[f"{col}_sum"] = total
+            out[f"{col}_mean"] = mean
+            out[f"{col}_std"] = np.where(n > ddof, np.sqrt(ss / (n - ddof)), np.nan)
+
+        for x, y in pairs:
+            sxy = np.add.reduceat(centered[x] * centered[y], starts)
+            corr = sxy / np.sqrt(squares[x] * squares[y])
+            out[f"corr_{x}_{y}"] = np.where(n > 1, np.clip(corr, -1, 1), np.nan)
+
+    return pd.DataFrame(out, index=index)
+
+
+# تحويل جدول الإحصاءات إلى جدول نتائج بأسماء أعمدة العرض
+def stats_table(stats, key, columns):
+    table = pd.DataFrame({key: stats.index})
+    for name, col in columns.items():
+        table[name] = stats[col].to_numpy()
+    return table
+
+
+# مجاميع قابلة للدمج لكل مجموعة: العدد، المجموع، مجموع المربعات ومجموع حاصل الضرب
+# يمكن جمع نتيجتين لبيانات مختلفة مباشرة عبر merge_moments
+def group_moments(df, by, columns, pairs=(), mask=None, sort=False):
+    order, starts, index = sort_groups(df, by, mask=mask, sort=sort)
+
+    columns = list(dict.fromkeys(list(columns) + [c for pair in pairs for c in pair]))
+    out = {'count': np.diff(np.r_[starts, len(order)]).astype(np.float64)}
+
+    values = {}
+    for col in columns:
+        x = df[col].to_numpy(dtype=np.float64)[order]
+        values[col] = x
+        out[f"{col}_sum"] = np.add.reduceat(x, starts) if len(order) else x[:0]
+        out[f"{col}_sumsq"] = np.add.reduceat(x * x, starts) if len(order) else x[:0]
+
+    for x, y in pairs:
+        prod = values[x] * values[y]
+        out[f"{x}_{y}_prod"] = np.add.reduceat(prod, starts) if len(order) else prod[:0]
+
+    return pd.DataFrame(out, index=index)
+
+
+def merge_moments(left, right):
+    return left.add(right, fill_value=0)
+
+
+# تحويل المجاميع إلى نفس أعمدة group_stats
+def moments_stats(moments, columns, pairs=(), ddof=1):
+    n = moments['count'].to_numpy()
+    out = {'count': n.astype(np.int64)}
+
+    spread = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col in dict.fromkeys(list(columns) + [c for pair in pairs for c in pair]):
+            total = moments[f"{col}_sum"].to_numpy()
+            mean = total / n
+            ss = np.maximum(moments[f"{col}_sumsq"].to_numpy() - total * mean, 0)
+
+            spread[col] = ss
+            out[f"{col}_sum"] = total
+            out[f"{col}_mean"] = mean
+            out[f"{col}_std"] = np.where(n > ddof, np.sqrt(ss / (n - ddof)), np.nan)
+
+        for x, y in pairs:
+            sxy = moments[f"{x}_{y}_prod"].to_numpy() - out[f"{x}_sum"] * out[f"{y}_mean"]
+            corr = sxy / np.sqrt(spread[x] * spread[y])
+            out[f"corr_{x}_{y}"] = np.where(n > 1, np.clip(corr, -1, 1), np.nan)
+
+    return pd.DataFrame(out, index=moments.index)
+
+
+# دالة بيتا غير التامة المنتظمة I_x(a, b) بالكسر المستمر (طريقة Lentz)
+def incomplete_beta(a, b, x, eps=1e-15, max_terms=2000):
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1 - incomplete_beta(b, a, 1 - x, eps, max_terms)
+
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    f, c, d = 1.0, 1.0, 0.0
+    for i in range(max_terms):
+        m = i // 2
+        if i == 0:
+            term = 1.0
+        elif i % 2 == 0:
+            term = m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m))
+        else:
+            term = -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))
+        d = 1 + term * d
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = 1 + term / c
+        c = c if abs(c) > tiny else tiny
+        f *= c * d
+        if abs(1 - c * d) < eps:
+            break
+    return front * (f - 1)
+
+
+# القيمة الاحتمالية (ذات الطرفين) لمعامل ارتباط بيرسون من توزيع t بدرجات حرية n - 2
+def pearson_p_value(r, n):
+    df = n - 2
+    if df <= 0 or np.isnan(r):
+        return np.nan
+    if abs(r) >= 1:
+        return 0.0
+    t2 = r * r * df / (1 - r * r)
+    return incomplete_beta(df / 2, 0.5, df / (df + t2))
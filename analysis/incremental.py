@@ -0,0 +1,300 @@
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import analysis1
+import analysis2
+import analysis3
+from data_loader import CACHE_DIR, DATA_PATH, load_data, optimize_types
+from group_stats import group_moments, merge_moments, moments_stats
+from rolling import group_positions, rolling_mean, shift
+
+# عدد الصفوف الأخيرة المحفوظة لكل منطقة: نافذة التنعيم مع الإزاحة تحتاج 8 صفوف سابقة
+TAIL_ROWS = analysis3.SMOOTH_WINDOW + analysis3.TOURISM_LAG - 1
+
+# عدد البايتات المحفوظة من نهاية الملف للتأكد من أن السجل القديم لم يتغير
+CHECK_BYTES = 4096
+
+# يتغير عند إضافة مجاميع جديدة، فتُعاد بناء الحالات المحفوظة بالإصدار القديم
+STATE_VERSION = 2
+
+PAIR = [('tourism_activity', 'avg_meter_price')]
+TABLES = ['property_df', 'area_df', 'scores_df', 'stability_df', 'monthly_stats', 'monthly_patterns']
+TAIL_COLUMNS = ['area_name_en', 'year_month', 'avg_meter_price',
+                'tourism_activity', 'transactions_count']
+
+
+def state_path(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, name + ".incremental.pkl")
+
+
+def empty_state():
+    return {
+        'version': STATE_VERSION,
+        'offset': 0,
+        'check': b"",
+        'columns': None,
+        'rows': 0,
+        'property': None,
+        'area': None,
+        'invest_area': None,
+        'invest_year': None,
+        'tourism_min': np.inf,
+        'tourism_max': -np.inf,
+        'tail': pd.DataFrame(columns=TAIL_COLUMNS),
+        'stability': None,
+        'season_month': None,
+        'season_areas': None
+    }
+
+
+def merge(old, new):
+    return new if old is None else merge_moments(old, new)
+
+
+# تنعيم الصفوف الجديدة فقط باستخدام آخر صفوف كل منطقة من التشغيل السابق
+def fold_smoothing(state, rows):
+    new = rows[TAIL_COLUMNS].sort_values(['area_name_en', 'year_month'], kind='stable')
+    new['area_name_en'] = new['area_name_en'].astype(str)
+
+    tail = state['tail']
+    if not tail.empty:
+        last_month = tail.groupby('area_name_en')['year_month'].max()
+        first_month = new.groupby('area_name_en')['year_month'].min()
+        common = first_month.index.intersection(last_month.index)
+        if (first_month[common] < last_month[common]).any():
+            raise ValueError("appended rows are older than the processed history")
+
+    frames = [new.assign(is_new=True)]
+    if not tail.empty:
+        frames.insert(0, tail.assign(is_new=False))
+    combined = pd.concat(frames, ignore_index=True)
+    combined = combined.sort_values('area_name_en', kind='stable', ignore_index=True)
+    positions = group_positions(combined['area_name_en'])
+
+    combined['price_smooth'] = rolling_mean(combined['avg_meter_price'], positions,
+                                            analysis3.SMOOTH_WINDOW, analysis3.SMOOTH_MIN_PERIODS)
+    combined['tourism_smooth'] = rolling_mean(combined['tourism_activity'], positions,
+                                              analysis3.SMOOTH_WINDOW, analysis3.SMOOTH_MIN_PERIODS)
+    combined['tourism_lag'] = shift(combined['tourism_smooth'], positions, analysis3.TOURISM_LAG)
+
+    valid = combined['is_new'] & combined[['price_smooth', 'tourism_smooth',
+                                           'tourism_lag']].notna().all(axis=1)
+    stability = group_moments(combined, 'area_name_en',
+                              ['price_smooth', 'transactions_count'], mask=valid)
+
+    state['stability'] = merge(state['stability'], stability)
+    state['tail'] = (combined.groupby('area_name_en', sort=False).tail(TAIL_ROWS)[TAIL_COLUMNS]
+                     .reset_index(drop=True))
+
+
+# دمج صفوف جديدة في المجاميع المحفوظة
+def fold(state, rows):
+    rows = rows.reset_index(drop=True)
+
+    # تحليل 1: العلاقة حسب نوع العقار والمنطقة
+    mask = rows[analysis1.CLEAN_SUBSET].notna().all(axis=1)
+    columns = ['tourism_activity', 'avg_meter_price']
+    state['property'] = merge(state['property'], group_moments(
+        rows, 'property_type_en', columns, pairs=PAIR, mask=mask))
+    state['area'] = merge(state['area'], group_moments(
+        rows, 'area_name_en', columns, pairs=PAIR, mask=mask))
+
+    # تحليل 2: مؤشر الاستثمار
+    mask = rows[analysis2.CLEAN_SUBSET].notna().all(axis=1)
+    state['invest_area'] = merge(state['invest_area'], group_moments(
+        rows, 'area_name_en',
+        ['tourism_activity', 'avg_meter_price', 'transactions_count'], mask=mask))
+    state['invest_year'] = merge(state['invest_year'], group_moments(
+        rows.assign(year=rows['year_month'].dt.year), ['area_name_en', 'year'],
+        ['tourism_activity'], mask=mask))
+    if mask.any():
+        tourism = rows.loc[mask, 'tourism_activity']
+        state['tourism_min'] = min(state['tourism_min'], tourism.min())
+        state['tourism_max'] = max(state['tourism_max'], tourism.max())
+
+    # تحليل 3: الأنماط الشهرية (المناطق المختلفة لكل شهر تُحفظ كأزواج)
+    mask = rows[analysis3.SEASON_SUBSET].notna().all(axis=1)
+    season = rows.assign(year=rows['year_month'].dt.year, month=rows['year_month'].dt.month)
+    state['season_month'] = merge(state['season_month'], group_moments(
+        season, ['year', 'month'],
+        ['avg_meter_price', 'tourism_activity', 'transactions_count'], mask=mask))
+    state['season_areas'] = merge(state['season_areas'], group_moments(
+        season, ['year', 'month', 'area_name_en'], [],
+        mask=mask & rows['area_name_en'].notna()))
+
+    # تحليل 3: استقرار الأسعار
+    mask = rows[analysis3.RISK_SUBSET].notna().all(axis=1)
+    fold_smoothing(state, rows[mask])
+
+    state['rows'] += len(rows)
+    return state
+
+
+# قراءة الصفوف المضافة إلى نهاية الملف منذ آخر تشغيل
+def read_appended(csv_path, state):
+    size = os.path.getsize(csv_path)
+    if state['columns'] is None or size < state['offset']:
+        return None
+
+    with open(csv_path, "rb") as f:
+        f.seek(state['offset'] - len(state['check']))
+        if f.read(len(state['check'])) != state['check']:
+            return None
+        data = f.read()
+
+    state['offset'] += len(data)
+    state['check'] = (state['check'] + data)[-CHECK_BYTES:]
+    if not data.strip():
+        return pd.DataFrame(columns=state['columns'])
+
+    rows = pd.read_csv(io.BytesIO(data), header=None, names=state['columns'])
+    return optimize_types(rows)
+
+
+def load_state(csv_path):
+    path = state_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    state = pd.read_pickle(path)
+    return state if state.get('version') == STATE_VERSION else None
+
+
+def save_state(csv_path, state):
+    path = state_path(csv_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.to_pickle(state, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def rebuild(csv_path):
+    size = os.path.getsize(csv_path)
+    df = load_data(csv_path)
+
+    state = empty_state()
+    with open(csv_path, "rb") as f:
+        f.seek(max(size - CHECK_BYTES, 0))
+        state['check'] = f.read(size - max(size - CHECK_BYTES, 0))
+    state['offset'] = size
+    state['columns'] = list(df.columns)
+    return fold(state, df)
+
+
+def update(csv_path=None, full=False):
+    csv_path = csv_path or DATA_PATH
+    state = None if full else load_state(csv_path)
+
+    rows = None
+    if state is not None:
+        rows = read_appended(csv_path, state)
+        if rows is None:
+            print("History changed since the last run, rebuilding...")
+
+    if rows is None:
+        state = rebuild(csv_path)
+        print(f"Aggregates built from {state['rows']} rows")
+    elif len(rows):
+        try:
+            fold(state, rows)
+        except ValueError as e:
+            print(f"{e}, rebuilding...")
+            state = rebuild(csv_path)
+        print(f"Folded {len(rows)} new rows (total {state['rows']})")
+    else:
+        print("No new rows")
+
+    save_state(csv_path, state)
+    return state
+
+
+# جداول تحليل 1 من مجاميع كل نوع عقار وكل منطقة
+def correlation_tables(property_moments, area_moments):
+    columns = ['tourism_activity', 'avg_meter_price']
+
+    overall = moments_stats(property_moments.sum().to_frame().T, columns, pairs=PAIR)
+    correlation = overall['corr_tourism_activity_avg_meter_price'].iloc[0]
+
+    property_df = analysis1.property_table(moments_stats(property_moments, columns, pairs=PAIR))
+    property_df = property_df.sort_values('Correlation', ascending=False)
+    area_df = analysis1.area_table(moments_stats(area_moments, columns, pairs=PAIR))
+    return correlation, property_df, area_df
+
+
+# مؤشر الاستثمار من مجاميع كل منطقة ومجاميع كل (منطقة، سنة) للسياحة
+def investment_scores(area_moments, year_moments, tourism_min, tourism_max, verbose=True):
+    invest = moments_stats(area_moments, ['tourism_activity', 'avg_meter_price', 'transactions_count'])
+
+    recent = year_moments.index.get_level_values('year') >= analysis2.GROWTH_SPLIT_YEAR
+    period = year_moments.groupby([year_moments.index.get_level_values('area_name_en'), recent])[
+        ['count', 'tourism_activity_sum']].sum()
+    period_tourism = (period['tourism_activity_sum'] / period['count']).unstack()
+    period_tourism = period_tourism.reindex(index=invest.index, columns=[False, True])
+
+    overall_mean_price = invest['avg_meter_price_sum'].sum() / invest['count'].sum()
+    return analysis2.score_areas(invest, period_tourism, tourism_min, tourism_max,
+                                 overall_mean_price, verbose)
+
+
+# جدول الأشهر لتحليل المواسم من مجاميع كل (سنة، شهر) وأزواج (سنة، شهر، منطقة)
+def monthly_table(month_moments, month_areas):
+    monthly = month_moments.sort_index()
+    areas = month_areas.groupby(level=['year', 'month']).size()
+    monthly_stats = pd.DataFrame({
+        'year': monthly.index.get_level_values('year').astype(np.int32),
+        'month': monthly.index.get_level_values('month').astype(np.int32),
+        'avg_meter_price': (monthly['avg_meter_price_sum'] / monthly['count']).to_numpy(),
+        'tourism_activity': (monthly['tourism_activity_sum'] / monthly['count']).to_numpy(),
+        'transactions_count': monthly['transactions_count_sum'].to_numpy().astype(np.int64),
+        'area_name_en': areas.reindex(monthly.index).to_numpy()
+    })
+    monthly_stats['month_name'] = monthly_stats['month'].map(analysis3.month_names)
+    return monthly_stats
+
+
+# إعادة بناء جداول النتائج من المجاميع فقط بدون المرور على السجل الكامل
+def build_tables(state):
+    correlation, property_df, area_df = correlation_tables(state['property'], state['area'])
+    scores = investment_scores(state['invest_area'], state['invest_year'],
+                               state['tourism_min'], state['tourism_max'])
+
+    stability_df = analysis3.stability_table(
+        moments_stats(state['stability'], ['price_smooth', 'transactions_count']))
+
+    monthly_stats = monthly_table(state['season_month'], state['season_areas'])
+
+    return {
+        'correlation': correlation,
+        'property_df': property_df,
+        'area_df': area_df,
+        'scores_df': scores['scores_df'] if scores else None,
+        'stability_df': stability_df,
+        'monthly_stats': monthly_stats,
+        'monthly_patterns': analysis3.patterns_table(monthly_stats)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold newly appended months into the saved aggregates")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--rebuild", action="store_true", help="ignore saved aggregates and start over")
+    parser.add_argument("--out", help="directory to write the result tables as CSV")
+    args = parser.parse_args()
+
+    state = update(args.data, full=args.rebuild)
+    tables = build_tables(state)
+    print(f"Overall correlation: {tables['correlation']:.4f}")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for name in TABLES:
+            if tables[name] is not None:
+                tables[name].to_csv(os.path.join(args.out, name + ".csv"), index=False)
+        print(f"Tables written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import compact
+from data_loader import (COLUMNAR_SUFFIX, SNAPSHOT_VERSION, file_hash, optimize_types, pa,
+                         snapshot_paths, write_columnar, write_meta)
+
+if pa is not None:
+    import pyarrow.csv
+
+# أعمدة الملف المدمج بترتيبها
+COLUMNS = ['year_month', 'area_name_en', 'property_type_en', *compact.MEASURES, *compact.TOURISM_COLUMNS]
+KEYS = ['year_month', 'area_name_en', 'property_type_en']
+
+# أعمدة ملف الصفقات الخام (بيانات دائرة الأراضي المفتوحة) وما يقابلها في الملف المدمج
+RAW_KEYS = {'instance_date': 'year_month', 'area_name_en': 'area_name_en', 'property_type_en': 'property_type_en'}
+RAW_MEASURES = {'meter_sale_price': 'avg_meter_price', 'actual_worth': 'avg_actual_worth',
+                'procedure_area': 'avg_area'}
+DATE_FORMAT = '%d-%m-%Y'
+TOURISM_DATE_FORMAT = '%Y-%m'
+# الصفقات المحسوبة حسب مجموعتها (البيع فقط)، والشرط يُطبق إذا كان العمود موجوداً
+GROUP_COLUMN = 'trans_group_en'
+GROUPS = ('Sales',)
+# منازل التقريب كما في الملف المدمج
+DECIMALS = {'avg_meter_price': 2, 'avg_actual_worth': 1, 'avg_area': 2}
+
+# حجم كتلة القراءة من ملف الصفقات (pyarrow)، أو عدد صفوف الدفعة بدون pyarrow
+BLOCK_BYTES = 16 << 20
+CHUNK_ROWS = 500_000
+
+# أعمدة السياحة التي يجب أن تأتي من المصادر، والمشتقة تُحسب منها إذا لم تأتِ
+TOURISM_INPUTS = ['hotels', 'rooms', 'POIs', 'occupancy_rate']
+TOURISM_DERIVED = ['tourism_intensity', 'occupancy_rate_adjusted', 'tourism_activity']
+# أوزان مكونات النشاط السياحي
+ACTIVITY_WEIGHTS = {'hotels': 0.3, 'rooms': 0.3, 'POIs': 0.2, 'occupancy_rate_adjusted': 0.2}
+
+# حدود القيم المقبولة [low، high] (None بدون حد)
+# صفقة خارج حدودها تُستبعد، وقيمة سياحة خارج حدودها خطأ في المصدر
+TRANSACTION_RANGES = {'avg_meter_price': (0.01, None), 'avg_actual_worth': (1, None), 'avg_area': (0.01, None)}
+TOURISM_RANGES = {
+    'hotels': (0, None),
+    'rooms': (0, None),
+    'POIs': (0, None),
+    'occupancy_rate': (0, 1),
+    'tourism_intensity': (0, None),
+    'occupancy_rate_adjusted': (0, None),
+    'tourism_activity': (0, 100)
+}
+
+
+def check_columns(path, columns, required):
+    missing = [c for c in required if c not in columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+
+
+def in_range(values, bounds):
+    low, high = bounds
+    ok = ~np.isnan(values)
+    if low is not None:
+        ok &= values >= low
+    if high is not None:
+        ok &= values <= high
+    return ok
+
+
+# أسماء القيم بصيغة الملف المدمج (القيم الفارغة NaN)
+def month_labels(values, date_format=DATE_FORMAT):
+    return pd.to_datetime(pd.Index(values), format=date_format, errors='coerce').strftime('%Y-%m')
+
+
+def area_labels(values):
+    labels = pd.Index(values).astype(str).str.strip().str.lower()
+    return labels.where(labels != '')
+
+
+def type_labels(values):
+    labels = pd.Index(values).astype(str).str.strip()
+    return labels.where(labels != '')
+
+
+# ---------- الصفقات: قراءة على دفعات وتجميع كل دفعة إلى مجاميع (شهر، منطقة، نوع) ----------
+
+# دفعات من أعمدة الصفقات فقط، والنصوص فئات حتى يُحوّل كل تاريخ أو اسم مختلف مرة واحدة
+def read_transactions(path):
+    header = list(pd.read_csv(path, nrows=0).columns)
+    check_columns(path, header, [*RAW_KEYS, *RAW_MEASURES])
+    text = [*RAW_KEYS] + ([GROUP_COLUMN] if GROUP_COLUMN in header else [])
+    columns = text + list(RAW_MEASURES)
+
+    if pa is None:
+        with pd.read_csv(path, usecols=columns, chunksize=CHUNK_ROWS,
+                         dtype={c: 'category' for c in text}) as reader:
+            yield from reader
+        return
+
+    reader = pyarrow.csv.open_csv(
+        path,
+        read_options=pyarrow.csv.ReadOptions(block_size=BLOCK_BYTES),
+        convert_options=pyarrow.csv.ConvertOptions(
+            include_columns=columns,
+            column_types={**{c: pa.dictionary(pa.int32(), pa.string()) for c in text},
+                          **{c: pa.float64() for c in RAW_MEASURES}}))
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+# أرقام القيم بعد تحويل أسماء الفئات (-1 للقيم الفارغة أو التي لا تتحول) وقائمة الأسماء
+def relabel(values, convert):
+    values = pd.Categorical(values)
+    labels = convert(values.categories)
+    uniques = pd.Index(labels.dropna().unique())
+    lookup = np.append(uniques.get_indexer(labels), -1).astype(np.int64)
+    return lookup[values.codes], uniques
+
+
+# مجاميع دفعة واحدة: جدول (شهر، منطقة، نوع) بعدد الصفقات ومجموع كل مقياس، وعدد الصفوف المستبعدة لكل سبب
+def aggregate_batch(batch, date_format=DATE_FORMAT):
+    converters = {'instance_date': lambda values: month_labels(values, date_format),
+                  'area_name_en': area_labels, 'property_type_en': type_labels}
+    codes, labels = {}, {}
+    for raw, convert in converters.items():
+        codes[raw], labels[raw] = relabel(batch[raw], convert)
+    measures = {name: batch[raw].to_numpy(dtype=np.float64) for raw, name in RAW_MEASURES.items()}
+
+    checks = {}
+    if GROUP_COLUMN in batch:
+        checks['other_group'] = ~batch[GROUP_COLUMN].isin(GROUPS).to_numpy()
+    checks['bad_date'] = codes['instance_date'] < 0
+    checks['missing_key'] = (codes['area_name_en'] < 0) | (codes['property_type_en'] < 0)
+    checks['out_of_range'] = ~np.logical_and.reduce(
+        [in_range(values, TRANSACTION_RANGES[name]) for name, values in measures.items()])
+
+    # كل صف يُنسب لأول سبب استبعاد
+    keep = np.ones(len(batch), dtype=bool)
+    dropped = {}
+    for reason, bad in checks.items():
+        dropped[reason] = int((keep & bad).sum())
+        keep &= ~bad
+
+    if not keep.any():
+        return pd.DataFrame(columns=KEYS + ['transactions_count', *RAW_MEASURES.values()]), dropped
+
+    sizes = [len(labels[raw]) for raw in RAW_KEYS]
+    cell = np.ravel_multi_index([codes[raw][keep] for raw in RAW_KEYS], sizes)
+    cells, inverse = np.unique(cell, return_inverse=True)
+    sums = {'transactions_count': np.bincount(inverse, minlength=len(cells))}
+    for name, values in measures.items():
+        sums[name] = np.bincount(inverse, weights=values[keep], minlength=len(cells))
+
+    index = np.unravel_index(cells, sizes)
+    table = pd.DataFrame({name: np.asarray(labels[raw])[k]
+                          for (raw, name), k in zip(RAW_KEYS.items(), index)})
+    for name, values in sums.items():
+        table[name] = values
+    return table, dropped
+
+
+# تجميع كل ملفات الصفقات إلى صفوف الملف المدمج (متوسطات كل شهر ومنطقة ونوع)
+def aggregate_transactions(paths, date_format=DATE_FORMAT):
+    parts = []
+    report = {'rows': 0}
+    for path in paths:
+        for batch in read_transactions(path):
+            table, dropped = aggregate_batch(batch, date_format)
+            if len(table):
+                parts.append(table)
+            report['rows'] += len(batch)
+            for reason, count in dropped.items():
+                report[reason] = report.get(reason, 0) + count
+
+    if not parts:
+        raise ValueError("no valid transaction rows to ingest")
+    sums = pd.concat(parts, ignore_index=True).groupby(KEYS, sort=True).sum().reset_index()
+    count = sums['transactions_count'].to_numpy()
+    for name, decimals in DECIMALS.items():
+        sums[name] = np.round(sums[name] / count, decimals)
+    report['kept'] = int(count.sum())
+    return sums, report
+
+
+# ---------- السياحة: جداول الفنادق والمعالم لكل (شهر، منطقة) أو لكل منطقة ----------
+
+# المؤشرات المشتقة لكل صف، والمؤشر الموجود في table يبقى كما هو:
+# الكثافة حجم الغرف نسبة إلى reference_rooms، الإشغال المعدل بالكثافة،
+# والنشاط مجموع موزون للقيم المعيارية بعد تحويله إلى 0-100
+def tourism_scores(table, reference_rooms):
+    def get(name):
+        return None if table.get(name) is None else np.asarray(table[name], dtype=np.float64)
+
+    def z(values):
+        return (values - values.mean()) / values.std()
+
+    scores = {name: get(name) for name in ['hotels', 'rooms', 'POIs', 'occupancy_rate'] + TOURISM_DERIVED}
+    if scores['tourism_intensity'] is None:
+        scores['tourism_intensity'] = (scores['rooms'] / reference_rooms) ** 0.25
+    if scores['occupancy_rate_adjusted'] is None:
+        scores['occupancy_rate_adjusted'] = scores['occupancy_rate'] * scores['tourism_intensity'] ** 0.3
+    if scores['tourism_activity'] is None:
+        activity = sum(weight * z(scores[name]) for name, weight in ACTIVITY_WEIGHTS.items())
+        scores['tourism_activity'] = (activity - activity.min()) / (activity.max() - activity.min()) * 100
+    return {name: scores[name] for name in TOURISM_DERIVED}
+
+
+def read_tourism_source(path, date_format):
+    table = pd.read_csv(path)
+    check_columns(path, table.columns, ['area_name_en'])
+    columns = [c for c in table.columns if c in TOURISM_RANGES]
+    if not columns:
+        raise ValueError(f"{path}: no tourism columns (expected any of {', '.join(TOURISM_RANGES)})")
+
+    keys = ['year_month', 'area_name_en'] if 'year_month' in table else ['area_name_en']
+    table['area_name_en'] = area_labels(table['area_name_en'])
+    if 'year_month' in table:
+        table['year_month'] = month_labels(table['year_month'].astype(str), date_format)
+    if table[keys].isna().any(axis=None):
+        raise ValueError(f"{path}: rows with a missing or unreadable {' or '.join(keys)}")
+    if table.duplicated(keys).any():
+        raise ValueError(f"{path}: more than one row per {' and '.join(keys)}")
+    return keys, table[keys + columns]
+
+
+# جدول سياحة واحد لكل (شهر، منطقة) من كل المصادر، مع التحقق من القيم وحساب المؤشرات الناقصة
+# المصادر بدون year_month (مثل عدد المعالم لكل منطقة) تُربط بكل أشهر المنطقة
+def build_tourism(paths, date_format=TOURISM_DATE_FORMAT):
+    monthly, static = None, None
+    seen = set()
+    for path in paths:
+        keys, table = read_tourism_source(path, date_format)
+        repeated = seen.intersection(table.columns.difference(keys))
+        if repeated:
+            raise ValueError(f"{path}: {', '.join(sorted(repeated))} already given by another source")
+        seen.update(table.columns.difference(keys))
+        if 'year_month' in keys:
+            monthly = table if monthly is None else monthly.merge(table, on=keys, how='outer')
+        else:
+            static = table if static is None else static.merge(table, on=keys, how='outer')
+
+    if monthly is None:
+        raise ValueError("at least one tourism source needs a year_month column")
+    if static is not None:
+        monthly = monthly.merge(static, on='area_name_en', how='left')
+    check_columns("tourism sources", monthly.columns, TOURISM_INPUTS)
+
+    for name in [c for c in TOURISM_RANGES if c in monthly]:
+        values = monthly[name].to_numpy(dtype=np.float64)
+        bad = ~in_range(values, TOURISM_RANGES[name]) & ~np.isnan(values)
+        if bad.any():
+            low, high = TOURISM_RANGES[name]
+            raise ValueError(f"{name}: {int(bad.sum())} values outside [{low}, {high}]")
+
+    # الخلايا الناقصة في أحد المصادر لا سياحة لها، فصفقاتها لا تدخل الملف المدمج
+    monthly = monthly.dropna(subset=[c for c in TOURISM_RANGES if c in monthly])
+    monthly = monthly.sort_values(['year_month', 'area_name_en'], ignore_index=True)
+    first = monthly['year_month'] == monthly['year_month'].iloc[0]
+    reference_rooms = np.median(monthly.loc[first, 'rooms'].to_numpy(dtype=np.float64))
+    for name, values in tourism_scores(monthly, reference_rooms).items():
+        monthly[name] = values
+    return monthly
+
+
+# الملف المدمج: صفقات كل (شهر، منطقة، نوع) مع سياحة نفس الشهر والمنطقة
+def merge(transactions, tourism):
+    merged = transactions.merge(tourism, on=['year_month', 'area_name_en'], how='inner')
+    for name in ['hotels', 'rooms', 'POIs']:
+        merged[name] = merged[name].astype(np.int64)
+    return merged.sort_values(KEYS, ignore_index=True)[COLUMNS]
+
+
+# كتابة الناتج: ملف .arrow تقرأه التحليلات مباشرة (مع بصمته)، أو CSV بنفس صيغة الملف المدمج
+def write_output(merged, path):
+    if not path.endswith(COLUMNAR_SUFFIX):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        merged.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+        return
+    if pa is None:
+        raise ImportError(f"writing {path} needs pyarrow")
+
+    write_columnar(optimize_types(merged), path)
+    stat = os.stat(path)
+    write_meta(snapshot_paths(path)[1], {
+        'version': SNAPSHOT_VERSION,
+        'source': os.path.abspath(path),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha256': file_hash(path)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the merged dataset from raw DLD transactions and tourism sources")
+    parser.add_argument("--transactions", nargs="+", required=True,
+                        help="raw transaction CSVs with " + ", ".join([*RAW_KEYS, *RAW_MEASURES]))
+    parser.add_argument("--tourism", nargs="+", required=True,
+                        help="tourism CSVs keyed by area_name_en (and year_month), with any of " + ", ".join(TOURISM_RANGES))
+    parser.add_argument("--date-format", default=DATE_FORMAT, help="format of instance_date")
+    parser.add_argument("--out", required=True, help=f"output file: {COLUMNAR_SUFFIX} (read directly with --data) or .csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    transactions, report = aggregate_transactions(args.transactions, args.date_format)
+    elapsed = time.perf_counter() - start
+    print(f"Read {report['rows']} transactions in {elapsed:.2f}s ({report['rows'] / max(elapsed, 1e-9) / 1e6:.2f}M rows/s)")
+    dropped = {reason: count for reason, count in report.items() if reason not in ('rows', 'kept') and count}
+    if dropped:
+        print("Dropped: " + ", ".join(f"{reason} {count}" for reason, count in dropped.items()))
+
+    tourism = build_tourism(args.tourism)
+    merged = merge(transactions, tourism)
+    print(f"{len(transactions)} (month, area, type) cells, {len(merged)} with tourism data")
+    write_output(merged, args.out)
+    print(f"Merged dataset written to {args.out} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
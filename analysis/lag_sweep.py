@@ -0,0 +1,127 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from analysis3 import RISK_COLUMNS, RISK_SUBSET, SMOOTH_MIN_PERIODS, SMOOTH_WINDOW
+from compact import load_model, view
+from rolling import rolling_mean
+
+# أكبر إزاحة بالأشهر وأقل عدد أشهر مشتركة لحساب الارتباط
+MAX_LAG = 12
+MIN_MONTHS = 18
+
+PARAMS = {
+    'max_lag': MAX_LAG,
+    'min_months': MIN_MONTHS,
+    'smooth_window': SMOOTH_WINDOW,
+    'smooth_min_periods': SMOOTH_MIN_PERIODS
+}
+
+
+# مصفوفة (منطقة × شهر) لمتوسط كل عمود، الأشهر الناقصة NaN
+def area_month_matrix(df, columns):
+    # أرقام المناطق مرتبة بالاسم مباشرة من الفئات بدل مقارنة النصوص
+    area_codes, areas = pd.factorize(df['area_name_en'], sort=True)
+    areas = np.asarray(areas).astype(str)
+    months = df['year_month'].to_numpy().astype('datetime64[M]').astype(np.int64) + 1970 * 12
+    first = months.min()
+    n_months = months.max() - first + 1
+    cell = area_codes * n_months + (months - first)
+    size = len(areas) * n_months
+
+    counts = np.bincount(cell, minlength=size)
+    matrices = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col in columns:
+            sums = np.bincount(cell, weights=df[col].to_numpy(dtype=np.float64), minlength=size)
+            matrices[col] = np.where(counts > 0, sums / counts, np.nan).reshape(len(areas), n_months)
+
+    index = pd.period_range(pd.Period(year=first // 12, month=first % 12 + 1, freq='M'),
+                            periods=n_months, freq='M')
+    return pd.Index(areas, name='area'), index, matrices
+
+
+# تنعيم كل صف (منطقة) على محور الأشهر
+def smooth_rows(matrix, window=SMOOTH_WINDOW, min_periods=SMOOTH_MIN_PERIODS):
+    n_areas, n_months = matrix.shape
+    positions = np.tile(np.arange(n_months), n_areas)
+    return rolling_mean(matrix.ravel(), positions, window, min_periods).reshape(matrix.shape)
+
+
+# ارتباط السعر بالسياحة المتأخرة لكل المناطق ولكل إزاحة دفعة واحدة
+def lagged_correlations(price, tourism, max_lag=MAX_LAG, min_months=MIN_MONTHS):
+    n_areas, n_months = price.shape
+    corr = np.full((n_areas, max_lag + 1), np.nan)
+    observations = np.zeros((n_areas, max_lag + 1), dtype=np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for lag in range(min(max_lag, n_months - 1) + 1):
+            x = price[:, lag:]
+            y = tourism[:, :n_months - lag]
+            valid = ~np.isnan(x) & ~np.isnan(y)
+            n = valid.sum(axis=1)
+
+            x = np.where(valid, x, 0.0)
+            y = np.where(valid, y, 0.0)
+            dx = np.where(valid, x - (x.sum(axis=1) / n)[:, None], 0.0)
+            dy = np.where(valid, y - (y.sum(axis=1) / n)[:, None], 0.0)
+
+            r = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+            corr[:, lag] = np.where(n >= min_months, np.clip(r, -1, 1), np.nan)
+            observations[:, lag] = n
+
+    return corr, observations
+
+
+def analyze_lags(df, max_lag=MAX_LAG, min_months=MIN_MONTHS,
+                 window=SMOOTH_WINDOW, min_periods=SMOOTH_MIN_PERIODS, verbose=True):
+    areas, months, matrices = area_month_matrix(df, ['avg_meter_price', 'tourism_activity'])
+    price = smooth_rows(matrices['avg_meter_price'], window, min_periods)
+    tourism = smooth_rows(matrices['tourism_activity'], window, min_periods)
+
+    corr, observations = lagged_correlations(price, tourism, max_lag, min_months)
+    lag_df = pd.DataFrame(corr, index=areas,
+                          columns=pd.Index(range(max_lag + 1), name='lag'))
+
+    # أفضل إزاحة لكل منطقة: أعلى ارتباط بالقيمة المطلقة
+    has_corr = ~np.isnan(corr).all(axis=1)
+    best = np.nanargmax(np.where(np.isnan(corr), -1, np.abs(corr)), axis=1)
+    rows = np.arange(len(areas))
+
+    best_lag_df = pd.DataFrame({
+        'area': areas,
+        'best_lag': best,
+        'best_corr': corr[rows, best].round(3),
+        'months': observations[rows, best]
+    })[has_corr]
+    best_lag_df = best_lag_df.sort_values('best_corr', key=np.abs, ascending=False)
+
+    if verbose:
+        print(f"Lag sweep 0-{max_lag} completed for {len(best_lag_df)} areas")
+
+    return {
+        'lag_df': lag_df,
+        'best_lag_df': best_lag_df
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lagged price/tourism cross-correlation for every area")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG)
+    parser.add_argument("--min-months", type=int, default=MIN_MONTHS)
+    parser.add_argument("--out", help="CSV file for the best lag per area")
+    args = parser.parse_args()
+
+    df = view(load_model(args.data), RISK_COLUMNS, RISK_SUBSET)
+    results = analyze_lags(df, args.max_lag, args.min_months)
+
+    if args.out:
+        results['best_lag_df'].to_csv(args.out, index=False)
+    else:
+        print(results['best_lag_df'].head(15).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
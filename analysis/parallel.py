@@ -0,0 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# أقل عدد صفوف لاستخدام العمليات المتوازية، تحته يبقى الحساب في عملية واحدة
+PARALLEL_MIN_ROWS = 500_000
+# عدد الأجزاء لكل عملية (أجزاء أصغر توزع الحمل بشكل أفضل)
+PARTS_PER_WORKER = 4
+
+
+def use_processes(rows, workers):
+    return workers is not None and workers > 1 and rows >= PARALLEL_MIN_ROWS
+
+
+# نسخ الأعمدة إلى ذاكرة مشتركة مرة واحدة، والعمليات تقرأ أجزاءها منها بدون نسخ
+def share(arrays):
+    blocks = {}
+    specs = {}
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+        blocks[name] = block
+        specs[name] = (block.name, values.dtype.str, values.shape)
+    return blocks, specs
+
+
+def attach(specs):
+    blocks = []
+    arrays = {}
+    for name, (block_name, dtype, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+# حدود الأجزاء: كل جزء مجموعة مناطق متتالية بعدد صفوف متقارب
+def partition(codes, parts):
+    n = len(codes)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    targets = np.arange(1, parts) * n // parts
+    cuts = starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)]
+    return np.unique(np.r_[0, cuts, n])
+
+
+def run_part(func, specs, inputs, outputs, start, stop):
+    blocks, arrays = attach(specs)
+    try:
+        frame = pd.DataFrame({name: arrays[name][start:stop] for name in inputs}, copy=False)
+        result = func(frame)
+        for name in outputs:
+            arrays[name][start:stop] = frame[name].to_numpy()
+        del frame
+        return result
+    finally:
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+# تطبيق func على كل جزء من المناطق في عملية مستقلة
+# func تستقبل جدولاً عمود area_name_en فيه رقم المنطقة، وترجع نتيجة مفهرسة بهذا الرقم
+# outputs أعمدة تضيفها func وتُعاد مرتبة مثل صفوف df (مثل عمود جديد في الحساب المتسلسل)
+def map_areas(df, columns, func, workers, outputs=()):
+    codes, areas = pd.factorize(df['area_name_en'])
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+
+    arrays = {'area_name_en': codes.astype(np.int32)}
+    for col in columns:
+        arrays[col] = df[col].to_numpy()[order]
+    for name in outputs:
+        arrays[name] = np.full(len(df), np.nan)
+
+    blocks, specs = share(arrays)
+    try:
+        bounds = partition(codes, workers * PARTS_PER_WORKER)
+        inputs = ['area_name_en'] + list(columns)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_part, func, specs, inputs, outputs, start, stop)
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            parts = [future.result() for future in futures]
+
+        values = {}
+        for name in outputs:
+            values[name] = np.empty(len(df))
+            values[name][order] = np.ndarray(len(df), np.float64, buffer=blocks[name].buf)
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    return parts, values, np.asarray(areas)
+
+
+# جمع نتائج الأجزاء بترتيبها وإرجاع أسماء المناطق بدل أرقامها
+def combine(parts, areas):
+    result = pd.concat(parts)
+    return result.set_axis(pd.Index(areas.take(result.index.to_numpy()), name='area_name_en'))
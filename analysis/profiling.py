@@ -0,0 +1,139 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+
+# قراءة قيمة من /proc/self/status بالميغابايت (لينكس فقط)
+def proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    return proc_status_mb("VmRSS")
+
+
+# أعلى استهلاك للذاكرة منذ آخر تصفير (أو منذ بداية العملية إن لم يمكن التصفير)
+def peak_rss_mb():
+    peak = proc_status_mb("VmHWM")
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = round(peak / MB if sys.platform == "darwin" else peak / 1024, 1)
+    return peak
+
+
+# تصفير أعلى استهلاك حتى يُنسب لكل مرحلة وحدها
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# عدد صفوف الجداول داخل نتيجة مرحلة (جدول أو قاموس جداول، والقناع بعدد صفوفه المختارة)
+def table_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, np.ndarray) and value.dtype == bool:
+        return int(value.sum())
+    if isinstance(value, dict):
+        return sum(table_rows(item) for item in value.values())
+    return 0
+
+
+def start():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+# تشغيل مرحلة مع قياس الوقت والمعالج والذاكرة، وحفظ cProfile إن طُلب مجلد له
+def measure(name, func, profile_dir=None):
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0]
+    reset_peak_rss()
+    rss_start = rss_mb()
+
+    profiler = cProfile.Profile() if profile_dir else None
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        output = func()
+    finally:
+        if profiler:
+            profiler.disable()
+
+    record = {
+        'wall_s': round(time.perf_counter() - wall, 4),
+        'cpu_s': round(time.process_time() - cpu, 4),
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_delta_mb': None,
+        'traced_peak_mb': None
+    }
+    rss_end = rss_mb()
+    if rss_start is not None and rss_end is not None:
+        record['rss_delta_mb'] = round(rss_end - rss_start, 1)
+    if tracing:
+        record['traced_peak_mb'] = round((tracemalloc.get_traced_memory()[1] - traced_start) / MB, 1)
+
+    if profiler:
+        os.makedirs(profile_dir, exist_ok=True)
+        record['profile'] = os.path.join(profile_dir, name + ".prof")
+        profiler.dump_stats(record['profile'])
+
+    return output, record
+
+
+def write_report(records, path, total):
+    report = {
+        'total_s': round(total, 4),
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'stages': records
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+# القيم غير المتاحة (None، مثل ذاكرة العملية على Windows) تُكتب "-"
+def number(value, fmt):
+    return format(value, fmt) if value is not None else "-"
+
+
+def print_summary(records, total):
+    print()
+    print(f"{'Stage':<14}{'Wall (s)':>10}{'CPU (s)':>10}{'Peak MB':>10}"
+          f"{'Traced MB':>11}{'Rows in':>10}{'Rows out':>10}")
+    for name, record in records.items():
+        note = "  (cached)" if record.get('cached') else ""
+        print(f"{name:<14}{record['wall_s']:>10.3f}{number(record.get('cpu_s'), '.3f'):>10}"
+              f"{number(record.get('peak_rss_mb'), '.0f'):>10}"
+              f"{number(record.get('traced_peak_mb'), '.1f'):>11}"
+              f"{number(record.get('rows_in'), 'd'):>10}{number(record.get('rows_out'), 'd'):>10}{note}")
+    print(f"{'total':<14}{total:>10.3f}")
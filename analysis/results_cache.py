@@ -0,0 +1,91 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+from data_loader import CACHE_DIR
+
+# مجلد نتائج المراحل والحد الأقصى لحجمه (يحذف الأقدم استخداماً عند تجاوزه)
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+CACHE_LIMIT = int(os.environ.get("DASHBOARD_CACHE_MB", "512")) * 1024 * 1024
+
+
+# بصمة الكود المستخدم في الحساب: تغيير الرسوم فقط لا يغير المفتاح
+def code_hash(*objects):
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_key(stage, fingerprint, params, code=""):
+    payload = json.dumps({
+        'stage': stage,
+        'data': fingerprint,
+        'params': params,
+        'code': code
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def entry_path(key):
+    return os.path.join(RESULTS_DIR, key + ".pkl")
+
+
+def get(key):
+    path = entry_path(key)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    # تحديث وقت الاستخدام لترتيب الحذف (LRU)
+    os.utime(path)
+    return value
+
+
+def put(key, value, limit=CACHE_LIMIT):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = entry_path(key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    evict(limit)
+
+
+# حذف أقدم النتائج استخداماً حتى يعود الحجم تحت الحد
+def evict(limit=CACHE_LIMIT):
+    entries = []
+    for name in os.listdir(RESULTS_DIR):
+        if name.endswith(".pkl"):
+            path = os.path.join(RESULTS_DIR, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        os.remove(path)
+        total -= size
+
+
+def clear():
+    if os.path.isdir(RESULTS_DIR):
+        for name in os.listdir(RESULTS_DIR):
+            os.remove(os.path.join(RESULTS_DIR, name))
+
+
+# إرجاع النتيجة المحفوظة أو حسابها وحفظها
+# القيمة الثانية تبين إن كانت النتيجة من الذاكرة المؤقتة
+def cached(key, compute):
+    value = get(key)
+    if value is not None:
+        return value, True
+
+    value = compute()
+    if value is not None:
+        put(key, value)
+    return value, False
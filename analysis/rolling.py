@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+# موقع كل صف داخل مجموعته (البيانات يجب أن تكون مرتبة حسب المجموعة)
+def group_positions(keys):
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        codes = keys.cat.codes.to_numpy()
+    else:
+        codes, _ = pd.factorize(keys)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    new_group = np.r_[True, codes[1:] != codes[:-1]]
+    starts = np.flatnonzero(new_group)
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+# متوسط متحرك داخل كل مجموعة بنفس قواعد pandas (min_periods على القيم غير الفارغة)
+def rolling_mean(values, positions, window, min_periods=None):
+    x = np.asarray(values, dtype=np.float64)
+    if min_periods is None:
+        min_periods = window
+
+    present = ~np.isnan(x)
+    filled = np.where(present, x, 0.0)
+
+    # الجمع يتم داخل نفس المصفوفات بدون مصفوفات مؤقتة بحجم البيانات في كل خطوة
+    total = filled.copy()
+    count = present.astype(np.int32)
+    for k in range(1, window):
+        inside = positions[k:] >= k
+        np.add(total[k:], filled[:-k], out=total[k:], where=inside)
+        count[k:] += inside & present[:-k]
+    del filled
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(total, count, out=total)
+    total[count < min_periods] = np.nan
+    return total
+
+
+# إزاحة القيم داخل كل مجموعة (مثل groupby().shift)
+def shift(values, positions, lag):
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full_like(x, np.nan)
+    if lag == 0:
+        return x.copy()
+    if lag < len(x):
+        out[lag:] = np.where(positions[lag:] >= lag, x[:-lag], np.nan)
+    return out
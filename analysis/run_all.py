@@ -0,0 +1,400 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+import analysis1
+import analysis2
+import analysis3
+import anomalies
+import bootstrap
+import compact
+import forecast
+import group_stats
+import lag_sweep
+import parallel
+import profiling
+import results_cache
+import rolling
+import sketches
+from data_loader import data_fingerprint
+
+# مع Copy-on-Write تشارك الأعمدة المختارة ذاكرة الإطار الأصلي بدون نسخ
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# الأعمدة وشروط التنظيف لكل مرحلة تحليل
+VIEWS = {
+    'correlation': (analysis1.COLUMNS, analysis1.CLEAN_SUBSET),
+    'investment': (analysis2.COLUMNS, analysis2.CLEAN_SUBSET),
+    'seasonality': (analysis3.SEASON_COLUMNS, analysis3.SEASON_SUBSET),
+    'risk': (analysis3.RISK_COLUMNS, analysis3.RISK_SUBSET),
+    'anomalies': (anomalies.COLUMNS, anomalies.SUBSET)
+}
+
+
+def stage_load(results, options):
+    return compact.load_model(options.get('data'))
+
+
+# تنظيف واحد لكل المراحل: قناع الصفوف المكتملة لكل مرحلة بدل نسخ الجدول
+def stage_clean(results, options):
+    model = results['load']
+    return {name: compact.valid(model, subset) for name, (columns, subset) in VIEWS.items()}
+
+
+# جدول المرحلة بأعمدتها فقط، يُبنى من النموذج المضغوط عند تشغيلها ويُحذف بعد انتهائها
+# الأسعار الشاذة تُقص أو تُستبعد قبله حسب options['anomalies']
+def stage_frame(results, view, options):
+    model = results['load']
+    facts, mask = anomalies.apply(model['facts'], results['clean'][view], results['anomalies']['report_df'],
+                                  options.get('anomalies', anomalies.MODE))
+    return compact.view({**model, 'facts': facts}, VIEWS[view][0], mask=mask)
+
+
+def stage_anomalies(results, options):
+    mask = results['clean']['anomalies']
+    return anomalies.detect(compact.view(results['load'], VIEWS['anomalies'][0], mask=mask),
+                            rows=np.flatnonzero(mask), verbose=False)
+
+
+def stage_correlation(results, options):
+    return analysis1.analyze(stage_frame(results, 'correlation', options), workers=options.get('processes'),
+                             interval_method=options.get('interval_method') or analysis1.INTERVAL_METHOD,
+                             verbose=False)
+
+
+def stage_investment(results, options):
+    return analysis2.analyze(stage_frame(results, 'investment', options), workers=options.get('processes'),
+                             sketch_error=options.get('sketch_error'), verbose=False)
+
+
+def stage_seasonality(results, options):
+    return analysis3.analyze_seasons(stage_frame(results, 'seasonality', options),
+                                     sketch_error=options.get('sketch_error'), verbose=False)
+
+
+def stage_risk(results, options):
+    return analysis3.analyze_risk(stage_frame(results, 'risk', options), workers=options.get('processes'),
+                                  verbose=False)
+
+
+def stage_lags(results, options):
+    return lag_sweep.analyze_lags(stage_frame(results, 'risk', options), verbose=False)
+
+
+def stage_forecast(results, options):
+    return forecast.analyze_forecast(stage_frame(results, 'risk', options), verbose=False)
+
+
+# مراحل الرسوم تعيد أسماء الرسوم التي أُعيد رسمها
+def stage_charts1(results, options):
+    return analysis1.draw_charts(results['correlation'], stage_frame(results, 'correlation', options),
+                                 workers=options.get('workers'), force=options.get('redraw'), verbose=False)
+
+
+def stage_charts2(results, options):
+    if results['investment'] is None:
+        return None
+    return analysis2.draw_charts(results['investment'], workers=options.get('workers'),
+                                 force=options.get('redraw'), verbose=False)
+
+
+def stage_charts3(results, options):
+    combined = dict(results['seasonality'])
+    combined.update(results['risk'])
+    return analysis3.draw_charts(combined, workers=options.get('workers'), force=options.get('redraw'),
+                                 verbose=False)
+
+
+# كل مرحلة: الدالة والمراحل التي تعتمد عليها
+STAGES = {
+    'load': (stage_load, []),
+    'clean': (stage_clean, ['load']),
+    'anomalies': (stage_anomalies, ['clean']),
+    'correlation': (stage_correlation, ['anomalies']),
+    'investment': (stage_investment, ['anomalies']),
+    'seasonality': (stage_seasonality, ['anomalies']),
+    'risk': (stage_risk, ['anomalies']),
+    'lags': (stage_lags, ['anomalies']),
+    'forecast': (stage_forecast, ['anomalies']),
+    'charts1': (stage_charts1, ['anomalies', 'correlation']),
+    'charts2': (stage_charts2, ['investment']),
+    'charts3': (stage_charts3, ['seasonality', 'risk'])
+}
+
+
+# ملخص سطر واحد لكل مرحلة يطبعه المنسق بعد انتهائها، فلا تتداخل مخرجات المراحل المتوازية
+def summary_load(output, results):
+    return f"{len(output['facts'])} rows"
+
+
+def summary_anomalies(output, results):
+    report = output['report_df']
+    single = int((report['transactions'] == 1).sum())
+    return (f"{len(report)} of {int(results['clean']['anomalies'].sum())} rows flagged "
+            f"({single} with a single transaction)")
+
+
+def summary_correlation(output, results):
+    return (f"overall {output['correlation']:.4f} (p-value {output['p_value']:.6f}), "
+            f"{len(output['area_df'])} areas")
+
+
+def summary_investment(output, results):
+    if output is None:
+        return "no valid areas for scoring"
+    return (f"{len(output['scores_df'])} areas scored, {len(output['emerging_areas'])} emerging, "
+            f"{len(output['stable_areas'])} stable")
+
+
+def summary_seasonality(output, results):
+    text = f"{len(output['monthly_stats'])} months"
+    if output['winter_price'] is not None:
+        text += f", better buying season: {'Summer' if output['summer_price'] < output['winter_price'] else 'Winter'}"
+    return text
+
+
+def summary_risk(output, results):
+    return f"{len(output['risk_df'])} risk areas, {len(output['stability_df'])} stability areas"
+
+
+def summary_lags(output, results):
+    return f"best lag of 0-{lag_sweep.MAX_LAG} for {len(output['best_lag_df'])} areas"
+
+
+def summary_forecast(output, results):
+    return (f"{output['forecast_df']['area'].nunique()} areas, backtest price MAPE "
+            f"{output['price_mape']:.2f}% (seasonal naive {output['naive_price_mape']:.2f}%)")
+
+
+def summary_charts(charts):
+    def summary(output, results):
+        if output is None:
+            return "skipped"
+        return f"rendered {', '.join(output) or 'none'} ({len(charts) - len(output)} unchanged)"
+    return summary
+
+
+SUMMARIES = {
+    'load': summary_load,
+    'anomalies': summary_anomalies,
+    'correlation': summary_correlation,
+    'investment': summary_investment,
+    'seasonality': summary_seasonality,
+    'risk': summary_risk,
+    'lags': summary_lags,
+    'forecast': summary_forecast,
+    'charts1': summary_charts(analysis1.CHARTS),
+    'charts2': summary_charts(analysis2.CHARTS),
+    'charts3': summary_charts(analysis3.CHARTS)
+}
+
+
+# المراحل التي تحفظ نتائجها: الأعمدة المستخدمة والمعاملات والدوال التي تحدد النتيجة
+CACHED_STAGES = {
+    'anomalies': ('anomalies', anomalies.PARAMS,
+                  [anomalies.detect, anomalies.rolling_median_mad, anomalies.sorted_median]),
+    'correlation': ('correlation', analysis1.PARAMS,
+                    [analysis1.analyze, analysis1.property_table, analysis1.area_table,
+                     analysis1.classify, analysis1.significant, group_stats, bootstrap]),
+    'investment': ('investment', analysis2.PARAMS,
+                   [analysis2.analyze, analysis2.area_statistics, analysis2.score_areas, analysis2.score_components,
+                    analysis2.component_matrix, analysis2.composite_score,
+                    analysis2.classify, analysis2.tourism_range, analysis2.area_median_price,
+                    group_stats, sketches]),
+    'seasonality': ('seasonality', analysis3.SEASON_PARAMS,
+                    [analysis3.analyze_seasons, analysis3.patterns_table, analysis3.month_scores,
+                     analysis3.month_score_components, group_stats, sketches]),
+    'risk': ('risk', analysis3.RISK_PARAMS,
+             [analysis3.analyze_risk, analysis3.smooth_area_stats, analysis3.risk_tables,
+              analysis3.stability_table, group_stats, rolling]),
+    'lags': ('risk', lag_sweep.PARAMS, [lag_sweep, rolling]),
+    'forecast': ('risk', forecast.PARAMS, [forecast, lag_sweep.area_month_matrix])
+}
+
+
+def stage_key(name, options):
+    view, params, code = CACHED_STAGES[name]
+    settings = {'params': params, 'view': VIEWS[view]}
+    # النتائج التقريبية تُحفظ بمفتاح مختلف عن النتائج الدقيقة
+    if options.get('sketch_error') is not None:
+        settings['sketch_error'] = options['sketch_error']
+    if name == 'correlation' and options.get('interval_method'):
+        settings['interval_method'] = options['interval_method']
+    # الجداول المبنية بعد معالجة الأسعار الشاذة تتبع طريقة المعالجة ونتيجة الكشف
+    mode = options.get('anomalies', anomalies.MODE)
+    if name != 'anomalies' and mode != 'off':
+        settings['anomalies'] = [mode, stage_key('anomalies', options)]
+    return results_cache.cache_key(
+        name,
+        data_fingerprint(options.get('data')),
+        settings,
+        # جداول المراحل تُبنى من النموذج المضغوط، فكوده جزء من كل مفتاح
+        results_cache.code_hash(compact, *code)
+    )
+
+
+# المراحل المطلوبة مع كل ما تعتمد عليه
+def resolve(only=None):
+    if not only:
+        return list(STAGES)
+
+    selected = set()
+    todo = list(only)
+    while todo:
+        name = todo.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        todo.extend(STAGES[name][1])
+    return [name for name in STAGES if name in selected]
+
+
+# عدد صفوف المدخلات: جدول المرحلة بعد التنظيف أو نتائج المراحل التي تعتمد عليها
+def input_rows(name, results):
+    if name in CACHED_STAGES:
+        return int(results['clean'][CACHED_STAGES[name][0]].sum())
+    return sum(profiling.table_rows(results[dep]) for dep in STAGES[name][1] if dep not in ('clean', 'anomalies'))
+
+
+def timed(name, results, options):
+    func = STAGES[name][0]
+
+    def compute():
+        if options.get('cache') and name in CACHED_STAGES:
+            return results_cache.cached(stage_key(name, options),
+                                        lambda: func(results, options))
+        return func(results, options), False
+
+    if options.get('instrument'):
+        (output, hit), record = profiling.measure(name, compute, options.get('profile'))
+        record['rows_in'] = input_rows(name, results)
+        record['rows_out'] = profiling.table_rows(output)
+    else:
+        start = time.perf_counter()
+        output, hit = compute()
+        record = {'wall_s': time.perf_counter() - start}
+    record['cached'] = hit
+    return output, record
+
+
+# تشغيل المراحل كرسم اعتماديات: كل مرحلة تبدأ بمجرد جاهزية مدخلاتها
+def run_pipeline(stages, options=None, workers=None):
+    options = options or {}
+    results = {}
+    records = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            ready = [name for name in pending
+                     if all(dep in results for dep in STAGES[name][1])]
+            for name in ready:
+                pending.remove(name)
+                running[pool.submit(timed, name, results, options)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], records[name] = future.result()
+                if name in SUMMARIES:
+                    print(f"{name:<14}{SUMMARIES[name](results[name], results)}")
+
+    return results, {name: records[name] for name in STAGES if name in records}
+
+
+# كتابة نتائج التحليل: كل جدول في ملف CSV، والقيم الأخرى في ملف JSON لكل مرحلة
+def write_tables(results, out):
+    os.makedirs(out, exist_ok=True)
+    for name in CACHED_STAGES:
+        output = results.get(name)
+        if output is None:
+            continue
+
+        values = {}
+        for key, value in output.items():
+            if isinstance(value, pd.DataFrame):
+                value.to_csv(os.path.join(out, f"{name}_{key}.csv"), index=value.index.name is not None)
+            else:
+                values[key] = value
+        if values:
+            with open(os.path.join(out, f"{name}.json"), "w") as f:
+                json.dump(values, f, indent=2, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+    print(f"Tables written to {out}")
+
+
+def print_timings(records, total):
+    print()
+    print(f"{'Stage':<14}{'Time (s)':>10}")
+    for name, record in records.items():
+        note = "  (cached)" if record['cached'] else ""
+        print(f"{name:<14}{record['wall_s']:>10.3f}{note}")
+    print(f"{'total':<14}{total:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all dashboard analyses from one in-memory frame")
+    parser.add_argument("--only", help="comma separated stages to run (dependencies are added): " + ", ".join(STAGES))
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker threads")
+    parser.add_argument("--processes", type=int, default=1,
+                        help=f"worker processes for the per-area analytics (used from {parallel.PARALLEL_MIN_ROWS} rows)")
+    parser.add_argument("--no-charts", action="store_true", help="compute only: skip the charts (plotly is never imported) and write the tables")
+    parser.add_argument("--out", help="directory for the result tables as CSV/JSON (default with --no-charts: tables)")
+    parser.add_argument("--sketch-error", type=float,
+                        help="approximate percentiles and distinct counts with sketches at this relative error, e.g. 0.01 (default: exact)")
+    parser.add_argument("--interval-method", choices=bootstrap.METHODS,
+                        help="area correlation intervals: bootstrap with permutation p-values (default) "
+                             "or the approximate Fisher z interval, which needs no resampling")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage instead of reusing saved results")
+    parser.add_argument("--anomalies", choices=anomalies.MODES, default=anomalies.MODE,
+                        help="price anomalies before the analyses: report only (off), drop their rows (flag) "
+                             "or clip them to the rolling median/MAD bound (winsorize)")
+    parser.add_argument("--redraw", action="store_true", help="rewrite every chart, not only those whose data or code changed")
+    parser.add_argument("--report", help="measure CPU, memory and rows per stage and write a JSON report (stages run one at a time)")
+    parser.add_argument("--profile", metavar="DIR", help="like --report, and dump cProfile stats per stage into DIR")
+    args = parser.parse_args()
+
+    only = [s.strip() for s in args.only.split(',') if s.strip()] if args.only else None
+    for name in only or []:
+        if name not in STAGES:
+            parser.error(f"unknown stage: {name}")
+
+    stages = resolve(only)
+    if args.no_charts:
+        stages = [name for name in stages if not name.startswith('charts')]
+    out = args.out or ("tables" if args.no_charts else None)
+
+    # القياس يحتاج تشغيل المراحل واحدة تلو الأخرى حتى تُنسب الذاكرة والمعالج لكل مرحلة
+    instrument = bool(args.report or args.profile)
+    workers = 1 if instrument else args.workers
+    if instrument:
+        profiling.start()
+
+    start = time.perf_counter()
+    options = {'data': args.data, 'cache': not args.no_cache, 'processes': args.processes,
+               'workers': args.workers, 'redraw': args.redraw, 'anomalies': args.anomalies,
+               'sketch_error': args.sketch_error, 'interval_method': args.interval_method, 'instrument': instrument, 'profile': args.profile}
+    results, records = run_pipeline(stages, options, workers=workers)
+    total = time.perf_counter() - start
+    if out:
+        write_tables(results, out)
+
+    if not instrument:
+        print_timings(records, total)
+        return
+
+    profiling.print_summary(records, total)
+    report = args.report or os.path.join(args.profile, "report.json")
+    profiling.write_report(records, report, total)
+    print(f"Report written to {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import analysis2
+from compact import load_model, view
+from group_stats import group_stats
+
+# معاملات السيناريو وقيمها الافتراضية من analysis2 (الأعمدة الناقصة في ملف السيناريوهات تأخذها)
+DEFAULTS = {
+    **analysis2.SCORE_WEIGHTS,
+    'growth_split_year': analysis2.GROWTH_SPLIT_YEAR,
+    'min_months': analysis2.MIN_MONTHS,
+    'growth_min_months': analysis2.GROWTH_MIN_MONTHS,
+    'growth_min': analysis2.GROWTH_BOUNDS[0],
+    'growth_max': analysis2.GROWTH_BOUNDS[1],
+    'stability_min': analysis2.STABILITY_MIN,
+    'liquidity_scale': analysis2.LIQUIDITY_SCALE,
+    'liquidity_max': analysis2.LIQUIDITY_MAX,
+    **{f"cutoff_{rating.lower().replace(' ', '_')}": cutoff
+       for rating, cutoff in analysis2.RATING_CUTOFFS.items()}
+}
+
+# المعاملات التي تغير المكونات نفسها، فالسيناريوهات تُجمع بها وتُحسب مكوناتها مرة لكل مجموعة
+STRUCTURE = ['growth_split_year', 'growth_min_months']
+
+RATINGS = list(analysis2.RATING_CUTOFFS) + ['Weak']
+CUTOFFS = [c for c in DEFAULTS if c.startswith('cutoff_')]
+TOP_AREAS = 10
+
+# عدد الخلايا (منطقة × سيناريو) في كل دفعة
+BATCH_CELLS = 4_000_000
+
+
+# ملف السيناريوهات: CSV (سيناريو لكل سطر) أو JSON (قائمة قواميس)، والمعاملات غير المعروفة خطأ
+def load_scenarios(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            scenarios = pd.DataFrame(json.load(f))
+    else:
+        scenarios = pd.read_csv(path)
+
+    unknown = [c for c in scenarios.columns if c not in DEFAULTS and c != 'scenario']
+    if unknown:
+        raise ValueError(f"unknown scenario parameters: {', '.join(unknown)}")
+    if 'scenario' in scenarios:
+        scenarios = scenarios.set_index('scenario')
+        if not scenarios.index.is_unique:
+            raise ValueError("scenario names must be unique")
+    for name, value in DEFAULTS.items():
+        scenarios[name] = scenarios[name].fillna(value) if name in scenarios else value
+    check_cutoffs(scenarios)
+    return scenarios[list(DEFAULTS)]
+
+
+# حدود التصنيف يجب أن تنزل بترتيب RATINGS (Excellent أعلاها)، وإلا لا يطابق عدّ الحدود classify
+def check_cutoffs(scenarios):
+    cutoffs = scenarios[CUTOFFS].to_numpy(dtype=np.float64)
+    unordered = (np.diff(cutoffs, axis=1) > 0).any(axis=1)
+    if unordered.any():
+        names = ', '.join(map(str, scenarios.index[unordered][:5]))
+        raise ValueError(f"rating cutoffs must not increase from {CUTOFFS[0]} to {CUTOFFS[-1]} "
+                         f"(scenarios: {names})")
+
+
+# المقاييس الأساسية لكل منطقة تُحسب مرة واحدة: إحصاءات المنطقة ومجاميع السياحة لكل سنة
+def base_metrics(df_clean):
+    df_clean['year'] = df_clean['year_month'].dt.year
+    area_stats = group_stats(df_clean, 'area_name_en',
+                             ['tourism_activity', 'avg_meter_price', 'transactions_count'])
+    yearly = group_stats(df_clean, ['area_name_en', 'year'], ['tourism_activity'])
+
+    return {
+        'area_stats': area_stats,
+        'yearly': yearly[['count', 'tourism_activity_sum']],
+        'tourism_min': df_clean['tourism_activity'].min(),
+        'tourism_max': df_clean['tourism_activity'].max(),
+        'overall_mean_price': df_clean['avg_meter_price'].mean()
+    }
+
+
+# متوسط السياحة قبل سنة المقارنة وبعدها لكل منطقة
+def period_tourism(base, split_year):
+    yearly = base['yearly']
+    recent = yearly.index.get_level_values('year') >= split_year
+    period = yearly.groupby([yearly.index.get_level_values('area_name_en'), recent])[
+        ['count', 'tourism_activity_sum']].sum()
+    period = (period['tourism_activity_sum'] / period['count']).unstack()
+    return period.reindex(index=base['area_stats'].index, columns=[False, True])
+
+
+# نقاط كل (منطقة، سيناريو) بنفس حساب composite_score، والحدود والأوزان أعمدة لكل سيناريو
+def score_matrix(components, scenarios):
+    param = {name: scenarios[name].to_numpy(dtype=np.float64)[None, :] for name in scenarios}
+    raw = {name: components[name].to_numpy()[:, None] for name in components}
+
+    values = [
+        np.minimum(np.maximum(raw['tourism_growth'], param['growth_min']), param['growth_max']),
+        np.maximum(raw['price_stability'], param['stability_min']),
+        np.minimum(raw['liquidity'] * param['liquidity_scale'], param['liquidity_max']),
+        raw['tourism_level'],
+        raw['price_attractiveness']
+    ]
+    weights = list(analysis2.SCORE_WEIGHTS)
+    score = values[0] * param[weights[0]]
+    for name, value in zip(weights[1:], values[1:]):
+        score = score + value * param[name]
+    return np.round(score, 2)
+
+
+# ترتيب المناطق في كل سيناريو (1 الأعلى نقاطاً، والنقاط الفارغة في الآخر)، والمناطق غير المؤهلة 0
+# الترتيب ثابت عند التساوي (بترتيب المناطق)
+def rank_matrix(score, eligible):
+    # النقاط مقربة لرقمين عشريين، فإذا كان مداها أقل من 655 نقطة تُرتب كأعداد uint16 (ترتيب radix)
+    cents = np.round(score.T * 100)
+    scored = eligible.T & ~np.isnan(cents)
+    high = cents[scored].max() if scored.any() else 0
+    low = cents[scored].min() if scored.any() else 0
+    if high - low < np.iinfo(np.uint16).max - 1:
+        key = np.where(scored, high - cents, np.iinfo(np.uint16).max - 1)
+        key[~eligible.T] = np.iinfo(np.uint16).max
+        key = key.astype(np.uint16)
+    else:
+        key = np.where(scored, -cents, np.finfo(np.float64).max)
+        key[~eligible.T] = np.inf
+    order = np.argsort(key, axis=1, kind='stable')
+    del key
+
+    ranks = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, order.shape[1] + 1, dtype=np.int32)[None, :], axis=1)
+    return np.where(eligible, ranks.T, 0)
+
+
+# رقم التصنيف لكل (منطقة، سيناريو) بترتيب RATINGS: عدد الحدود التي لم تبلغها النقاط
+# (يساوي classify فقط إذا كانت الحدود نازلة، وهذا ما يتحقق منه check_cutoffs)
+def rating_matrix(score, scenarios):
+    rating = np.zeros(score.shape, dtype=np.int8)
+    for name in CUTOFFS:
+        rating += ~(score >= scenarios[name].to_numpy(dtype=np.float64)[None, :])
+    return rating
+
+
+# تقييم كل السيناريوهات كمصفوفة (منطقة × سيناريو) على دفعات، وتجميع ثبات الترتيب لكل منطقة
+def evaluate(base, scenarios, top=TOP_AREAS):
+    # كل المناطق بدون شرط الأشهر، والشرط يُطبق لكل سيناريو
+    areas = base['area_stats'].index
+    n = len(areas)
+    totals = {
+        'scenarios': np.zeros(n, dtype=np.int64),
+        'rank_sum': np.zeros(n),
+        'rank_sumsq': np.zeros(n),
+        'best': np.full(n, np.iinfo(np.int32).max, dtype=np.int64),
+        'worst': np.zeros(n, dtype=np.int64),
+        'top': np.zeros(n, dtype=np.int64),
+        'ratings': np.zeros((n, len(RATINGS)), dtype=np.int64)
+    }
+    summary = []
+    per_batch = max(1, BATCH_CELLS // max(n, 1))
+
+    for key, group in scenarios.groupby(STRUCTURE, sort=False):
+        structure = dict(zip(STRUCTURE, key))
+        components = analysis2.score_components(
+            base['area_stats'], period_tourism(base, structure['growth_split_year']),
+            base['tourism_min'], base['tourism_max'], base['overall_mean_price'],
+            min_months=0, growth_min_months=structure['growth_min_months'])
+        months = components['months'].to_numpy()[:, None]
+
+        for start in range(0, len(group), per_batch):
+            batch = group.iloc[start:start + per_batch]
+            score = score_matrix(components, batch)
+            eligible = months >= batch['min_months'].to_numpy()[None, :]
+            ranks = rank_matrix(score, eligible)
+            ratings = rating_matrix(score, batch)
+
+            totals['scenarios'] += eligible.sum(axis=1)
+            totals['rank_sum'] += ranks.sum(axis=1)
+            totals['rank_sumsq'] += (ranks.astype(np.float64) ** 2).sum(axis=1)
+            totals['best'] = np.minimum(totals['best'], np.where(eligible, ranks, np.iinfo(np.int32).max).min(axis=1))
+            totals['worst'] = np.maximum(totals['worst'], ranks.max(axis=1))
+            totals['top'] += ((ranks > 0) & (ranks <= top)).sum(axis=1)
+            for k in range(len(RATINGS)):
+                totals['ratings'][:, k] += ((ratings == k) & eligible).sum(axis=1)
+
+            first = np.argmax(ranks == 1, axis=0)
+            has_areas = eligible.any(axis=0)
+            summary.append(pd.DataFrame({
+                'Top Area': np.where(has_areas, np.asarray(areas.astype(str))[first], None),
+                'Top Score': np.where(has_areas, score[first, np.arange(len(batch))], np.nan),
+                'Areas': eligible.sum(axis=0)
+            }, index=batch.index))
+
+    return totals, pd.concat(summary).reindex(scenarios.index)
+
+
+# جدول ثبات الترتيب لكل منطقة مقارنة بالسيناريو الافتراضي
+def stability_table(base, totals, top=TOP_AREAS):
+    baseline = pd.DataFrame([DEFAULTS])
+    base_totals, _ = evaluate(base, baseline, top)
+    base_rank = base_totals['rank_sum'].astype(np.int64)
+    base_rating = base_totals['ratings'].argmax(axis=1)
+
+    n = totals['scenarios']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_rank = totals['rank_sum'] / n
+        rank_std = np.sqrt(np.maximum(totals['rank_sumsq'] / n - mean_rank ** 2, 0))
+        same_rating = totals['ratings'][np.arange(len(n)), base_rating] / n * 100
+
+    table = pd.DataFrame({
+        'Area': base['area_stats'].index,
+        'Base Rank': np.where(base_rank > 0, base_rank, np.nan),
+        'Base Rating': np.where(base_rank > 0, np.asarray(RATINGS)[base_rating], None),
+        'Scenarios': n,
+        'Mean Rank': np.round(mean_rank, 2),
+        'Rank Std': np.round(rank_std, 2),
+        'Best Rank': np.where(n > 0, totals['best'], np.nan),
+        'Worst Rank': np.where(n > 0, totals['worst'], np.nan),
+        f"Top {top} %": np.round(totals['top'] / np.maximum(n, 1) * 100, 2),
+        'Same Rating %': np.round(same_rating, 2)
+    })
+    table = table[n > 0].sort_values(['Mean Rank', 'Base Rank'])
+    return table
+
+
+def run_scenarios(df_clean, scenarios, top=TOP_AREAS):
+    check_cutoffs(scenarios)
+    base = base_metrics(df_clean)
+    totals, summary = evaluate(base, scenarios, top)
+    return {
+        'area_df': stability_table(base, totals, top),
+        'scenario_df': summary
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate many Investment Score parameter sets at once")
+    parser.add_argument("scenarios", help="CSV (one scenario per row) or JSON list of parameter sets; "
+                                          "columns: " + ", ".join(DEFAULTS))
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--top", type=int, default=TOP_AREAS, help="rank counted as a top position")
+    parser.add_argument("--out", help="directory for area_stability.csv and scenarios.csv")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    df_clean = view(load_model(args.data), analysis2.COLUMNS, analysis2.CLEAN_SUBSET)
+
+    start = time.perf_counter()
+    results = run_scenarios(df_clean, scenarios, args.top)
+    print(f"{len(scenarios)} scenarios evaluated in {time.perf_counter() - start:.2f}s")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        results['area_df'].to_csv(os.path.join(args.out, "area_stability.csv"), index=False)
+        results['scenario_df'].to_csv(os.path.join(args.out, "scenarios.csv"))
+        print(f"Tables written to {args.out}")
+    else:
+        print(results['area_df'].head(15).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
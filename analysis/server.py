@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import json
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import analysis1
+import analysis2
+import analysis3
+import anomalies
+import compact
+import incremental
+import run_all
+from group_stats import group_codes, group_moments, pearson_p_value, sort_groups
+
+HOST = "127.0.0.1"
+PORT = 8050
+
+# عدد الإجابات المحفوظة (الأقدم استخداماً يُحذف أولاً)
+CACHE_SIZE = 256
+
+# أعمدة الفلترة تبقى مع كل جدول حتى لو لم يستخدمها التحليل
+FILTER_COLUMNS = ['year_month', 'property_type_en', 'area_name_en']
+
+# أقل عدد صفوف بعد الفلترة للإجابة
+MIN_ROWS = 3
+
+# مفاتيح المجاميع المحفوظة لكل جدول: الفلاتر تختار الخلايا المطابقة ثم تجمعها
+# المخاطر تحتاج ترتيب الأشهر داخل كل منطقة (متوسط متحرك) فتبقى على الصفوف
+CELL_KEYS = {
+    'correlation': ['year', 'property_type_en', 'area_name_en'],
+    'investment': ['year', 'property_type_en', 'area_name_en'],
+    'seasonality': ['year', 'month', 'property_type_en', 'area_name_en']
+}
+CELL_COLUMNS = {
+    'correlation': ['tourism_activity', 'avg_meter_price'],
+    'investment': ['tourism_activity', 'avg_meter_price', 'transactions_count'],
+    'seasonality': ['avg_meter_price', 'tourism_activity', 'transactions_count']
+}
+
+# النوع أو المنطقة الفارغة والسنة الفارغة في مفاتيح الخلايا
+MISSING = 'nan'
+MISSING_YEAR = -1
+
+# المخاطر تحتاج منطقة واحدة على الأقل تكفي أشهرها بعد التنعيم والإزاحة لجدولي المخاطر والاستقرار
+RISK_MIN_AREA_ROWS = (max(analysis3.MIN_RISK_MONTHS, analysis3.MIN_STABILITY_MONTHS) +
+                      analysis3.SMOOTH_MIN_PERIODS - 1 + analysis3.TOURISM_LAG)
+
+# الوسيط والمئينات لا تُجمع من المجاميع، فيُحسب مؤشر الاستثمار عندها من الصفوف
+INVESTMENT_FROM_CELLS = (analysis2.SEGMENT_PRICE == 'mean' and
+                         tuple(analysis2.TOURISM_LEVEL_PERCENTILES) == (0, 100))
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# الجداول النظيفة لكل تحليل ومجاميع خلاياها تبقى في الذاكرة طوال عمل الخدمة
+# الأسعار الشاذة تُعالج مرة واحدة عند التحميل بنفس طريقة run_all
+def load_views(path=None, mode=anomalies.MODE):
+    model = compact.load_model(path)
+    report = anomalies.detect_model(model)['report_df']
+
+    views = {}
+    for name, (columns, subset) in run_all.VIEWS.items():
+        if name == 'anomalies':
+            continue
+        facts, mask = anomalies.apply(model['facts'], compact.valid(model, subset), report, mode)
+        keep = list(dict.fromkeys(columns + FILTER_COLUMNS))
+        view = compact.view({**model, 'facts': facts}, keep, mask=mask)
+        views[name] = {
+            'frame': view,
+            'columns': columns,
+            'year': view['year_month'].dt.year.to_numpy(),
+            'property': view['property_type_en'],
+            'area': view['area_name_en']
+        }
+        if name in CELL_KEYS:
+            views[name]['cells'] = view_cells(name, views[name])
+    return views
+
+
+# القيم الفارغة تصبح فئة MISSING حتى لا تُسقطها المجاميع
+def with_missing(values):
+    values = values.array
+    if values.isna().any():
+        values = values.add_categories([MISSING]).fillna(MISSING)
+    return values
+
+
+# مجاميع كل خلية (سنة، نوع عقار، منطقة، والشهر للمواسم) تُحسب مرة واحدة عند التحميل
+# المفاتيح هي نفس قيم الفلترة في select حتى تطابق الخلايا المختارة الصفوف المختارة
+# الخلايا جدول مسطح بمفاتيح فئوية (categorical) لتكون الفلترة والجمع على أرقامها
+def view_cells(name, view):
+    frame = view['frame']
+    keys = pd.DataFrame({
+        'year': pd.Series(view['year']).fillna(MISSING_YEAR).astype(np.int64).to_numpy(),
+        'month': frame['year_month'].dt.month.to_numpy(),
+        'property_type_en': with_missing(view['property']),
+        'area_name_en': with_missing(view['area'])
+    })
+    for col in CELL_COLUMNS[name]:
+        keys[col] = frame[col].to_numpy()
+
+    pairs = incremental.PAIR if name == 'correlation' else ()
+    cells = group_moments(keys, CELL_KEYS[name], CELL_COLUMNS[name], pairs=pairs)
+
+    # حدود تطبيع مستوى السياحة هي أقل وأعلى قيمة، فتُحفظ لكل خلية
+    if name == 'investment' and len(cells):
+        order, starts, _ = sort_groups(keys, CELL_KEYS[name])
+        tourism = keys['tourism_activity'].to_numpy(dtype=np.float64)[order]
+        cells['tourism_min'] = np.minimum.reduceat(tourism, starts)
+        cells['tourism_max'] = np.maximum.reduceat(tourism, starts)
+
+    cells = cells.reset_index()
+    for key in ['property_type_en', 'area_name_en']:
+        if key in cells:
+            cells[key] = cells[key].astype('category')
+    return cells
+
+
+# مجموع مجاميع الخلايا (group_moments) لكل مجموعة من المفاتيح، مرتبة مثل groupby
+def cell_sums(cells, by, columns=None):
+    codes, index = group_codes(cells, by, sort=True)
+    if columns is None:
+        columns = [c for c in cells.columns if c == 'count' or c.endswith(('_sum', '_sumsq', '_prod'))]
+    return pd.DataFrame({col: np.bincount(codes, weights=cells[col].to_numpy(dtype=np.float64),
+                                          minlength=len(index))
+                         for col in columns}, index=index)
+
+
+def parse_list(params, name):
+    values = [v.strip() for item in params.get(name, []) for v in item.split(',') if v.strip()]
+    return values or None
+
+
+def parse_int(params, name, default=None):
+    if name not in params:
+        return default
+    try:
+        return int(params[name][-1])
+    except ValueError:
+        raise QueryError(400, f"{name} must be an integer")
+
+
+# الفلاتر المشتركة: من سنة إلى سنة، نوع العقار، المنطقة
+def filter_mask(year, prop, area, params):
+    mask = np.ones(len(year), dtype=bool)
+
+    start_year = parse_int(params, 'start_year')
+    end_year = parse_int(params, 'end_year')
+    if start_year is not None:
+        mask &= year >= start_year
+    if end_year is not None:
+        mask &= year <= end_year
+
+    types = parse_list(params, 'property_type')
+    if types:
+        mask &= pd.Series(prop).isin(types).to_numpy()
+    areas = parse_list(params, 'area')
+    if areas:
+        mask &= pd.Series(area).isin([a.lower() for a in areas]).to_numpy()
+    return mask
+
+
+def select(view, params):
+    mask = filter_mask(view['year'], view['property'], view['area'], params)
+    if mask.sum() < MIN_ROWS:
+        raise QueryError(404, "no rows match the filters")
+    return view['frame'].loc[mask, view['columns']]
+
+
+# نفس الفلاتر على مفاتيح الخلايا المحفوظة
+def select_cells(view, params):
+    cells = view['cells']
+    year = cells['year'].to_numpy(dtype=np.float64)
+    year[year == MISSING_YEAR] = np.nan
+    mask = filter_mask(year, cells['property_type_en'], cells['area_name_en'], params)
+    if cells['count'].to_numpy()[mask].sum() < MIN_ROWS:
+        raise QueryError(404, "no rows match the filters")
+    return cells if mask.all() else cells[mask]
+
+
+def records(df):
+    if df is None:
+        return []
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def number(value):
+    if value is None or np.isnan(value):
+        return None
+    return float(value)
+
+
+# فترات الثقة (1000 إعادة معاينة) تحتاج الصفوف، فتُحسب من الجدول فقط عند طلبها بـ intervals=1
+# وبدونها تُبنى الجداول من مجاميع الخلايا المختارة
+def correlation_query(view, params):
+    if parse_int(params, 'intervals', 0):
+        frame = select(view, params)
+        rows = len(frame)
+        results = analysis1.analyze(frame, verbose=False)
+    else:
+        cells = select_cells(view, params)
+        rows = int(cells['count'].sum())
+        correlation, property_df, area_df = incremental.correlation_tables(
+            cell_sums(cells, 'property_type_en'), cell_sums(cells, 'area_name_en'))
+        results = {
+            'correlation': correlation,
+            'p_value': pearson_p_value(correlation, rows),
+            'property_df': property_df,
+            'top_10': area_df.sort_values('Correlation', ascending=False).head(10) if not area_df.empty else None
+        }
+    return {
+        'rows': rows,
+        'correlation': number(results['correlation']),
+        'p_value': number(results['p_value']),
+        'property_types': records(results['property_df']),
+        'top_areas': records(results['top_10'])
+    }
+
+
+def investment_query(view, params):
+    top = parse_int(params, 'top', 10)
+    if INVESTMENT_FROM_CELLS:
+        cells = select_cells(view, params)
+        rows = int(cells['count'].sum())
+        results = incremental.investment_scores(
+            cell_sums(cells, 'area_name_en'), cell_sums(cells, ['area_name_en', 'year']),
+            cells['tourism_min'].min(), cells['tourism_max'].max(), verbose=False)
+    else:
+        frame = select(view, params)
+        rows = len(frame)
+        results = analysis2.analyze(frame, verbose=False)
+
+    if results is None:
+        return {'rows': rows, 'areas': [], 'emerging': [], 'stable': []}
+    return {
+        'rows': rows,
+        'areas': records(results['scores_df'].head(top)),
+        'emerging': results['emerging_areas']['Area'].tolist(),
+        'stable': results['stable_areas']['Area'].tolist()
+    }
+
+
+# نفس نتائج analysis3.analyze_seasons من مجاميع الخلايا
+def season_results(cells):
+    monthly_stats = incremental.monthly_table(
+        cell_sums(cells, ['year', 'month']),
+        cell_sums(cells[cells['area_name_en'] != MISSING], ['year', 'month', 'area_name_en'], ['count']))
+
+    by_month = cell_sums(cells, 'month')
+    winter = by_month[by_month.index.isin([12, 1, 2])]
+    summer = by_month[by_month.index.isin([6, 7, 8])]
+    winter_price = summer_price = None
+    if not winter.empty and not summer.empty:
+        winter_price = winter['avg_meter_price_sum'].sum() / winter['count'].sum()
+        summer_price = summer['avg_meter_price_sum'].sum() / summer['count'].sum()
+
+    property_timing = {}
+    by_property = cell_sums(cells[cells['property_type_en'] != MISSING], ['property_type_en', 'month'])
+    for prop, monthly in by_property.groupby(level='property_type_en', sort=False):
+        if monthly['count'].sum() < analysis3.MIN_TIMING_ROWS:
+            continue
+        monthly = monthly.droplevel('property_type_en')
+        property_timing[prop] = analysis3.timing(pd.DataFrame({
+            'month': monthly.index.to_numpy(),
+            'avg_meter_price': (monthly['avg_meter_price_sum'] / monthly['count']).to_numpy(),
+            'transactions_count': monthly['transactions_count_sum'].to_numpy()
+        }))
+
+    return {
+        'monthly_patterns': analysis3.patterns_table(monthly_stats, verbose=False),
+        'winter_price': winter_price,
+        'summer_price': summer_price,
+        'property_timing': property_timing
+    }
+
+
+def months_query(view, params):
+    cells = select_cells(view, params)
+    results = season_results(cells)
+    patterns = results['monthly_patterns'].sort_values('buy_score', ascending=False)
+    return {
+        'rows': int(cells['count'].sum()),
+        'months': records(patterns),
+        'winter_price': number(results['winter_price']),
+        'summer_price': number(results['summer_price']),
+        'property_timing': {
+            prop: {key: value.item() if hasattr(value, 'item') else value
+                   for key, value in timing.items()}
+            for prop, timing in results['property_timing'].items()
+        }
+    }
+
+
+def risk_query(view, params):
+    top = parse_int(params, 'top', 15)
+    frame = select(view, params)
+    if frame['area_name_en'].value_counts().max() < RISK_MIN_AREA_ROWS:
+        raise QueryError(422, "not enough months per area for these filters")
+    results = analysis3.analyze_risk(frame, verbose=False)
+    return {
+        'rows': len(frame),
+        'areas': records(results['risk_df'].head(top))
+    }
+
+
+# كل مسار: الجدول الذي يقرأ منه ودالة الإجابة
+QUERIES = {
+    '/api/correlation': ('correlation', correlation_query),
+    '/api/investment': ('investment', investment_query),
+    '/api/months': ('seasonality', months_query),
+    '/api/risk': ('risk', risk_query)
+}
+
+
+def meta_query(views):
+    view = views['correlation']
+    return {
+        'years': sorted(int(y) for y in np.unique(view['year'])),
+        'property_types': sorted(view['property'].dropna().unique().tolist()),
+        'areas': sorted(view['area'].dropna().unique().tolist()),
+        'endpoints': sorted(QUERIES) + ['/api/meta']
+    }
+
+
+def new_service(views):
+    return {
+        'views': views,
+        'cache': OrderedDict(),
+        # التحليلات تعمل واحدة تلو الأخرى في خيط منفصل حتى لا توقف استقبال الطلبات
+        'executor': ThreadPoolExecutor(max_workers=1)
+    }
+
+
+def compute(views, path, params):
+    if path == '/api/meta':
+        return meta_query(views)
+    if path not in QUERIES:
+        raise QueryError(404, f"unknown endpoint: {path}")
+
+    view, query = QUERIES[path]
+    return query(views[view], params)
+
+
+# الإجابة من الذاكرة المؤقتة إن وُجدت، والمفتاح هو المسار مع المعاملات مرتبة
+async def answer(service, target):
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    key = (url.path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+    cache = service['cache']
+    if key in cache:
+        cache.move_to_end(key)
+        return 200, cache[key]
+
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(service['executor'], compute,
+                                            service['views'], url.path, params)
+    except QueryError as e:
+        return e.status, json.dumps({'error': str(e)}).encode()
+    # أي خطأ آخر يُسجل ويصل إلى العميل كإجابة 500 بدل إغلاق الاتصال بدون رد
+    except Exception:
+        traceback.print_exc()
+        return 500, json.dumps({'error': "internal error"}).encode()
+
+    body = json.dumps(result).encode()
+    cache[key] = body
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+    return 200, body
+
+
+async def handle(service, reader, writer):
+    try:
+        request = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request.decode("latin-1").split()
+        start = time.perf_counter()
+        if len(parts) < 2 or parts[0] not in ("GET", "HEAD"):
+            status, body = 405, json.dumps({'error': "only GET is supported"}).encode()
+        else:
+            status, body = await answer(service, parts[1])
+
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        if parts and parts[0] != "HEAD":
+            writer.write(body)
+        await writer.drain()
+        if len(parts) >= 2:
+            print(f"{parts[0]} {parts[1]} {status} {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        writer.close()
+
+
+async def serve(views, host=HOST, port=PORT):
+    service = new_service(views)
+    server = await asyncio.start_server(partial(handle, service), host, port)
+    print(f"Serving dashboard queries on http://{host}:{port}/api/meta")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON API for filtered dashboard analytics")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--anomalies", choices=anomalies.MODES, default=anomalies.MODE,
+                        help="how price anomalies are handled before answering queries")
+    args = parser.parse_args()
+
+    print("Loading merged dataset...")
+    views = load_views(args.data, args.anomalies)
+    try:
+        asyncio.run(serve(views, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
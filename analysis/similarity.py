@@ -0,0 +1,198 @@
+import argparse
+import difflib
+import time
+
+import numpy as np
+import pandas as pd
+
+import results_cache
+import run_all
+
+# خصائص كل منطقة: (المرحلة، الجدول، عمود الاسم، العمود)، والخصائص في LOG_FEATURES تُقارن بلوغاريتمها
+FEATURES = {
+    'Avg Meter Price': ('investment', 'scores_df', 'Area', 'Avg Meter Price'),
+    'Tourism Level': ('investment', 'scores_df', 'Area', 'Tourism Level'),
+    'Tourism Growth %': ('investment', 'scores_df', 'Area', 'Tourism Growth %'),
+    'Price Stability %': ('investment', 'scores_df', 'Area', 'Price Stability %'),
+    'Monthly Liquidity': ('investment', 'scores_df', 'Area', 'Monthly Liquidity'),
+    'Price Volatility %': ('risk', 'stability_df', 'area', 'price_volatility_%'),
+    'Lagged Tourism Dependency': ('risk', 'dependency_df', 'area', 'tourism_dependency_lagged')
+}
+LOG_FEATURES = ['Avg Meter Price', 'Monthly Liquidity']
+# وزن كل خاصية في المسافة بعد توحيد مقياسها
+WEIGHTS = {name: 1.0 for name in FEATURES}
+
+STAGES = sorted({stage for stage, _, _, _ in FEATURES.values()})
+K = 5
+# أكبر عدد مناطق في ورقة الشجرة
+LEAF_SIZE = 128
+
+
+# جدول الخصائص الخام لكل منطقة من نتائج المراحل (NaN للخاصية التي لا تظهر المنطقة في جدولها)
+def feature_table(results):
+    columns = {}
+    for name, (stage, table, key, column) in FEATURES.items():
+        frame = results[stage][table]
+        columns[name] = pd.Series(frame[column].to_numpy(dtype=np.float64),
+                                  index=frame[key].astype(str).to_numpy())
+    table = pd.DataFrame(columns).sort_index()
+    table.index.name = 'Area'
+    return table
+
+
+# ---------- شجرة KD على مصفوفات: كل عقدة تقسم مناطقها عند وسيط البُعد الأكثر انتشاراً ----------
+
+def build_tree(points, leaf_size=LEAF_SIZE):
+    n = len(points)
+    order = np.arange(n)
+    nodes = {'start': [0], 'end': [n], 'dim': [-1], 'value': [0.0], 'left': [-1], 'right': [-1]}
+
+    def add(start, end):
+        for name, value in (('start', start), ('end', end), ('dim', -1), ('value', 0.0), ('left', -1), ('right', -1)):
+            nodes[name].append(value)
+        return len(nodes['start']) - 1
+
+    todo = [0]
+    while todo:
+        node = todo.pop()
+        start, end = nodes['start'][node], nodes['end'][node]
+        if end - start <= leaf_size:
+            continue
+        block = points[order[start:end]]
+        spread = block.max(axis=0) - block.min(axis=0)
+        dim = int(np.argmax(spread))
+        if spread[dim] == 0:
+            continue
+
+        # المناطق قبل mid قيمتها في البُعد dim لا تزيد عن قيمة التقسيم، وما بعدها لا يقل عنها
+        mid = (end - start) // 2
+        order[start:end] = order[start:end][np.argpartition(block[:, dim], mid)]
+        nodes['dim'][node] = dim
+        nodes['value'][node] = float(points[order[start + mid], dim])
+        nodes['left'][node] = add(start, start + mid)
+        nodes['right'][node] = add(start + mid, end)
+        todo.extend([nodes['left'][node], nodes['right'][node]])
+
+    tree = {name: np.asarray(values) for name, values in nodes.items()}
+    tree['order'] = order
+    return tree
+
+
+# أقرب k نقطة إلى point: أرقامها ومسافاتها مرتبة (التساوي بترتيب الأرقام)
+# الفرع البعيد يُزار فقط إذا كان مستوى التقسيم أقرب من أبعد نقطة مختارة حتى الآن
+def query_tree(tree, points, point, k):
+    best_rows = np.zeros(0, dtype=np.int64)
+    best_dist = np.zeros(0)
+    stack = [(0, 0.0)]
+    while stack:
+        node, bound = stack.pop()
+        if len(best_dist) == k and bound > best_dist[-1]:
+            continue
+
+        if tree['left'][node] < 0:
+            rows = tree['order'][tree['start'][node]:tree['end'][node]]
+            dist = ((points[rows] - point) ** 2).sum(axis=1)
+            best_rows = np.r_[best_rows, rows]
+            best_dist = np.r_[best_dist, dist]
+            keep = np.lexsort((best_rows, best_dist))[:k]
+            best_rows, best_dist = best_rows[keep], best_dist[keep]
+            continue
+
+        gap = point[tree['dim'][node]] - tree['value'][node]
+        near, far = (tree['left'][node], tree['right'][node]) if gap <= 0 else \
+            (tree['right'][node], tree['left'][node])
+        stack.append((far, max(bound, gap * gap)))
+        stack.append((near, bound))
+    return best_rows, np.sqrt(best_dist)
+
+
+# ---------- الفهرس: الخصائص بعد توحيد المقياس والشجرة عليها ----------
+
+# كل خاصية تُطرح منها القيمة الوسطى وتُقسم على انحرافها المعياري ثم تُضرب في وزنها
+# الخاصية الناقصة لمنطقة تأخذ القيمة الوسطى (صفر) فلا تقرّبها أو تبعدها عن غيرها
+def build_index(table, weights=WEIGHTS):
+    values = table.to_numpy(dtype=np.float64).copy()
+    for k, name in enumerate(table.columns):
+        if name in LOG_FEATURES:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values[:, k] = np.where(values[:, k] > 0, np.log(values[:, k]), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        center = np.nanmean(values, axis=0)
+        scale = np.nanstd(values, axis=0)
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+    center = np.where(np.isfinite(center), center, 0.0)
+    points = np.nan_to_num((values - center) / scale) * np.array([weights[name] for name in table.columns])
+
+    return {
+        'table': table,
+        'points': points,
+        'tree': build_tree(points)
+    }
+
+
+def area_position(index, area):
+    areas = index['table'].index
+    name = str(area).strip().lower()
+    if name not in areas:
+        close = difflib.get_close_matches(name, areas, n=3)
+        hint = f" (did you mean: {', '.join(close)}?)" if close else ""
+        raise KeyError(f"unknown area: {area}{hint}")
+    return areas.get_loc(name)
+
+
+# أقرب k منطقة شبيهة بـ area (بدونها) مع المسافة وخصائصها الخام
+def nearest(index, area, k=K):
+    position = area_position(index, area)
+    rows, dist = query_tree(index['tree'], index['points'], index['points'][position], k + 1)
+    keep = rows != position
+    rows, dist = rows[keep][:k], dist[keep][:k]
+
+    comparables = index['table'].iloc[rows].reset_index()
+    comparables.insert(1, 'Distance', np.round(dist, 4))
+    return comparables
+
+
+# الفهرس المحفوظ لنفس مفاتيح المراحل، أو بناؤه من جداولها
+# المفتاح يتبع مفاتيح مراحل run_all، فأي تغيير في البيانات أو معاملات المراحل أو كودها يعيد البناء،
+# والمراحل التي لم تتغير تُقرأ جداولها من الذاكرة المؤقتة بدل حسابها
+def load_index(data=None, rebuild=False):
+    options = {'data': data, 'cache': True, 'processes': 1}
+    key = results_cache.cache_key(
+        'similarity',
+        [run_all.stage_key(stage, options) for stage in STAGES],
+        {'features': FEATURES, 'log_features': LOG_FEATURES, 'weights': WEIGHTS, 'leaf_size': LEAF_SIZE},
+        results_cache.code_hash(feature_table, build_tree, build_index)
+    )
+    index = None if rebuild else results_cache.get(key)
+    if index is None:
+        results, _ = run_all.run_pipeline(run_all.resolve(STAGES), options)
+        index = build_index(feature_table(results))
+        results_cache.put(key, index)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the areas most similar to an area")
+    parser.add_argument("area", help="area name as in the data (case-insensitive)")
+    parser.add_argument("-k", type=int, default=K, help="number of comparable areas")
+    parser.add_argument("--data", help="path of the merged CSV (or .arrow)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index even if a saved one matches")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(args.data, args.rebuild)
+    loaded = time.perf_counter()
+    try:
+        comparables = nearest(index, args.area, args.k)
+    except KeyError as error:
+        parser.error(error.args[0])
+    done = time.perf_counter()
+
+    print(comparables.to_string(index=False))
+    print(f"Index of {len(index['table'])} areas ready in {(loaded - start) * 1000:.1f} ms, "
+          f"query {(done - loaded) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# أصغر قيمة مطلقة لها خانة خاصة في مخطط المئينات، وما دونها يُحسب صفراً
+MIN_MAGNITUDE = 1e-9
+# حدود دقة عدّاد القيم المختلفة: 2^4 إلى 2^16 خانة لكل مجموعة
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+# ---------- المئينات: خانات لوغاريتمية (مثل DDSketch) ----------
+# كل قيمة تدخل خانة عرضها نسبة ثابتة، فالقيمة المُعادة تبعد عن الحقيقية بنسبة error على الأكثر
+# الخانات أعداد صحيحة مطلقة، فمخططان بنفس error يُجمعان بجمع عدد القيم في كل خانة
+
+def bucket_gamma(error):
+    if not 0 < error < 1:
+        raise ValueError("error must be between 0 and 1")
+    return (1 + error) / (1 - error)
+
+
+# رقم الخانة لكل قيمة، مرتب مثل القيم: موجب للقيم الموجبة، صفر للقيم الصغيرة جداً، سالب للسالبة
+def bucket_codes(values, error):
+    log_gamma = math.log(bucket_gamma(error))
+    lowest = math.ceil(math.log(MIN_MAGNITUDE) / log_gamma)
+
+    magnitude = np.abs(values)
+    with np.errstate(divide='ignore'):
+        index = np.ceil(np.log(magnitude) / log_gamma)
+    codes = np.where(magnitude >= MIN_MAGNITUDE, index - lowest + 1, 0).astype(np.int64)
+    return np.where(values < 0, -codes, codes)
+
+
+# القيمة التي تمثل كل خانة: منتصفها النسبي
+def bucket_values(codes, error):
+    gamma = bucket_gamma(error)
+    lowest = math.ceil(math.log(MIN_MAGNITUDE) / math.log(gamma))
+    index = np.abs(codes) - 1 + lowest
+    values = 2 * np.power(gamma, index.astype(np.float64)) / (gamma + 1)
+    return np.where(codes == 0, 0.0, np.sign(codes) * values)
+
+
+# عدد القيم في كل (مجموعة، خانة)، مرتب بالمجموعة ثم الخانة
+# groups أرقام المجموعات (-1 لصف خارج كل المجموعات)، والقيم الفارغة تُستبعد
+def quantile_sketch(values, error, groups=None):
+    values = np.asarray(values, dtype=np.float64)
+    if groups is None:
+        groups = np.zeros(len(values), dtype=np.int64)
+    keep = (np.asarray(groups) >= 0) & ~np.isnan(values)
+    groups = np.asarray(groups, dtype=np.int64)[keep]
+    codes = bucket_codes(values[keep], error)
+
+    if len(codes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {'error': error, 'groups': empty, 'buckets': empty, 'counts': empty}
+
+    low, high = int(codes.min()), int(codes.max())
+    width = high - low + 1
+    keys = groups * width + (codes - low)
+    del codes
+    # جدول عدّ مباشر إذا كان صغيراً، وإلا ترتيب المفاتيح
+    size = (int(groups.max()) + 1) * width
+    if size <= max(len(keys), 1 << 22):
+        counts = np.bincount(keys, minlength=size)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+
+    return {'error': error, 'groups': keys // width, 'buckets': keys % width + low,
+            'counts': counts.astype(np.int64)}
+
+
+def merge_quantile_sketches(left, right):
+    if left['error'] != right['error']:
+        raise ValueError("only sketches with the same error can be merged")
+    merged = pd.DataFrame({
+        'groups': np.r_[left['groups'], right['groups']],
+        'buckets': np.r_[left['buckets'], right['buckets']],
+        'counts': np.r_[left['counts'], right['counts']]
+    }).groupby(['groups', 'buckets'], sort=True)['counts'].sum()
+    return {'error': left['error'],
+            'groups': merged.index.get_level_values('groups').to_numpy(),
+            'buckets': merged.index.get_level_values('buckets').to_numpy(),
+            'counts': merged.to_numpy()}
+
+
+# المئينات qs (بين 0 و1) لكل مجموعة من المخطط: مصفوفة (مجموعة × مئين)، NaN للمجموعة الفارغة
+# نفس استيفاء pandas الخطي بين القيمتين المحيطتين بالرتبة q * (n - 1)
+def sketch_quantiles(sketch, qs, n_groups):
+    qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+    out = np.full((n_groups, len(qs)), np.nan)
+    if len(sketch['counts']) == 0:
+        return out
+
+    sizes = np.bincount(sketch['groups'], weights=sketch['counts'], minlength=n_groups).astype(np.int64)
+    before = np.r_[0, np.cumsum(sizes)[:-1]]
+    cumulative = np.cumsum(sketch['counts'])
+    values = bucket_values(sketch['buckets'], sketch['error'])
+
+    present = np.flatnonzero(sizes > 0)
+    for j, q in enumerate(qs):
+        rank = q * (sizes[present] - 1)
+        low = np.floor(rank)
+        below = values[np.searchsorted(cumulative, before[present] + low.astype(np.int64), side='right')]
+        above = values[np.searchsorted(cumulative, before[present] + np.ceil(rank).astype(np.int64), side='right')]
+        out[present, j] = below + (rank - low) * (above - below)
+    return out
+
+
+# المئينات بالضبط عبر pandas (المرجع الذي يقارن به المخطط)
+def exact_quantiles(values, qs, groups, n_groups):
+    qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+    groups = np.asarray(groups, dtype=np.int64)
+    keep = groups >= 0
+    table = pd.Series(np.asarray(values, dtype=np.float64)[keep]).groupby(groups[keep]).quantile(qs).unstack()
+    return table.reindex(index=range(n_groups), columns=qs).to_numpy()
+
+
+# المئينات لكل مجموعة: بالضبط إذا كان error فارغاً، وإلا من المخطط بخطأ نسبي لا يتجاوز error
+def group_quantiles(values, qs, groups, n_groups, error=None):
+    if error is None:
+        return exact_quantiles(values, qs, groups, n_groups)
+    return sketch_quantiles(quantile_sketch(values, error, groups), qs, n_groups)
+
+
+# مئينات عمود كامل (مجموعة واحدة)
+def quantiles(values, qs, error=None):
+    groups = np.zeros(len(values), dtype=np.int64)
+    return group_quantiles(values, qs, groups, 1, error)[0]
+
+
+# ---------- عدد القيم المختلفة: HyperLogLog ----------
+# كل مجموعة لها 2^p خانة، وكل خانة تحفظ أطول سلسلة أصفار في بداية بصمات القيم التي وقعت فيها
+# الخطأ المعياري النسبي 1.04 / sqrt(2^p)، والعدّادات تُجمع بأخذ الأكبر في كل خانة
+
+def hll_precision(error):
+    if not 0 < error < 1:
+        raise ValueError("error must be between 0 and 1")
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(p, MIN_PRECISION), MAX_PRECISION)
+
+
+# بصمة 64 بت لكل قيمة (الفئات تُحسب بصمات أسمائها مرة واحدة)، وقناع القيم غير الفارغة
+def value_hashes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        labels = pd.util.hash_array(np.asarray(values.cat.categories), categorize=False)
+        return labels[np.maximum(codes, 0)], codes >= 0
+    present = values.notna().to_numpy()
+    return pd.util.hash_array(values.to_numpy(), categorize=True), present
+
+
+# عدد البتات اللازمة لكتابة كل رقم (بدون تحويل إلى float الذي يفقد البتات الأخيرة)
+def bit_length(x):
+    x = x.copy()
+    length = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        x[big] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+# خانات العدّاد لكل مجموعة: مصفوفة (مجموعة × 2^p)
+def hll_registers(values, error, groups, n_groups):
+    p = hll_precision(error)
+    hashes, keep = value_hashes(values)
+    keep = keep & (np.asarray(groups) >= 0)
+    hashes = hashes[keep]
+    groups = np.asarray(groups, dtype=np.int64)[keep]
+
+    slot = (hashes >> np.uint64(64 - p)).astype(np.int64)
+    rest = hashes << np.uint64(p)
+    # رتبة أول بت 1 في باقي البصمة (64 - p + 1 إذا كان الباقي أصفاراً)
+    rank = np.where(rest == 0, 64 - p + 1, 64 - bit_length(rest).astype(np.int64) + 1).astype(np.uint8)
+
+    registers = np.zeros(n_groups << p, dtype=np.uint8)
+    np.maximum.at(registers, (groups << p) + slot, rank)
+    return registers.reshape(n_groups, 1 << p)
+
+
+def merge_registers(left, right):
+    return np.maximum(left, right)
+
+
+# دالتا التصحيح في مقدّر Ertl المحسّن (تعملان على مصفوفات)
+def hll_sigma(x):
+    empty = np.asarray(x) == 1
+    x = np.where(empty, 0.0, x)
+    y = np.ones_like(x)
+    z = x.copy()
+    while True:
+        x = x * x
+        previous = z
+        z = z + x * y
+        y = y + y
+        if np.array_equal(z, previous):
+            return np.where(empty, np.inf, z)
+
+
+def hll_tau(x):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.ones_like(x)
+    z = 1 - x
+    while True:
+        x = np.sqrt(x)
+        previous = z
+        y = y * 0.5
+        z = z - (1 - x) ** 2 * y
+        if np.array_equal(z, previous):
+            return np.where((x == 0) | (x == 1), 0.0, z / 3)
+
+
+# التقدير من الخانات بمقدّر Ertl المحسّن: دقيق للأعداد الصغيرة والكبيرة بدون جداول تصحيح
+def hll_estimate(registers):
+    n_groups, m = registers.shape
+    q = 64 - int(math.log2(m))
+    offsets = np.arange(n_groups)[:, None] * (q + 2)
+    histogram = np.bincount((offsets + registers).ravel(), minlength=n_groups * (q + 2)).reshape(n_groups, q + 2)
+
+    z = m * hll_tau(1 - histogram[:, q + 1] / m)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + histogram[:, k])
+    z = z + m * hll_sigma(histogram[:, 0] / m)
+    with np.errstate(divide='ignore'):
+        return m * m / (2 * math.log(2)) / z
+
+
+# عدد القيم المختلفة في كل مجموعة: بالضبط إذا كان error فارغاً، وإلا تقدير بخطأ معياري نسبي error
+def group_nunique(values, groups, n_groups, error=None):
+    groups = np.asarray(groups, dtype=np.int64)
+    if error is not None:
+        return np.round(hll_estimate(hll_registers(values, error, groups, n_groups))).astype(np.int64)
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, size = values.cat.codes.to_numpy().astype(np.int64), len(values.cat.categories)
+    else:
+        codes, uniques = pd.factorize(values)
+        size = len(uniques)
+    keep = (groups >= 0) & (codes >= 0)
+    pairs = np.unique(groups[keep] * size + codes[keep])
+    return np.bincount(pairs // max(size, 1), minlength=n_groups).astype(np.int64)
@@ -0,0 +1,52 @@
+import argparse
+import os
+
+import pandas as pd
+
+import incremental
+from data_loader import DATA_PATH, optimize_types
+
+# عدد الصفوف في كل دفعة: الذاكرة المستخدمة تتبع حجم الدفعة وعدد المجموعات لا حجم الملف
+CHUNK_ROWS = 200_000
+
+
+def read_batches(path=None, chunk_rows=CHUNK_ROWS):
+    with pd.read_csv(path or DATA_PATH, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+# دمج الدفعات واحدة تلو الأخرى في مجاميع قابلة للجمع ثم بناء الجداول منها
+# الدفعات يجب أن تأتي بترتيب الأشهر لكل منطقة (مثل الملف المدمج) لحساب التنعيم
+def stream(batches):
+    state = incremental.empty_state()
+    for batch in batches:
+        if len(batch):
+            incremental.fold(state, optimize_types(batch))
+
+    if state['rows'] == 0:
+        raise ValueError("no rows to analyze")
+    print(f"Streamed {state['rows']} rows")
+    return incremental.build_tables(state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the result tables from the CSV in fixed-size chunks")
+    parser.add_argument("--data", help="path of the merged CSV")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="directory to write the result tables as CSV")
+    args = parser.parse_args()
+
+    tables = stream(read_batches(args.data, args.chunk_rows))
+    print(f"Overall correlation: {tables['correlation']:.4f}")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        for name in incremental.TABLES:
+            if tables[name] is not None:
+                tables[name].to_csv(os.path.join(args.out, name + ".csv"), index=False)
+        print(f"Tables written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingest import COLUMNS, tourism_scores
+
+# أنواع العقارات: معامل سعر المتر ومتوسط المساحة لكل نوع
+PROPERTY_TYPES = {
+    'Land': (0.7, 1500),
+    'Villa': (1.1, 400),
+    'Unit': (1.4, 100),
+    'Building': (1.0, 800)
+}
+
+START_MONTH = '2015-01'
+MONTHS = 99
+# نسبة خلايا (منطقة × شهر × نوع) الموجودة فعلاً، قريبة من البيانات الحقيقية
+FILL_RATE = 0.6
+# عدد المناطق التي تُولد صفوفها معاً (يحدد استهلاك الذاكرة)
+CHUNK_AREAS = 2000
+
+
+def property_types(count):
+    names = list(PROPERTY_TYPES)[:count]
+    names += [f"Type {k}" for k in range(len(names) + 1, count + 1)]
+    return names
+
+
+# عدد المناطق المناسب لعدد الصفوف المطلوب
+def default_areas(rows, n_types, months):
+    return max(20, math.ceil(rows / (months * n_types * FILL_RATE)))
+
+
+# أعمدة السياحة لكل (منطقة، شهر): فنادق وغرف ومعالم تنمو، إشغال موسمي، ونشاط سياحي 0-100
+def tourism_table(n_areas, months, start=START_MONTH, seed=0):
+    rng = np.random.default_rng(seed)
+    periods = pd.period_range(start, periods=months, freq='M')
+    t = np.arange(months)[None, :]
+
+    hotels0 = rng.uniform(40, 140, (n_areas, 1))
+    hotels = np.round(hotels0 * (1 + rng.uniform(0.002, 0.008, (n_areas, 1))) ** t)
+    rooms = np.round(hotels * rng.uniform(45, 95, (n_areas, 1)) * rng.normal(1, 0.01, (n_areas, months)))
+    pois = np.round(rng.uniform(60, 180, (n_areas, 1)) * (1 + 0.002 * t))
+
+    # موسم الذروة في الشتاء وانخفاض 2020
+    season = 0.12 * np.cos(2 * np.pi * (periods.month.to_numpy() - 1) / 12)
+    covid = np.where((periods.year == 2020) & (periods.month >= 4) & (periods.month <= 9), -0.25, 0)
+    occupancy = rng.uniform(0.45, 0.7, (n_areas, 1)) + season + covid + rng.normal(0, 0.03, (n_areas, months))
+    occupancy = np.round(np.clip(occupancy, 0.3, 0.85), 3)
+
+    # المؤشرات المشتقة بنفس حساب ingest.py (الغرف نسبة إلى وسيط أول شهر)
+    scores = tourism_scores({'hotels': hotels, 'rooms': rooms, 'POIs': pois, 'occupancy_rate': occupancy},
+                            np.median(rooms[:, 0]))
+
+    return {
+        'year_month': periods.strftime('%Y-%m').to_numpy(),
+        'hotels': hotels.astype(np.int64),
+        'rooms': rooms.astype(np.int64),
+        'POIs': pois.astype(np.int64),
+        'occupancy_rate': occupancy,
+        **scores
+    }
+
+
+# صفوف العقارات لمجموعة مناطق: كل خلية موجودة باحتمال fill
+def area_rows(tourism, first_area, n_areas, types, fill, rng):
+    months = tourism['hotels'].shape[1]
+    n_types = len(types)
+    cells = np.flatnonzero(rng.random(n_areas * months * n_types) < fill)
+
+    area = first_area + cells // (months * n_types)
+    month = cells // n_types % months
+    kind = cells % n_types
+    n = len(cells)
+
+    price_factor = np.array([PROPERTY_TYPES.get(name, (1.0, 500))[0] for name in types])
+    size_factor = np.array([PROPERTY_TYPES.get(name, (1.0, 500))[1] for name in types])
+
+    # مستوى سعر لكل منطقة، وحساسية مختلفة للسياحة
+    base = np.exp(rng.normal(np.log(7000), 0.7, n_areas))
+    beta = rng.normal(0.3, 0.4, n_areas)
+    activity = tourism['tourism_activity'][area, month]
+
+    local = area - first_area
+    price = (base[local] * price_factor[kind] * (1 + 0.004 * month)
+             * np.maximum(1 + beta[local] * (activity - 50) / 100, 0.2)
+             * rng.lognormal(0, 0.25, n))
+    size = size_factor[kind] * rng.lognormal(0, 0.8, n)
+    transactions = 1 + rng.negative_binomial(0.4, 0.4 / 24.4, n)
+
+    frame = pd.DataFrame({
+        'year_month': tourism['year_month'][month],
+        'area_name_en': pd.Categorical.from_codes(area, tourism['areas']),
+        'property_type_en': pd.Categorical.from_codes(kind, types),
+        'avg_meter_price': np.round(price, 2),
+        'avg_actual_worth': np.round(price * size * rng.lognormal(0, 0.1, n), 1),
+        'avg_area': np.round(size, 2),
+        'transactions_count': transactions
+    })
+    for col in COLUMNS[7:]:
+        frame[col] = tourism[col][area, month]
+    return frame
+
+
+# توليد بيانات بنفس شكل الملف المدمج، تُكتب على دفعات حتى لا تمتلئ الذاكرة
+def generate(path, rows, areas=None, n_types=4, months=MONTHS, start=START_MONTH, seed=0):
+    types = property_types(n_types)
+    areas = areas or default_areas(rows, n_types, months)
+    if rows > areas * months * n_types:
+        raise ValueError(f"{rows} rows do not fit in {areas} areas x {months} months x {n_types} types")
+    fill = rows / (areas * months * n_types)
+
+    tourism = tourism_table(areas, months, start, seed)
+    tourism['areas'] = [f"area {k:0{len(str(areas))}d}" for k in range(areas)]
+    rng = np.random.default_rng(seed + 1)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    written = 0
+    for first in range(0, areas, CHUNK_AREAS):
+        chunk = area_rows(tourism, first, min(CHUNK_AREAS, areas - first), types, fill, rng)
+        chunk = chunk.sort_values(['year_month', 'area_name_en'], kind='stable')
+        chunk.to_csv(tmp, mode='w' if first == 0 else 'a', header=first == 0, index=False)
+        written += len(chunk)
+    os.replace(tmp, path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset with the merged CSV schema")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--areas", type=int, help="number of areas (default: enough for the requested rows)")
+    parser.add_argument("--property-types", type=int, default=4)
+    parser.add_argument("--months", type=int, default=MONTHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    written = generate(args.out, args.rows, args.areas, args.property_types, args.months, seed=args.seed)
+    print(f"{written} rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+import analysis1
+
+
+# منطقة بارتباط 0.2 على 2000 صف (دال) ومنطقة بدون علاقة على 40 صفاً (غير دالة)
+def frame(seed=0):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for area, n, slope in (('significant', 2000, 20), ('noisy', 40, 0)):
+        tourism = rng.normal(50, 10, n)
+        price = 1000 + slope * (tourism - 50) / 10 + rng.normal(0, 98, n)
+        parts.append(pd.DataFrame({'area_name_en': area, 'property_type_en': 'Unit',
+                                   'tourism_activity': tourism, 'avg_meter_price': price}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def test_impact_class_keeps_correlation_class_when_significant():
+    with contextlib.redirect_stdout(io.StringIO()):
+        area_df = analysis1.analyze(frame())['area_df'].set_index('Area')
+
+    assert area_df.loc['significant', 'P-Value'] < analysis1.ALPHA
+    assert area_df.loc['significant', 'Impact Class'] == analysis1.classify(area_df.loc['significant', 'Correlation'])
+    assert area_df.loc['significant', 'Impact Class'] == "Weak"
+
+    assert area_df.loc['noisy', 'P-Value'] >= analysis1.ALPHA
+    assert area_df.loc['noisy', 'Impact Class'] == "No Clear Impact"
+
+
+def test_impact_class_from_intervals():
+    area_stats = pd.DataFrame({
+        'count': [100, 100, 100, 100],
+        'corr_tourism_activity_avg_meter_price': [0.6, 0.6, -0.4, np.nan],
+        'tourism_activity_mean': 1.0,
+        'avg_meter_price_mean': 1.0
+    }, index=pd.Index(['strong', 'wide', 'negative', 'empty'], name='area_name_en'))
+    intervals = pd.DataFrame({
+        'ci_low': [0.4, -0.05, -0.6, np.nan],
+        'ci_high': [0.8, 0.9, -0.2, np.nan],
+        'p_value': [0.001, 0.2, 0.01, np.nan]
+    }, index=area_stats.index)
+
+    classes = analysis1.area_table(area_stats, intervals).set_index('Area')['Impact Class']
+    # الارتباط الفارغ يبقى "Negative" كما في التصنيف بدون فترات الثقة
+    assert classes.to_dict() == {'strong': "Very Strong", 'wide': "No Clear Impact",
+                                 'negative': "Negative", 'empty': "Negative"}
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+import anomalies
+
+
+# سلسلة واحدة بسعر ثابت تقريباً وشهر شاذ في وسطها
+def series(prices, area='a', kind='Villa'):
+    return pd.DataFrame({
+        'area_name_en': area,
+        'property_type_en': kind,
+        'year_month': pd.date_range('2020-01-01', periods=len(prices), freq='MS'),
+        'avg_meter_price': np.asarray(prices, dtype=np.float64),
+        'transactions_count': 1
+    })
+
+
+def window_bound(df, row, sign):
+    log_price = np.log(df['avg_meter_price'].to_numpy())
+    lo, hi = max(row - anomalies.HALF_WINDOW, 0), row + anomalies.HALF_WINDOW + 1
+    neighbors = np.delete(log_price[lo:hi], row - lo)
+    median = np.median(neighbors)
+    scale = max(anomalies.MAD_SCALE * np.median(np.abs(neighbors - median)), anomalies.MIN_SCALE)
+    return np.exp(median), np.exp(median + sign * anomalies.THRESHOLD * scale)
+
+
+def test_winsorized_price_is_the_window_bound():
+    rng = np.random.default_rng(0)
+    prices = 1000 * np.exp(rng.normal(0, 0.05, 25))
+    prices[12] = 9000
+    prices[20] = 100
+    df = series(prices)
+
+    report = anomalies.detect(df)['report_df'].set_index('row')
+    assert sorted(report.index) == [12, 20]
+
+    for row, sign in ((12, 1), (20, -1)):
+        median, bound = window_bound(df, row, sign)
+        assert np.isclose(report.loc[row, 'expected_price'], median, atol=0.01)
+        assert np.isclose(report.loc[row, 'winsorized_price'], bound, atol=0.01)
+        # القص يقرّب السعر من الوسيط دون أن يتجاوزه
+        low, high = sorted([median, prices[row]])
+        assert low < report.loc[row, 'winsorized_price'] < high
+
+
+def test_window_stays_inside_the_series():
+    # نفس الأسعار في سلسلتين: السعر المرتفع في بداية الثانية لا يُقارن بنهاية الأولى
+    df = pd.concat([series([1000] * 10, area='a'), series([5000] * 10, area='b')], ignore_index=True)
+    assert anomalies.detect(df)['report_df'].empty
+
+
+def test_apply_modes():
+    df = series([1000, 1010, 990, 1005, 9000, 995, 1000, 1002, 998])
+    report = anomalies.detect(df)['report_df']
+    mask = np.ones(len(df), dtype=bool)
+
+    facts, kept = anomalies.apply(df, mask, report, 'off')
+    assert facts is df and kept.all()
+
+    facts, kept = anomalies.apply(df, mask, report, 'flag')
+    assert list(np.flatnonzero(~kept)) == [4] and mask.all()
+
+    facts, kept = anomalies.apply(df, mask, report, 'winsorize')
+    assert kept.all() and facts['avg_meter_price'].iloc[4] == report['winsorized_price'].iloc[0]
+    assert df['avg_meter_price'].iloc[4] == 9000
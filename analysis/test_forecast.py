@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import forecast
+
+MONTHS = 48
+HORIZON = 6
+
+
+# سلسلتان موسميتان تماماً (كل شهر يساوي نفس الشهر قبل سنة) فيطابق النموذج التاريخ بلا خطأ
+def series():
+    m = np.arange(MONTHS)
+    tourism = 50 + 10 * np.sin(2 * np.pi * m / 12) + 5 * np.cos(4 * np.pi * m / 12)
+    price = 1000 + np.array([[200], [50]]) * np.cos(2 * np.pi * m / 12)
+    return price, np.vstack([tourism, tourism])
+
+
+def test_backtest_fits_before_the_holdout():
+    price, tourism = series()
+    out = forecast.backtest(price, tourism, HORIZON)
+    assert forecast.fit_models(price[:, :-HORIZON], tourism[:, :-HORIZON])['price']['fitted'].all()
+
+    # التقدير على أول 42 شهراً، والسنة الأولى منها بلا سعر قبل سنة
+    assert out['fit_months'].tolist() == [MONTHS - HORIZON - forecast.SEASON] * 2
+    assert out['price_mape'] == pytest.approx([0, 0], abs=1e-6)
+    assert out['naive_price_mape'] == pytest.approx([0, 0], abs=1e-6)
+
+
+def test_backtest_holdout_is_only_compared():
+    price, tourism = series()
+    changed = price.copy()
+    changed[:, -HORIZON:] *= 2
+    out = forecast.backtest(changed, tourism, HORIZON)
+
+    # الأشهر المحجوزة لا تدخل التقدير: التوقع يبقى السعر الأصلي فيكون الخطأ النسبي 50%
+    assert out['fit_months'].tolist() == [MONTHS - HORIZON - forecast.SEASON] * 2
+    assert out['price_mape'] == pytest.approx([50, 50], abs=1e-6)
+    assert out['tourism_mape'] == pytest.approx([0, 0], abs=1e-6)
+
+
+def test_horizon_is_limited_to_one_season():
+    with pytest.raises(ValueError):
+        forecast.analyze_forecast(None, horizon=forecast.SEASON + 1)
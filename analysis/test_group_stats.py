@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from group_stats import group_stats, sort_groups
+
+
+def frame():
+    return pd.DataFrame({'g': ['a', 'b', 'a', 'c'], 'x': [1.0, 2.0, 3.0, 4.0], 'y': [2.0, 1.0, 5.0, 3.0]})
+
+
+# بدون أي صف مختار تكون النتيجة جدولاً فارغاً بنفس الأعمدة
+def test_empty_selection():
+    df = frame()
+    mask = np.zeros(len(df), dtype=bool)
+
+    order, starts, index = sort_groups(df, 'g', mask=mask)
+    assert len(order) == 0 and len(starts) == 0 and len(index) == 0
+
+    stats = group_stats(df, 'g', ['x'], pairs=[('x', 'y')], mask=mask)
+    assert stats.empty
+    assert list(stats.columns) == ['count', 'x_sum', 'x_mean', 'x_std', 'y_sum', 'y_mean', 'y_std', 'corr_x_y']
+
+
+def test_matches_groupby():
+    df = frame()
+    mask = np.array([True, True, True, False])
+    stats = group_stats(df, 'g', ['x'], mask=mask, sort=True)
+    expected = df[mask].groupby('g')['x'].agg(['count', 'sum', 'mean', 'std'])
+
+    assert list(stats.index) == ['a', 'b']
+    np.testing.assert_array_equal(stats['count'], expected['count'])
+    np.testing.assert_allclose(stats[['x_sum', 'x_mean', 'x_std']], expected[['sum', 'mean', 'std']])
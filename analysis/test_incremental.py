@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis1
+import data_loader
+import incremental
+import streaming
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(incremental, 'CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def same_tables(left, right):
+    assert left['correlation'] == pytest.approx(right['correlation'], rel=1e-9)
+    for name in incremental.TABLES:
+        a = left[name].sort_values(list(left[name].columns[:2])).reset_index(drop=True)
+        b = right[name].sort_values(list(right[name].columns[:2])).reset_index(drop=True)
+        pd.testing.assert_frame_equal(a, b, check_dtype=False, rtol=1e-9)
+
+
+# الملف المدمج حتى نهاية 2022، ثم إضافة أشهر 2023 على دفعتين
+def test_appended_months_match_full_rebuild(cache):
+    with open(data_loader.DATA_PATH) as f:
+        header, *body = f.readlines()
+    cut = next(i for i, line in enumerate(body) if line.startswith('2023-'))
+    path = cache / "merged.csv"
+    path.write_text(header + ''.join(body[:cut]))
+    incremental.update(str(path), full=True)
+
+    half = (cut + len(body)) // 2
+    for part in (body[cut:half], body[half:]):
+        with open(path, 'a') as f:
+            f.write(''.join(part))
+        state = incremental.update(str(path))
+
+    assert state['rows'] == len(body)
+    same_tables(incremental.build_tables(state),
+                incremental.build_tables(incremental.update(str(path), full=True)))
+
+
+def test_streamed_chunks_match_full_data(cache):
+    tables = streaming.stream(streaming.read_batches(data_loader.DATA_PATH, chunk_rows=5000))
+    same_tables(tables, incremental.build_tables(incremental.rebuild(data_loader.DATA_PATH)))
+
+    df = data_loader.load_data()
+    results = analysis1.analyze(df.dropna(subset=analysis1.CLEAN_SUBSET), intervals=False, verbose=False)
+    assert tables['correlation'] == pytest.approx(results['correlation'], rel=1e-9)
+    np.testing.assert_allclose(tables['area_df'].set_index('Area')['Correlation'].sort_index(),
+                               results['area_df'].set_index('Area')['Correlation'].sort_index(), rtol=1e-9)
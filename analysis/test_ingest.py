@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import data_loader
+import ingest
+
+
+# الملف المدمج المرفق مفكوكاً إلى صفقات خام (كل خلية تتكرر بعدد صفقاتها) وجدول سياحة لكل (شهر، منطقة)
+def raw_files(tmp_path, merged):
+    cells = merged.loc[merged.index.repeat(merged['transactions_count'])]
+    transactions = pd.DataFrame({
+        'instance_date': pd.to_datetime(cells['year_month']).dt.strftime(ingest.DATE_FORMAT),
+        'area_name_en': cells['area_name_en'].str.upper(),
+        'property_type_en': cells['property_type_en'],
+        'trans_group_en': 'Sales',
+        **{raw: cells[name] for raw, name in ingest.RAW_MEASURES.items()}
+    })
+    # صف مرفوض لكل سبب
+    good = transactions.iloc[0]
+    rejected = pd.DataFrame([good.copy() for _ in range(5)])
+    rejected['trans_group_en'] = ['Mortgages', 'Sales', 'Sales', 'Sales', 'Sales']
+    rejected['instance_date'] = [good['instance_date'], 'not a date', good['instance_date'],
+                                 good['instance_date'], good['instance_date']]
+    rejected['area_name_en'] = [good['area_name_en'], good['area_name_en'], ' ', good['area_name_en'],
+                                good['area_name_en']]
+    rejected['meter_sale_price'] = [1.0, 1.0, 1.0, 0.0, np.nan]
+    pd.concat([transactions, rejected]).to_csv(tmp_path / "transactions.csv", index=False)
+
+    tourism = merged.drop_duplicates(['year_month', 'area_name_en'])
+    tourism[['year_month', 'area_name_en', *ingest.TOURISM_RANGES]].to_csv(tmp_path / "tourism.csv", index=False)
+    return str(tmp_path / "transactions.csv"), str(tmp_path / "tourism.csv"), len(transactions)
+
+
+def test_round_trip_of_shipped_csv(tmp_path):
+    merged = pd.read_csv(data_loader.DATA_PATH)
+    transactions_path, tourism_path, rows = raw_files(tmp_path, merged)
+
+    transactions, report = ingest.aggregate_transactions([transactions_path])
+    assert report == {'rows': rows + 5, 'other_group': 1, 'bad_date': 1, 'missing_key': 1,
+                      'out_of_range': 2, 'kept': rows}
+
+    rebuilt = ingest.merge(transactions, ingest.build_tourism([tourism_path]))
+    ingest.write_output(rebuilt, str(tmp_path / "merged.csv"))
+    rebuilt = pd.read_csv(tmp_path / "merged.csv")
+
+    # المتوسطات تُقرب بمنازل DECIMALS، والملف المرفق فيه متوسطات غير مقربة
+    for name, decimals in ingest.DECIMALS.items():
+        np.testing.assert_allclose(rebuilt.pop(name), merged.pop(name), rtol=0, atol=0.5 * 10 ** -decimals + 1e-9)
+    pd.testing.assert_frame_equal(rebuilt, merged, rtol=1e-12)
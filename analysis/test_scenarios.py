@@ -0,0 +1,39 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis2
+import data_loader
+import scenarios
+
+
+@pytest.fixture
+def df_clean(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', str(tmp_path))
+    return data_loader.load_data()[analysis2.COLUMNS].dropna(subset=analysis2.CLEAN_SUBSET).reset_index(drop=True)
+
+
+# السيناريو الافتراضي يعطي نفس المناطق وترتيب النقاط والتصنيف في analysis2
+def test_default_scenario_matches_analysis2(df_clean):
+    with contextlib.redirect_stdout(io.StringIO()):
+        scores_df = analysis2.analyze(df_clean.copy())['scores_df'].set_index('Area')
+    area_df = scenarios.run_scenarios(df_clean.copy(), pd.DataFrame([scenarios.DEFAULTS]))['area_df']
+    area_df = area_df.dropna(subset=['Base Rank']).set_index('Area')
+
+    assert sorted(area_df.index) == sorted(scores_df.index)
+    merged = scores_df.join(area_df).sort_values('Base Rank')
+    # الترتيب يتفق حتى التساوي في النقاط (ترتيب المتساويين غير محدد في sort_values)
+    np.testing.assert_array_equal(merged['Base Rank'], np.arange(1, len(merged) + 1))
+    np.testing.assert_array_equal(merged['Investment Score'],
+                                  scores_df['Investment Score'].sort_values(ascending=False))
+    assert (merged['Base Rating'] == merged['Rating']).all()
+
+
+def test_cutoffs_must_decrease(tmp_path):
+    path = tmp_path / "scenarios.csv"
+    path.write_text("scenario,cutoff_excellent,cutoff_good\nok,75,45\nswapped,55,65\n")
+    with pytest.raises(ValueError, match="swapped"):
+        scenarios.load_scenarios(str(path))
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+import analysis1
+import analysis2
+import analysis3
+import server
+
+FILTERS = [{}, {'start_year': ['2022']}, {'property_type': ['Villa,Unit']},
+           {'area': ['al barsha south fourth'], 'end_year': ['2021']}]
+
+
+@pytest.fixture(scope='module')
+def views():
+    return server.load_views()
+
+
+def same_records(cells, rows):
+    pd.testing.assert_frame_equal(pd.DataFrame(cells), pd.DataFrame(rows), check_dtype=False, rtol=1e-9)
+
+
+# إجابات مجاميع الخلايا تطابق تشغيل التحليل على الصفوف المفلترة
+@pytest.mark.parametrize('params', FILTERS)
+def test_cells_match_rows(views, params):
+    frame = server.select(views['correlation'], params)
+    rows = analysis1.analyze(frame, intervals=False, verbose=False)
+    cells = server.compute(views, '/api/correlation', params)
+    assert cells['rows'] == len(frame)
+    assert cells['correlation'] == pytest.approx(rows['correlation'], rel=1e-9)
+    assert cells['p_value'] == pytest.approx(rows['p_value'], rel=1e-6, abs=1e-12)
+    same_records(cells['property_types'], server.records(rows['property_df']))
+    same_records(cells['top_areas'], server.records(rows['top_10']))
+
+    frame = server.select(views['investment'], params)
+    rows = analysis2.analyze(frame, verbose=False)
+    cells = server.compute(views, '/api/investment', params)
+    same_records(cells['areas'], server.records(rows['scores_df'].head(10)))
+    assert cells['emerging'] == rows['emerging_areas']['Area'].tolist()
+
+    frame = server.select(views['seasonality'], params)
+    rows = analysis3.analyze_seasons(frame, verbose=False)
+    cells = server.compute(views, '/api/months', params)
+    same_records(cells['months'],
+                 server.records(rows['monthly_patterns'].sort_values('buy_score', ascending=False)))
+    assert cells['winter_price'] == pytest.approx(rows['winter_price'], rel=1e-9)
+    assert cells['property_timing'].keys() == rows['property_timing'].keys()
+    for prop, timing in rows['property_timing'].items():
+        assert cells['property_timing'][prop] == pytest.approx(timing, rel=1e-9)
+
+
+def test_too_few_rows(views):
+    with pytest.raises(server.QueryError) as e:
+        server.compute(views, '/api/correlation', {'area': ['no such area']})
+    assert e.value.status == 404
+
+    with pytest.raises(server.QueryError) as e:
+        server.compute(views, '/api/risk', {'area': ['abu hail'], 'start_year': ['2016'], 'end_year': ['2016']})
+    assert e.value.status == 422
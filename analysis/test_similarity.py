@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import similarity
+
+
+def brute_force(points, point, k):
+    dist = ((points - point) ** 2).sum(axis=1)
+    rows = np.lexsort((np.arange(len(points)), dist))[:k]
+    return rows, np.sqrt(dist[rows])
+
+
+# نقاط عشوائية، ونقاط على شبكة صحيحة فيها مسافات متساوية كثيرة (التساوي بترتيب الأرقام)
+@pytest.mark.parametrize('grid', [False, True])
+def test_tree_matches_brute_force(grid):
+    rng = np.random.default_rng(0)
+    points = rng.integers(0, 4, (1500, 3)).astype(np.float64) if grid else rng.normal(size=(1500, 5))
+    tree = similarity.build_tree(points, leaf_size=8)
+    queries = np.r_[points[:20], rng.normal(size=(20, points.shape[1]))]
+
+    for point in queries:
+        for k in (1, 7, 60):
+            rows, dist = similarity.query_tree(tree, points, point, k)
+            expected_rows, expected_dist = brute_force(points, point, k)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_array_equal(dist, expected_dist)
+
+
+def test_nearest_skips_the_area_itself():
+    rng = np.random.default_rng(1)
+    table = pd.DataFrame(rng.normal(size=(300, 2)), columns=['Tourism Growth %', 'Price Stability %'],
+                         index=pd.Index([f"area {i}" for i in range(300)], name='Area'))
+    index = similarity.build_index(table, weights={name: 1.0 for name in table.columns})
+    comparables = similarity.nearest(index, 'Area 3', k=4)
+
+    rows, _ = brute_force(index['points'], index['points'][3], 5)
+    assert list(comparables['Area']) == [f"area {i}" for i in rows if i != 3][:4]
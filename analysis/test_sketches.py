@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sketches
+
+
+def sample(seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(10, 1.5, 50_000)
+    groups = rng.integers(0, 5, len(values))
+    return values, groups
+
+
+# كل مئين من المخطط يبعد عن المئين الحقيقي بنسبة error على الأكثر
+@pytest.mark.parametrize('error', [0.01, 0.001])
+def test_quantiles_within_relative_error(error):
+    values, groups = sample()
+    qs = [0, 0.01, 0.25, 0.5, 0.75, 0.99, 1]
+    exact = sketches.group_quantiles(values, qs, groups, 6)
+    approx = sketches.group_quantiles(values, qs, groups, 6, error=error)
+
+    assert np.isnan(approx[5]).all()
+    assert np.all(np.abs(approx[:5] - exact[:5]) <= error * exact[:5] * (1 + 1e-12))
+
+
+def test_quantile_sketches_merge():
+    values, groups = sample()
+    left = sketches.quantile_sketch(values[:20_000], 0.01, groups[:20_000])
+    right = sketches.quantile_sketch(values[20_000:], 0.01, groups[20_000:])
+    merged = sketches.merge_quantile_sketches(left, right)
+    whole = sketches.quantile_sketch(values, 0.01, groups)
+    for key in ('groups', 'buckets', 'counts'):
+        np.testing.assert_array_equal(merged[key], whole[key])
+
+
+# التقدير يبقى ضمن 4 أضعاف الخطأ المعياري، والأعداد الصغيرة تُعدّ بالضبط تقريباً
+@pytest.mark.parametrize('error', [0.05, 0.02])
+def test_nunique_within_standard_error(error):
+    sizes = [10, 1_000, 30_000, 200_000]
+    values = pd.Series(np.concatenate([np.arange(n) * 7 + i for i, n in enumerate(sizes)]))
+    groups = np.repeat(np.arange(len(sizes)), sizes)
+    estimate = sketches.group_nunique(pd.concat([values, values]), np.r_[groups, groups], len(sizes), error=error)
+
+    np.testing.assert_array_equal(sketches.group_nunique(values, groups, len(sizes)), sizes)
+    assert np.all(np.abs(estimate - sizes) <= 4 * error * np.array(sizes) + 1)